@@ -1,41 +1,40 @@
-from fastapi import FastAPI, UploadFile, HTTPException, File, Form, Query
+from fastapi import FastAPI, UploadFile, HTTPException, File, Form, Query, Depends
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-import neuralspace as ns
 from tempfile import NamedTemporaryFile
 import asyncio
 import json
-import librosa
-import soundfile as sf
-import noisereduce as nr
-import numpy as np
+import threading
+import time
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-import openai
 from src.models.models import ProcessingSettings, TranscriptionRequest, ConversationRequest
-from src.services.document_processor import DocumentProcessor
-from src.services.vector_store import VectorStore
+from src.models.analysis_models import (
+    CallAnalysis, CallDetails, CallDetailsResult, ChecklistResult, EventsResult, SegmentLabel, SummaryResult
+)
+from src.services.ingestion_jobs import get_ingestion_job_manager
 from src.models.document_models import DocumentMetadata
-from src.services.document_uploader import DocumentUploader
-from src.services.rag_service import RAGService
 from datetime import datetime
-import pytz
-from src.services.call_processor import CallProcessor
-from src.utils.openai_client import get_openai_client
-from supabase import create_client
+from src.utils.openai_client import aclose_openai_clients, resolve_model, stream_chat_completion, usage_metrics
+from src.utils.llm_router import get_stage_route, get_llm_router
+from src.utils.sse import sse_response
+from src.utils.structured_output import create_structured_completion, StructuredOutputError, structured_output_metrics
+from src.utils.provider_limiter import provider_metrics
+from src.services.embedding_cache import get_embedding_cache
+from src.services.lexical_index import get_lexical_index
+from src.services.answer_cache import get_answer_cache
+from src.services.transcript_windows import get_transcript_windower, map_windows, merge_events, aggregate_details
+from src.services.transcript_encoder import get_transcript_encoder
+from src.services.call_analysis import build_messages, parse_call_analysis, normalize_details
+from src.services.request_coalescer import coalesce_requests, get_request_coalescer
+from src.services.service_container import ServiceContainer, get_service_container, close_service_container
 
 load_dotenv()
 
 app = FastAPI()
 
-# Initialize Supabase client
-supabase = create_client(
-    os.getenv('SUPABASE_URL'),
-    os.getenv('SUPABASE_KEY')
-)
-
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -54,7 +53,129 @@ NEURALSPACE_API_KEY = os.getenv('NEURALSPACE_API_KEY')
 if not NEURALSPACE_API_KEY:
     raise ValueError("NEURALSPACE_API_KEY environment variable is not set")
 
-vai = ns.VoiceAI(api_key=NEURALSPACE_API_KEY)
+# Heavy dependencies (audio processing, NeuralSpace, Supabase, PyMuPDF, faiss) are imported
+# on first use so the server starts listening quickly; see src/utils/benchmark_startup.py
+_vai = None
+_vai_lock = threading.Lock()
+
+
+def get_voice_ai():
+    """NeuralSpace client, created on first transcription request"""
+    global _vai
+    with _vai_lock:
+        if _vai is None:
+            import neuralspace as ns
+            _vai = ns.VoiceAI(api_key=NEURALSPACE_API_KEY)
+        return _vai
+
+
+def get_services() -> ServiceContainer:
+    """Dependency giving endpoints the application's shared services"""
+    # Sync dependency: FastAPI runs it in a worker thread, so the first build doesn't block the event loop
+    return get_service_container()
+
+
+def warmup():
+    """Import heavy modules and build shared services ahead of the first requests"""
+    try:
+        started = time.perf_counter()
+        get_service_container()
+        get_transcript_encoder()
+        # Audio libraries used by enhance_audio_file
+        import librosa
+        import noisereduce
+        import soundfile
+        get_voice_ai()
+        print(f"Warmup finished in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        print(f"Error during warmup: {str(e)}")
+
+
+async def encode_transcript(segments: List[Dict], indexed: bool = False):
+    """
+    Compact (memoized) prompt encoding of a transcript and its token-bounded windows
+
+    Runs off the event loop since tokenizing is CPU-bound. Windows are lists of segment
+    positions; render them with encoded.render(window, indexed).
+    """
+    def encode():
+        encoded = get_transcript_encoder().encode(segments)
+        return encoded, encoded.windows(get_transcript_windower(), indexed)
+
+    return await asyncio.to_thread(encode)
+
+
+@app.on_event("startup")
+async def start_warmup():
+    """Warm up in the background (disable with STARTUP_WARMUP=0); requests are served meanwhile"""
+    if os.getenv('STARTUP_WARMUP', '1') != '0':
+        asyncio.get_running_loop().run_in_executor(None, warmup)
+
+
+# Strong references to long-running background tasks, so they aren't garbage collected
+_background_tasks = set()
+
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def keep_in_sync(index, supabase):
+    """Load or build a local chunk index, then reconcile it with the database periodically"""
+    await asyncio.to_thread(index.load_or_build, supabase)
+    # Picks up chunks changed by other workers or instances, or directly in the database
+    interval = float(os.getenv('LOCAL_INDEX_SYNC_INTERVAL', 300))
+    while interval > 0:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(index.resync, supabase)
+
+
+@app.on_event("startup")
+async def load_local_vector_index():
+    """Load (or build from Supabase) the local vector index without delaying startup"""
+    def get_index():
+        # faiss is slow to import, so the index module is only loaded here, off the event loop
+        from src.services.local_vector_index import get_local_vector_index
+        return get_local_vector_index(), get_service_container().supabase
+
+    async def start():
+        local_index, supabase = await asyncio.to_thread(get_index)
+        if local_index:
+            await keep_in_sync(local_index, supabase)
+
+    # Queries use the remote match_document_chunks RPC until the index is ready
+    run_in_background(start())
+
+
+@app.on_event("startup")
+async def load_lexical_index():
+    """Load (or build from Supabase) the BM25 index used for hybrid document search"""
+    lexical_index = get_lexical_index()
+    if lexical_index:
+        # Queries use vector search alone until the index is ready
+        supabase = await asyncio.to_thread(lambda: get_service_container().supabase)
+        run_in_background(keep_in_sync(lexical_index, supabase))
+
+
+@app.on_event("startup")
+async def start_ingestion_jobs():
+    """Start the document ingestion workers, resuming jobs interrupted by a restart"""
+    await get_ingestion_job_manager().start()
+
+
+@app.on_event("shutdown")
+async def stop_ingestion_jobs():
+    await get_ingestion_job_manager().stop()
+
+
+@app.on_event("shutdown")
+async def close_services():
+    for task in list(_background_tasks):
+        task.cancel()
+    close_service_container()
+    await aclose_openai_clients()
 
 SUMMARY_PROMPT = """
 Please provide a concise, single-paragraph summary of this customer service conversation in Arabic.
@@ -64,17 +185,42 @@ Respond with a JSON object containing only a "summary" field with the paragraph.
 Conversation:
 """
 
+# Streaming variant: plain text so the summary can be shown as it is generated
+SUMMARY_STREAM_PROMPT = """
+Please provide a concise, single-paragraph summary of this customer service conversation in Arabic.
+Include the main purpose of the call, key points discussed, and any resolutions reached.
+Respond with only the summary paragraph, without any introduction or formatting.
+
+Conversation:
+"""
+
+# Long calls are summarized per window; these combine the partial summaries
+SUMMARY_MERGE_PROMPT = """
+The following are summaries of consecutive parts of one customer service conversation, in order.
+Combine them into a concise, single-paragraph summary of the whole conversation in Arabic.
+Include the main purpose of the call, key points discussed, and any resolutions reached.
+Respond with a JSON object containing only a "summary" field with the paragraph.
+
+Partial summaries:
+"""
+
+SUMMARY_STREAM_MERGE_PROMPT = """
+The following are summaries of consecutive parts of one customer service conversation, in order.
+Combine them into a concise, single-paragraph summary of the whole conversation in Arabic.
+Include the main purpose of the call, key points discussed, and any resolutions reached.
+Respond with only the summary paragraph, without any introduction or formatting.
+
+Partial summaries:
+"""
+
 EVENTS_PROMPT = """
 Analyze this customer service conversation and identify key events that occurred.
 When not sure if an event is significant, add it to the list.
 Never add greetings or small talk to the list.
 Each call usually has at least 1 event.
 
-The input data is structured as a list of segments, each with the following fields:
-- startTime: The start time of the segment in seconds.
-- endTime: The end time of the segment in seconds.
-- text: The spoken text in the segment.
-- speaker: The speaker identifier (e.g., "Speaker 0", "Speaker 1").
+The conversation starts with a line mapping speaker tags to speaker names, followed by one line per segment:
+<segment number> [<start time in seconds>] <speaker tag>: <spoken text>
 
 Format your response as a JSON object with this structure:
 {
@@ -82,12 +228,14 @@ Format your response as a JSON object with this structure:
         {
             "actor": "agent",
             "action": "approved refund of 50 AED",
-            "timestamp": 45.23
+            "segment": 12,
+            "timestamp": 45.2
         },
         {
             "actor": "customer",
             "action": "requested account closure and data deletion",
-            "timestamp": 120.45
+            "segment": 31,
+            "timestamp": 120.5
         }
     ]
 }
@@ -99,7 +247,7 @@ Guidelines:
 4. Remove any unnecessary words
 5. Focus only on significant actions/decisions 
 6. Only include actions that are crystal clear when not sure its better to leave it out
-7. Include the startTime of the segment where the event occurred as timestamp
+7. Include the number and start time of the segment where the event occurred as segment and timestamp
 
 Only return the JSON object, no additional text.
 Conversation:
@@ -109,6 +257,10 @@ async def enhance_audio_file(input_path, output_path):
     """
     Enhance the audio quality of the input file
     """
+    import librosa
+    import noisereduce as nr
+    import soundfile as sf
+
     audio, sr = librosa.load(input_path, sr=None)
     
     noise_sample = audio[0:int(sr)]
@@ -182,8 +334,8 @@ async def transcribe_audio(
                     "sentiment_detect": settings_obj.sentimentDetect
                 }
                 
-                job_id = vai.transcribe(file=temp_file.name, config=config)
-                result = vai.poll_until_complete(job_id)
+                job_id = get_voice_ai().transcribe(file=temp_file.name, config=config)
+                result = get_voice_ai().poll_until_complete(job_id)
 
                 os.unlink(temp_file.name)
 
@@ -221,7 +373,7 @@ async def get_transcription_status(job_id: str):
     Endpoint to check the status of a transcription job
     """
     try:
-        result = vai.get_job_status(job_id)
+        result = get_voice_ai().get_job_status(job_id)
         return result
     except Exception as e:
         raise HTTPException(
@@ -247,13 +399,19 @@ class LabelingRequest(BaseModel):
 
 @app.post("/api/label-segments")
 async def label_segments(request: LabelingRequest):
-    client = get_openai_client(request.settings.labelsModel)
+    client = get_stage_route(request.settings, 'labels')
 
     label_descriptions = "\n".join([
         f"- {label.name}: {label.description}"
         for label in request.possible_labels
     ])
 
+    label_names = {label.name for label in request.possible_labels}
+    
+    def check_label(result: SegmentLabel):
+        if result.label is not None and result.label not in label_names:
+            raise ValueError(f"Unknown label {result.label!r}, expected one of {sorted(label_names)} or null")
+
     segments = request.segments
     for i, segment in enumerate(segments):
         prompt = f"""
@@ -271,25 +429,25 @@ Provide the response as a single JSON object with format: {{"label": "label_name
 Only respond with the JSON object, no additional text.
 """
         try:
-            response = client.chat.completions.create(
-                model=request.settings.labelsModel,
+            result = await create_structured_completion(
+                client,
+                SegmentLabel,
+                stage="label",
                 messages=[
                     {"role": "system", "content": "You are a conversation analysis assistant."},
                     {"role": "user", "content": prompt}
                 ],
+                check=check_label,
+                model=request.settings.labelsModel,
                 temperature=0.3,
                 max_tokens=100
             )
-
-            label_json = response.choices[0].message.content
-            label_json = label_json.strip('`').replace('```json\n', '').replace('\n```', '').replace("json", "")
-            label_data = json.loads(label_json)
             
             segment_dict = segment.dict()
-            segment_dict["label"] = label_data["label"]
+            segment_dict["label"] = result.label
             segments[i] = Segment(**segment_dict)
 
-        except json.JSONDecodeError as e:
+        except StructuredOutputError as e:
             print(f"Error parsing OpenAI response for segment {i}: {str(e)}")
             segments[i].label = None
         except Exception as e:
@@ -313,14 +471,13 @@ class ChecklistRequest(BaseModel):
     settings: ProcessingSettings
 
 @app.post("/api/analyze-checklist")
+@coalesce_requests("analyze-checklist")
 async def analyze_checklist(request: ChecklistRequest):
-    client = get_openai_client(request.settings.checklistModel)
+    client = get_stage_route(request.settings, 'checklist')
     
-    # Prepare the segments text with numbers
-    numbered_segments = "\n".join([
-        f"{i+1}. {segment.text}"
-        for i, segment in enumerate(request.segments)
-    ])
+    # Numbered segments, one per line
+    encoded, _ = await encode_transcript([segment.dict() for segment in request.segments], indexed=True)
+    numbered_segments = encoded.render(indexed=True)
     
     # Prepare the checklist items
     checklist_items = "\n".join([
@@ -347,35 +504,40 @@ async def analyze_checklist(request: ChecklistRequest):
     Respond with only the JSON object, no additional text or formatting.
     """
     
+    def check_matches(result: ChecklistResult):
+        for match in result.matches:
+            if encoded.segment_position(match.segment) is None:
+                raise ValueError(f"Segment {match.segment} does not exist")
+            if match.checklist_item not in request.checklist:
+                raise ValueError(f"{match.checklist_item!r} is not one of the checklist items")
+    
     try:
-        response = client.chat.completions.create(
-            model=request.settings.checklistModel,
-            messages=[
-                {"role": "system", "content": "You are a conversation analysis assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=500
-        )
-        
-        # Clean and parse the response
-        response_text = response.choices[0].message.content.strip()
-        response_text = response_text.replace('```json', '').replace('```', '').strip()
-        
         try:
-            result = json.loads(response_text)
-        except json.JSONDecodeError:
-            print(f"Failed to parse response: {response_text}")
-            result = {"matches": []}
+            result = await create_structured_completion(
+                client,
+                ChecklistResult,
+                stage="checklist",
+                messages=[
+                    {"role": "system", "content": "You are a conversation analysis assistant."},
+                    {"role": "user", "content": prompt}
+                ],
+                check=check_matches,
+                model=request.settings.checklistModel,
+                temperature=0.3,
+                max_tokens=500
+            )
+        except StructuredOutputError as e:
+            print(f"Failed to parse response: {str(e)}")
+            result = ChecklistResult(matches=[])
         
         # Preserve existing segment data while adding checklist items
         segments = request.segments
-        segment_matches = {match["segment"]: match["checklist_item"] 
-                         for match in result.get("matches", [])}
+        segment_matches = {encoded.segment_position(match.segment): match.checklist_item
+                         for match in result.matches}
         
         for i, segment in enumerate(segments):
             segment_dict = segment.dict()
-            segment_dict["checklist_item"] = segment_matches.get(i + 1)
+            segment_dict["checklist_item"] = segment_matches.get(i)
             segments[i] = TranscriptSegment(**segment_dict)
         
         return {
@@ -400,52 +562,38 @@ class ConversationRequest(BaseModel):
     settings: ProcessingSettings
 
 @app.post("/api/analyze-events")
+@coalesce_requests("analyze-events")
 async def analyze_events(request: ConversationRequest):
-    client = get_openai_client(request.settings.eventsModel)
+    client = get_stage_route(request.settings, 'events')
+    segments = [segment.dict() for segment in request.segments]
     
-    # Convert the segments to JSON format
-    conversation_json = json.dumps([segment.dict() for segment in request.segments], ensure_ascii=False, indent=2)
-    try:
-        response = client.chat.completions.create(
-            model=request.settings.eventsModel,
-            messages=[
-                {"role": "system", "content": "You are a conversation analysis assistant specialized in Arabic customer service interactions."},
-                {"role": "user", "content": EVENTS_PROMPT + conversation_json}
-            ],
-            temperature=0.7,
-        )
-        
-        print(response)
-        response_text = response.choices[0].message.content.strip()
-        print(f"Raw response text from OpenAI: {response_text}")  # Debug logging
-        
-        # Clean the response text
-        response_text = response_text.replace('```json', '').replace('```', '').strip()
-        
+    async def analyze_window(window: List[int]) -> List[Dict]:
         try:
-            result = json.loads(response_text)
-            if not result or 'events' not in result:
-                print(f"Invalid response structure: {result}")
-                # Return a valid default structure
-                return {
-                    "segments": [segment.dict() for segment in request.segments],
-                    "key_events": []
-                }
-            
-            key_events = result.get("events", [])
-            return {
-                "segments": [segment.dict() for segment in request.segments],
-                "key_events": key_events
-            }
-            
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse response as JSON: {response_text}")
-            print(f"JSON decode error: {str(e)}")
-            # Return a valid default structure
-            return {
-                "segments": [segment.dict() for segment in request.segments],
-                "key_events": []
-            }
+            result = await create_structured_completion(
+                client,
+                EventsResult,
+                stage="events",
+                messages=[
+                    {"role": "system", "content": "You are a conversation analysis assistant specialized in Arabic customer service interactions."},
+                    {"role": "user", "content": EVENTS_PROMPT + encoded.render(window, indexed=True)}
+                ],
+                model=request.settings.eventsModel,
+                temperature=0.7,
+            )
+        except StructuredOutputError as e:
+            print(f"Failed to parse events response: {str(e)}")
+            return []
+        # Map segment numbers and rounded times back to the segments' exact start times
+        return [encoded.resolve_event(event.dict()) for event in result.events]
+    
+    try:
+        encoded, windows = await encode_transcript(segments, indexed=True)
+        # Long calls are analyzed in overlapping windows and the events merged
+        window_events = await map_windows(windows, analyze_window, get_transcript_windower().max_concurrency)
+        return {
+            "segments": segments,
+            "key_events": merge_events(window_events)
+        }
         
     except Exception as e:
         print(f"Error in analyze_events: {str(e)}")
@@ -458,38 +606,59 @@ async def analyze_events(request: ConversationRequest):
 class SummaryRequest(BaseModel):
     segments: List[TranscriptSegment]
 
-@app.post("/api/summarize-conversation")
-async def summarize_conversation(request: ConversationRequest):
-    client = get_openai_client(request.settings.summaryModel)
-    
-    conversation = "\n".join([
-        f"[{segment.speaker}]: {segment.text}"
-        for segment in request.segments
-    ])
-    
+async def summarize_text(client, model: str, prompt: str, text: str) -> str:
+    """Ask for a JSON summary and return its "summary" field ("" if no valid response comes back)"""
     try:
-        response = client.chat.completions.create(
-            model=request.settings.summaryModel,
+        result = await create_structured_completion(
+            client,
+            SummaryResult,
+            stage="summary",
             messages=[
                 {"role": "system", "content": "You are a conversation analysis assistant specialized in Arabic customer service interactions."},
-                {"role": "user", "content": SUMMARY_PROMPT + conversation}
+                {"role": "user", "content": prompt + text}
             ],
+            model=model,
             temperature=0.3,
         )
-        
-        # Clean and parse the response
-        response_text = response.choices[0].message.content.strip()
-        response_text = response_text.replace('```json', '').replace('```', '').strip()
-        
-        try:
-            result = json.loads(response_text)
-            summary = result.get("summary", "")
-        except json.JSONDecodeError:
-            print(f"Failed to parse response: {response_text}")
-            summary = ""
+        return result.summary
+    except StructuredOutputError as e:
+        print(f"Failed to parse response: {str(e)}")
+        return ""
+
+async def summarize_windows(client, model: str, encoded, windows: List[List[int]]) -> List[str]:
+    """Summarize each window, then merge the partial summaries until they fit in one prompt"""
+    windower = get_transcript_windower()
+    partials = await map_windows(
+        windows,
+        lambda window: summarize_text(client, model, SUMMARY_PROMPT, encoded.render(window, indexed=False)),
+        windower.max_concurrency
+    )
+    return await windower.reduce_until_fits(
+        [partial for partial in partials if partial],
+        lambda group: summarize_text(client, model, SUMMARY_MERGE_PROMPT, "\n\n".join(group))
+    )
+
+@app.post("/api/summarize-conversation")
+@coalesce_requests("summarize-conversation")
+async def summarize_conversation(request: ConversationRequest):
+    client = get_stage_route(request.settings, 'summary')
+    model = request.settings.summaryModel
+    segments = [segment.dict() for segment in request.segments]
+    
+    try:
+        encoded, windows = await encode_transcript(segments)
+        if len(windows) == 1:
+            summary = await summarize_text(client, model, SUMMARY_PROMPT, encoded.render(indexed=False))
+        else:
+            # Long call: summaries of overlapping windows are merged hierarchically
+            partials = await summarize_windows(client, model, encoded, windows)
+            if len(partials) > 1:
+                summary = await summarize_text(client, model, SUMMARY_MERGE_PROMPT, "\n\n".join(partials))
+            else:
+                summary = partials[0] if partials else ""
         print(request.settings) 
         return {
-            "segments": [segment.dict() for segment in request.segments],
+            "segments": segments,
             "summary": summary
         }
         
@@ -500,86 +669,147 @@ async def summarize_conversation(request: ConversationRequest):
             detail=f"Error summarizing conversation: {str(e)}"
         )
 
-@app.post("/api/documents/upload")
+@app.post("/api/summarize-conversation/stream")
+async def summarize_conversation_stream(request: ConversationRequest):
+    """Stream the summary as Server-Sent Events: `token` deltas, then a `result` like /api/summarize-conversation"""
+    route = get_stage_route(request.settings, 'summary')
+    model = request.settings.summaryModel
+    # The streamed part goes to the primary model only; the window summaries are routed
+    client, stream_model = resolve_model(model)
+    segments = [segment.dict() for segment in request.segments]
+    
+    async def events():
+        encoded, windows = await encode_transcript(segments)
+        if len(windows) == 1:
+            prompt = SUMMARY_STREAM_PROMPT + encoded.render(indexed=False)
+        else:
+            # Long call: window summaries are produced first, only the final merge is streamed
+            partials = await summarize_windows(route, model, encoded, windows)
+            prompt = SUMMARY_STREAM_MERGE_PROMPT + "\n\n".join(partials)
+        
+        parts = []
+        async for text in stream_chat_completion(
+            client,
+            model=stream_model,
+            messages=[
+                {"role": "system", "content": "You are a conversation analysis assistant specialized in Arabic customer service interactions."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+        ):
+            parts.append(text)
+            yield 'token', text
+        yield 'result', {
+            "segments": segments,
+            "summary": ''.join(parts).strip()
+        }
+    
+    return sse_response(events())
+
+@app.post("/api/documents/upload", status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
     # user_id: str = Form(...),
     metadata: str = Form(...)
 ):
-    """Upload a document file to storage and process it"""
+    """Save an uploaded document and queue it for background processing"""
     try:
-        # Parse metadata
+        # Parse and validate metadata before accepting the file
         metadata_dict = json.loads(metadata)
-        metadata_obj = DocumentMetadata(**metadata_dict)
-        
-        # Initialize services
-        document_uploader = DocumentUploader()
+        DocumentMetadata(**metadata_dict)
+
+        file_ext = Path(file.filename).suffix.lower()
+        if file_ext not in ['.pdf', '.docx', '.txt', '.md']:
+            raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_ext}")
+
+        content = await file.read()
+        job = await get_ingestion_job_manager().submit(content, file.filename, metadata_dict)
         
-        # Upload file and get URL
-        with NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file.flush()
-            
-            # Upload to storage
-            result = document_uploader.upload_document(Path(temp_file.name))
-            if not result['success']:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Failed to upload file: {result.get('error', 'Unknown error')}"
-                )
-            
-            # Update metadata with file URL
-            metadata_obj.source_url = result['file_url']
-            metadata_obj.file_size = len(content)
-            metadata_obj.last_updated = datetime.now(pytz.UTC)
-            
-            # Process document
-            processor = DocumentProcessor()
-            chunks = await processor.process_document(temp_file.name, metadata_obj)
-            
-            # Get embeddings for chunks using the embeddings_client
-            try:
-                embeddings = await processor.get_embeddings(chunks)
-            except Exception as e:
-                print(f"Error in get_embeddings: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error getting embeddings: {str(e)}"
-                )
-            # Store in vector database
-            vector_store = VectorStore()
-            await vector_store.store_document(chunks, embeddings, metadata_obj)
-            
-            return {
-                "success": True,
-                "message": "Document uploaded and processed successfully",
-                "file_url": result['file_url']
-            }
+        return {
+            "success": True,
+            "message": "Document accepted for processing",
+            "job_id": job['id'],
+            "status": job['status']
+        }
             
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in upload_document: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Error uploading document: {str(e)}"
         )
-    finally:
-        # Clean up temp file
-        if 'temp_file' in locals():
-            os.unlink(temp_file.name)
+
+@app.put("/api/documents/{document_id}", status_code=202)
+async def update_document(
+    document_id: str,
+    file: UploadFile = File(...),
+    metadata: Optional[str] = Form(None),
+    services: ServiceContainer = Depends(get_services)
+):
+    """Queue a new version of a document; only chunks that changed are re-embedded"""
+    try:
+        metadata_dict = json.loads(metadata) if metadata else {}
+
+        file_ext = Path(file.filename).suffix.lower()
+        if file_ext not in ['.pdf', '.docx', '.txt', '.md']:
+            raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_ext}")
+
+        existing = services.supabase.table('documents').select('id').eq('id', document_id).execute()
+        if not existing.data:
+            raise HTTPException(status_code=404, detail="Document not found")
+
+        content = await file.read()
+        job = await get_ingestion_job_manager().submit(content, file.filename, metadata_dict, document_id=document_id)
+
+        return {
+            "success": True,
+            "message": "Document update accepted for processing",
+            "job_id": job['id'],
+            "status": job['status']
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in update_document: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error updating document: {str(e)}"
+        )
+
+@app.get("/api/documents/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Status of a document ingestion job: stage, pages done, chunks embedded and stored"""
+    job = get_ingestion_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/api/documents/jobs/{job_id}/retry")
+async def retry_ingestion_job(job_id: str):
+    """Retry a failed ingestion job from the stage that failed, using the saved file"""
+    try:
+        return await get_ingestion_job_manager().retry(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 # Add this class for request validation
 class QuestionRequest(BaseModel):
     question: str
     max_chunks: int = 3  # Optional with default value
+    use_cache: bool = True  # Serve semantically similar questions from the answer cache
 
 @app.post("/api/documents/query")
-async def query_documents(request: QuestionRequest):
+async def query_documents(request: QuestionRequest, services: ServiceContainer = Depends(get_services)):
     try:
-        rag_service = RAGService()
-        result = await rag_service.get_answer(
+        result = await services.rag_service.get_answer(
             question=request.question,
-            max_chunks=request.max_chunks
+            max_chunks=request.max_chunks,
+            use_cache=request.use_cache
         )
         print(result)
         return result
@@ -587,14 +817,20 @@ async def query_documents(request: QuestionRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/documents/query/stream")
+async def query_documents_stream(request: QuestionRequest, services: ServiceContainer = Depends(get_services)):
+    """Stream the answer as Server-Sent Events: `sources`, `token` deltas, then the full `result`"""
+    return sse_response(services.rag_service.stream_answer(
+        question=request.question,
+        max_chunks=request.max_chunks,
+        use_cache=request.use_cache
+    ))
+
 @app.post("/api/analyze-call-details")
+@coalesce_requests("analyze-call-details")
 async def analyze_call_details(request: ConversationRequest):
-    client = get_openai_client(request.settings.detailsModel)
-    
-    conversation = "\n".join([
-        f"[{segment.speaker}]: {segment.text}"
-        for segment in request.segments
-    ])
+    client = get_stage_route(request.settings, 'details')
+    segments = [segment.dict() for segment in request.segments]
     
     prompt = """
     Analyze this customer service conversation and provide the following in JSON format:
@@ -612,31 +848,34 @@ async def analyze_call_details(request: ConversationRequest):
     }
     """
     
-    try:
-        response = client.chat.completions.create(
-            model=request.settings.detailsModel,
-            messages=[
-                {"role": "system", "content": "You are a conversation analysis assistant specialized in customer service interactions."},
-                {"role": "user", "content": prompt + "\n\nConversation:\n" + conversation}
-            ],
-            temperature=0.3,
-            max_tokens=500
-        )
-        
-        response_text = response.choices[0].message.content.strip()
-        response_text = response_text.replace('```json', '').replace('```', '').strip()
-        
+    async def analyze_window(window: List[int]) -> Dict:
+        conversation = encoded.render(window, indexed=False)
         try:
-            result = json.loads(response_text)
-            return result
-        except json.JSONDecodeError:
-            print(f"Failed to parse response: {response_text}")
-            return {
-                "sentiment_score": 3.0,
-                "topics": [],
-                "flags": [],
-                "call_type": "other"
-            }
+            result = await create_structured_completion(
+                client,
+                CallDetailsResult,
+                stage="details",
+                messages=[
+                    {"role": "system", "content": "You are a conversation analysis assistant specialized in customer service interactions."},
+                    {"role": "user", "content": prompt + "\n\nConversation:\n" + conversation}
+                ],
+                model=request.settings.detailsModel,
+                temperature=0.3,
+                max_tokens=500
+            )
+            return result.dict()
+        except StructuredOutputError as e:
+            print(f"Failed to parse response: {str(e)}")
+            return CallDetails().dict()
+    
+    try:
+        encoded, windows = await encode_transcript(segments)
+        results = await map_windows(windows, analyze_window, get_transcript_windower().max_concurrency)
+        if len(results) == 1:
+            return results[0]
+        # Scores of long calls are aggregated across windows, weighted by window length
+        weights = [sum(len(segments[position]['text']) for position in window) for window in windows]
+        return aggregate_details(results, weights)
             
     except Exception as e:
         print(f"Error in analyze_call_details: {str(e)}")
@@ -646,18 +885,115 @@ async def analyze_call_details(request: ConversationRequest):
         )
 
 
+class CallAnalysisRequest(BaseModel):
+    segments: List[TranscriptSegment]
+    settings: ProcessingSettings
+    checklist: Optional[List[str]] = None  # Also match segments to these items when given
+
+@app.post("/api/analyze-call")
+@coalesce_requests("analyze-call")
+async def analyze_call(request: CallAnalysisRequest):
+    """
+    Events, summary, details and (optionally) checklist matches in one request
+
+    Sends the transcript once instead of once per analysis endpoint. The response combines
+    the shapes of those endpoints: `key_events` as in /api/analyze-events, `summary` as in
+    /api/summarize-conversation, `details` as /api/analyze-call-details returns and, with a
+    checklist, `segments` carrying `checklist_item` as in /api/analyze-checklist.
+    """
+    client = get_stage_route(request.settings, 'analysis')
+    model = request.settings.analysisModel
+    segments = [segment.dict() for segment in request.segments]
+    usage = {"requests": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0}
+    
+    def add_usage(response):
+        if response.usage:
+            usage["requests"] += 1
+            usage["prompt_tokens"] += response.usage.prompt_tokens or 0
+            details = getattr(response.usage, 'prompt_tokens_details', None)
+            usage["cached_prompt_tokens"] += getattr(details, 'cached_tokens', None) or 0
+            usage["completion_tokens"] += response.usage.completion_tokens or 0
+    
+    async def analyze_window(window: List[int]):
+        try:
+            return await create_structured_completion(
+                client,
+                CallAnalysis,
+                stage="call_analysis",
+                messages=build_messages(encoded.render(window, indexed=True), request.checklist),
+                on_response=add_usage,
+                model=model,
+                temperature=0.3,
+            )
+        except StructuredOutputError as e:
+            # Out of retries: keep whatever sections of the last response are valid
+            return parse_call_analysis(e.raw)
+    
+    try:
+        encoded, windows = await encode_transcript(segments, indexed=True)
+        analyses = await map_windows(windows, analyze_window, get_transcript_windower().max_concurrency)
+        
+        key_events = merge_events([
+            [encoded.resolve_event(event.dict()) for event in analysis.events]
+            for analysis in analyses
+        ])
+        
+        if len(analyses) == 1:
+            summary = analyses[0].summary
+            details = normalize_details(analyses[0].details)
+        else:
+            # Long call: window results are reduced like the per-analysis endpoints do
+            partials = await get_transcript_windower().reduce_until_fits(
+                [analysis.summary for analysis in analyses if analysis.summary],
+                lambda group: summarize_text(client, model, SUMMARY_MERGE_PROMPT, "\n\n".join(group))
+            )
+            if len(partials) > 1:
+                summary = await summarize_text(client, model, SUMMARY_MERGE_PROMPT, "\n\n".join(partials))
+            else:
+                summary = partials[0] if partials else ""
+            weights = [sum(len(segments[position]['text']) for position in window) for window in windows]
+            details = normalize_details(CallDetails(**aggregate_details(
+                [analysis.details.dict() for analysis in analyses], weights
+            )))
+        
+        if request.checklist:
+            matches = {}
+            for analysis in analyses:
+                for match in analysis.checklist_matches:
+                    position = encoded.segment_position(match.segment)
+                    if position is not None and match.checklist_item in request.checklist:
+                        matches.setdefault(position, match.checklist_item)
+            for position, segment in enumerate(segments):
+                segment["checklist_item"] = matches.get(position)
+        
+        return {
+            "segments": segments,
+            "key_events": key_events,
+            "summary": summary,
+            "details": details,
+            "usage": usage
+        }
+        
+    except Exception as e:
+        print(f"Error in analyze_call: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error analyzing call: {str(e)}"
+        )
+
+
 @app.get("/api/documents/{document_id}/url")
-async def get_document_url(document_id: str):
+async def get_document_url(document_id: str, services: ServiceContainer = Depends(get_services)):
     try:
         # Get document from database
-        result = supabase.table('documents').select('*').eq('id', document_id).single().execute()
+        result = services.supabase.table('documents').select('*').eq('id', document_id).single().execute()
         if not result.data:
             raise HTTPException(status_code=404, detail="Document not found")
             
         document = result.data
         
         # Generate fresh signed URL
-        signed_url = supabase.storage.from_('documents').create_signed_url(
+        signed_url = services.supabase.storage.from_('documents').create_signed_url(
             path=document['source_url'].split('/')[-1],  # Get filename from source_url
             expires_in=3600  # URL expires in 1 hour
         )
@@ -668,6 +1004,26 @@ async def get_document_url(document_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/metrics")
+async def get_metrics(services: ServiceContainer = Depends(get_services)):
+    """Runtime metrics: adaptive limits per upstream provider and cache hit rates"""
+    # The vector store holds the process-wide local index, so faiss is never imported on the event loop
+    local_index = services.vector_store.local_index
+    lexical_index = get_lexical_index()
+    answer_cache = get_answer_cache()
+    return {
+        "providers": provider_metrics(),
+        "llm_usage": usage_metrics(),
+        "structured_output": structured_output_metrics(),
+        "request_coalescing": get_request_coalescer().stats(),
+        "llm_routing": get_llm_router().stats(),
+        "embedding_cache": get_embedding_cache().stats(),
+        "local_vector_index": local_index.stats() if local_index else None,
+        "lexical_index": lexical_index.stats() if lexical_index else None,
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "transcript_encoding": get_transcript_encoder().stats()
+    }
+
 port = int(os.getenv("PORT", 8000))
 
 if __name__ == "__main__":
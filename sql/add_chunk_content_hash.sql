@@ -0,0 +1,6 @@
+-- Fingerprint of each chunk's normalized content, used to re-embed only changed chunks
+-- when a document is updated. Existing rows are hashed lazily on their document's first update.
+ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_hash text;
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_document_id_hash
+    ON document_chunks(document_id, content_hash);
@@ -0,0 +1,57 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+CALL_TYPES = ["billing", "technical", "account", "other"]
+
+
+class KeyEvent(BaseModel):
+    actor: str
+    action: str
+    segment: Optional[int] = None
+    timestamp: Optional[float] = None
+
+
+class CallDetails(BaseModel):
+    sentiment_score: float = 3.0
+    topics: List[str] = []
+    flags: List[str] = []
+    call_type: str = "other"
+
+
+class ChecklistMatch(BaseModel):
+    segment: int
+    checklist_item: str
+
+
+class CallAnalysis(BaseModel):
+    """Structured output of the combined call analysis prompt"""
+    summary: str = ""
+    events: List[KeyEvent] = []
+    details: CallDetails = CallDetails()
+    checklist_matches: List[ChecklistMatch] = []
+
+
+# Responses of the per-analysis endpoints, validated by src/utils/structured_output.py.
+# Their fields are required so an empty or truncated object is re-asked, not accepted.
+
+class SegmentLabel(BaseModel):
+    label: Optional[str]
+
+
+class ChecklistResult(BaseModel):
+    matches: List[ChecklistMatch]
+
+
+class EventsResult(BaseModel):
+    events: List[KeyEvent]
+
+
+class SummaryResult(BaseModel):
+    summary: str
+
+
+class CallDetailsResult(CallDetails):
+    sentiment_score: float
+    topics: List[str]
+    flags: List[str]
+    call_type: str
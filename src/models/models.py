@@ -9,6 +9,17 @@ class ProcessingSettings(BaseModel):
     labelsModel: str = 'gpt-4o'
     detailsModel: str = 'gpt-4o'
     checklistModel: str = 'gpt-4o'
+    analysisModel: str = 'gpt-4o'  # Combined single-pass analysis (/api/analyze-call)
+    
+    # Second provider/model per endpoint for failover and hedged requests, e.g. 'openai:gpt-4o'
+    # (LLM_FALLBACK_MODEL when unset); see src/utils/llm_router.py
+    summaryFallbackModel: Optional[str] = None
+    eventsFallbackModel: Optional[str] = None
+    labelsFallbackModel: Optional[str] = None
+    detailsFallbackModel: Optional[str] = None
+    checklistFallbackModel: Optional[str] = None
+    analysisFallbackModel: Optional[str] = None
+    hedgePercentile: Optional[float] = 95.0  # Hedge after this latency percentile of the primary; None = failover only
     
     # Transcription Settings
     transcriptionModel: str = 'real'
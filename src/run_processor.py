@@ -1,9 +1,21 @@
 import asyncio
 import argparse
+import signal
 from services.call_processor import CallProcessor
+from services.call_scheduler import FairCallScheduler
 import os
 from pathlib import Path
 
+def parse_assignments(values):
+    """Parse repeated KEY=INT command line values into a dict"""
+    result = {}
+    for value in values:
+        key, _, number = value.partition('=')
+        if not key or not number:
+            raise SystemExit(f"Expected KEY=VALUE, got: {value}")
+        result[key] = int(number)
+    return result
+
 async def main():
     parser = argparse.ArgumentParser(description='Process call center recordings')
     parser.add_argument('--skip-transcription', action='store_true', 
@@ -16,6 +28,24 @@ async def main():
                       help='Process a specific call by ID')
     parser.add_argument('--reprocess', action='store_true',
                       help='Reprocess all calls, including those already processed')
+    parser.add_argument('--follow', action='store_true',
+                      help='Keep running and process new calls as they are inserted')
+    parser.add_argument('--concurrency', type=int, default=4,
+                      help='Number of calls processed at the same time')
+    parser.add_argument('--page-size', type=int, default=500,
+                      help='Number of calls fetched per page from the backlog')
+    parser.add_argument('--poll-interval', type=float, default=30.0,
+                      help='Seconds between polls when realtime notifications are unavailable')
+    parser.add_argument('--no-realtime', action='store_true',
+                      help='Use polling only instead of Supabase Realtime notifications')
+    parser.add_argument('--shortest-first', action='store_true',
+                      help='Within an organization, process shorter calls first')
+    parser.add_argument('--org-weight', action='append', default=[], metavar='ORG_ID=WEIGHT',
+                      help='Give an organization a larger share of workers (repeatable)')
+    parser.add_argument('--priority', action='append', default=[], metavar='CALL_ID=PRIORITY',
+                      help='Override the priority of a call; lower values are processed first (repeatable)')
+    parser.add_argument('--stats-interval', type=float, default=300.0,
+                      help='Seconds between queue-wait stats in the log while running (0 disables)')
     args = parser.parse_args()
     
     # Ensure logs directory exists
@@ -46,9 +76,37 @@ async def main():
         # Display stats for the single call if requested
         if args.stats and result['success']:
             processor._display_single_call_stats(result)
+        return
+
+    # Drain in-flight calls on SIGTERM/SIGINT instead of dying mid-call
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, processor.stop_following)
+
+    scheduler = FairCallScheduler(
+        org_weights=parse_assignments(args.org_weight),
+        shortest_first=args.shortest_first,
+        priority_overrides=parse_assignments(args.priority),
+        max_queued=max(args.concurrency * 4, 20)
+    )
+
+    if args.follow:
+        await processor.follow(
+            concurrency=args.concurrency,
+            poll_interval=args.poll_interval,
+            use_realtime=not args.no_realtime,
+            scheduler=scheduler,
+            stats_interval=args.stats_interval
+        )
     else:
         # Process multiple calls
-        await processor.process_all_calls(limit=args.limit)
+        await processor.process_all_calls(
+            limit=args.limit,
+            concurrency=args.concurrency,
+            page_size=args.page_size,
+            scheduler=scheduler,
+            stats_interval=args.stats_interval
+        )
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
@@ -0,0 +1,221 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = '.cache/answer_cache.sqlite3'
+
+
+class SemanticAnswerCache:
+    """
+    Cache of RAG answers looked up by question meaning rather than exact text.
+
+    Each entry keeps the question embedding, the answer payload and the
+    knowledge-base version it was generated against. A lookup returns the entry
+    whose question embedding is most similar to the new one, if the cosine
+    similarity reaches `threshold` and the entry was made for the same max_chunks
+    and the current knowledge-base version. Any document insert, update or delete
+    bumps the version (see bump_version), so answers never outlive the content
+    they were based on.
+
+    Entries are kept in memory as a normalized matrix for fast lookups and
+    persisted to SQLite (pass path=None to keep them in memory only).
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH, threshold: float = 0.95, max_entries: int = 5000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: List[Dict] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._version = 0
+        self.stats_counters = {'hits': 0, 'misses': 0, 'stores': 0, 'invalidations': 0, 'seconds_saved': 0.0}
+
+        self._db = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    id INTEGER PRIMARY KEY,
+                    question TEXT,
+                    embedding BLOB,
+                    max_chunks INTEGER,
+                    kb_version INTEGER,
+                    payload TEXT,
+                    generation_seconds REAL,
+                    created_at REAL
+                )
+            """)
+            self._db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self._db.commit()
+            self._load()
+
+    def _load(self):
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'kb_version'").fetchone()
+        self._version = int(row[0]) if row else 0
+        # Entries from older versions can never be served again
+        self._db.execute('DELETE FROM answers WHERE kb_version != ?', (self._version,))
+        self._db.commit()
+        rows = self._db.execute(
+            'SELECT id, question, embedding, max_chunks, payload, generation_seconds FROM answers ORDER BY id DESC LIMIT ?',
+            (self.max_entries,)
+        ).fetchall()
+        for row_id, question, blob, max_chunks, payload, seconds in reversed(rows):
+            self._entries.append({
+                'id': row_id,
+                'question': question,
+                'vector': np.frombuffer(blob, dtype=np.float32),
+                'max_chunks': max_chunks,
+                'payload': json.loads(payload),
+                'generation_seconds': seconds,
+            })
+        self._rebuild_matrix()
+
+    def _rebuild_matrix(self):
+        self._matrix = np.vstack([entry['vector'] for entry in self._entries]) if self._entries else None
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _sync_version(self):
+        """Pick up version bumps made by other processes sharing the cache file"""
+        if self._db is None:
+            return
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'kb_version'").fetchone()
+        version = int(row[0]) if row else 0
+        if version != self._version:
+            self._version = version
+            self._entries = []
+            self._matrix = None
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            self._sync_version()
+            return self._version
+
+    def lookup(self, embedding: List[float], max_chunks: int) -> Optional[Dict]:
+        """Return a cached answer payload (with `cache_similarity`) for a similar question, or None"""
+        with self._lock:
+            self._sync_version()
+            if self._matrix is None:
+                self.stats_counters['misses'] += 1
+                return None
+            scores = self._matrix @ self._normalize(embedding)
+            for index in np.argsort(-scores):
+                score = float(scores[index])
+                if score < self.threshold:
+                    break
+                entry = self._entries[index]
+                if entry['max_chunks'] == max_chunks:
+                    self.stats_counters['hits'] += 1
+                    self.stats_counters['seconds_saved'] += entry['generation_seconds'] or 0.0
+                    return {**entry['payload'], 'cached_question': entry['question'], 'cache_similarity': score}
+            self.stats_counters['misses'] += 1
+            return None
+
+    def store(self, question: str, embedding: List[float], max_chunks: int, payload: Dict,
+              generation_seconds: float, kb_version: int):
+        """
+        Cache an answer
+
+        `kb_version` must be the version read before retrieval started; if the
+        knowledge base changed while the answer was being generated it is not cached.
+        """
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._sync_version()
+            if kb_version != self._version:
+                return
+            entry = {
+                'id': None,
+                'question': question,
+                'vector': vector,
+                'max_chunks': max_chunks,
+                'payload': payload,
+                'generation_seconds': generation_seconds,
+            }
+            if self._db is not None:
+                cursor = self._db.execute(
+                    'INSERT INTO answers (question, embedding, max_chunks, kb_version, payload, generation_seconds, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (question, vector.tobytes(), max_chunks, kb_version, json.dumps(payload), generation_seconds, time.time())
+                )
+                entry['id'] = cursor.lastrowid
+            self._entries.append(entry)
+            self.stats_counters['stores'] += 1
+
+            # Oldest entries go first once the cache is full
+            evicted = self._entries[:-self.max_entries] if len(self._entries) > self.max_entries else []
+            if evicted:
+                self._entries = self._entries[len(evicted):]
+                if self._db is not None:
+                    self._db.executemany('DELETE FROM answers WHERE id = ?', [(e['id'],) for e in evicted])
+            if self._db is not None:
+                self._db.commit()
+            self._rebuild_matrix()
+
+    def bump_version(self):
+        """Invalidate every cached answer; called whenever documents or chunks change"""
+        with self._lock:
+            self._sync_version()
+            self._version += 1
+            self._entries = []
+            self._matrix = None
+            self.stats_counters['invalidations'] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('kb_version', ?)", (str(self._version),)
+                )
+                self._db.execute('DELETE FROM answers')
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.stats_counters)
+            entries = len(self._entries)
+        lookups = counters['hits'] + counters['misses']
+        return {
+            **counters,
+            'seconds_saved': round(counters['seconds_saved'], 2),
+            'hit_ratio': round(counters['hits'] / lookups, 4) if lookups else 0.0,
+            'entries': entries,
+            'kb_version': self._version,
+            'threshold': self.threshold,
+        }
+
+
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """
+    Process-wide answer cache, or None when disabled.
+
+    ANSWER_CACHE_THRESHOLD sets the minimum cosine similarity for a hit (default 0.95;
+    0 or less disables the cache), ANSWER_CACHE_PATH the SQLite file (empty keeps
+    entries in memory only) and ANSWER_CACHE_MAX_ENTRIES the size limit.
+    """
+    global _cache
+    threshold = float(os.getenv('ANSWER_CACHE_THRESHOLD', 0.95))
+    if threshold <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticAnswerCache(
+                path=os.getenv('ANSWER_CACHE_PATH', DEFAULT_CACHE_PATH) or None,
+                threshold=threshold,
+                max_entries=int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 5000)),
+            )
+        return _cache
@@ -4,13 +4,18 @@ from pathlib import Path
 from typing import Dict
 from dotenv import load_dotenv
 import mimetypes
+import threading
 from datetime import datetime
 
 load_dotenv()
 
+# Buckets already known to exist; buckets are never deleted, so they're checked once per process
+_existing_buckets = set()
+_buckets_lock = threading.Lock()
+
 class BaseFileUploader:
-    def __init__(self, bucket_name: str = 'documents'):
-        self.supabase: Client = create_client(
+    def __init__(self, bucket_name: str = 'documents', supabase: Client = None):
+        self.supabase: Client = supabase or create_client(
             os.getenv('SUPABASE_URL'),
             os.getenv('SUPABASE_KEY')
         )
@@ -19,6 +24,9 @@ class BaseFileUploader:
 
     def ensure_bucket_exists(self):
         """Ensure the storage bucket exists and has public access"""
+        with _buckets_lock:
+            if self.bucket_name in _existing_buckets:
+                return
         try:
             buckets = self.supabase.storage.list_buckets()
             bucket_exists = any(bucket.name == self.bucket_name for bucket in buckets)
@@ -32,6 +40,8 @@ class BaseFileUploader:
                     }
                 )
                 print(f"Created public bucket: {self.bucket_name}")
+            with _buckets_lock:
+                _existing_buckets.add(self.bucket_name)
         except Exception as e:
             print(f"Error ensuring bucket exists: {str(e)}")
             raise
@@ -0,0 +1,125 @@
+import logging
+from typing import Dict, List, Optional
+
+from pydantic import ValidationError
+
+from src.models.analysis_models import CALL_TYPES, CallAnalysis, CallDetails, ChecklistMatch, KeyEvent
+from src.utils.structured_output import extract_json
+
+logger = logging.getLogger(__name__)
+
+# Everything that doesn't depend on the call lives in the system message, so every
+# request starts with the same prefix and providers can serve it from their prompt cache
+CALL_ANALYSIS_SYSTEM_PROMPT = """
+You are a conversation analysis assistant specialized in Arabic customer service interactions.
+You analyze one conversation at a time and produce, in a single JSON object, its summary,
+its key events, its call details and the segments that fulfill checklist items.
+
+The conversation starts with a line mapping speaker tags to speaker names, followed by one line per segment:
+<segment number> [<start time in seconds>] <speaker tag>: <spoken text>
+
+Respond with a JSON object with exactly this structure:
+{
+    "summary": "single-paragraph summary in Arabic",
+    "events": [
+        {"actor": "agent", "action": "approved refund of 50 AED", "segment": 12, "timestamp": 45.2}
+    ],
+    "details": {
+        "sentiment_score": 4.25,
+        "topics": ["refund"],
+        "flags": ["refund_requested"],
+        "call_type": "billing"
+    },
+    "checklist_matches": [
+        {"segment": 1, "checklist_item": "Greet Customer"}
+    ]
+}
+
+summary:
+- A concise, single paragraph in Arabic with the main purpose of the call, key points discussed
+  and any resolutions reached.
+
+events:
+- Key events that occurred. When not sure if an event is significant, add it to the list.
+- Never add greetings or small talk. Each call usually has at least 1 event.
+- Keep actions brief but informative and remove unnecessary words.
+- Group similar actions by the same actor together. Use lowercase actor values ("agent" or "customer").
+- Focus only on significant actions and decisions; leave out anything that is not crystal clear.
+- Give the number and start time of the segment where the event occurred as segment and timestamp.
+
+details:
+- sentiment_score: 1.00 to 5.00 for the overall conversation sentiment (1 = very negative, 5 = very positive).
+- topics: the main topics discussed, at most 3.
+- flags: potential issues or concerns, e.g. "customer_angry", "refund_requested", "technical_issue".
+- call_type: one of "billing", "technical", "account", "other", based on the main purpose of the call.
+
+checklist_matches:
+- For each segment that clearly fulfills one of the checklist items given with the conversation,
+  one entry with the segment number and the checklist item exactly as written.
+- Only include segments that clearly match. If no checklist is given, return an empty list.
+
+Only return the JSON object, no additional text.
+""".strip()
+
+
+def build_messages(transcript: str, checklist: Optional[List[str]] = None) -> List[Dict]:
+    """Messages for one combined analysis request; only the user message varies between calls"""
+    checklist_text = "\n".join(f"- {item}" for item in checklist) if checklist else "(no checklist)"
+    return [
+        {"role": "system", "content": CALL_ANALYSIS_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Checklist:\n{checklist_text}\n\nConversation:\n{transcript}"},
+    ]
+
+
+def _valid_items(model, items) -> List:
+    valid = []
+    for item in items if isinstance(items, list) else []:
+        try:
+            valid.append(model(**item))
+        except (TypeError, ValidationError):
+            continue
+    return valid
+
+
+def parse_call_analysis(response_text: str) -> CallAnalysis:
+    """
+    Parse and validate a combined analysis response
+
+    A response that fails validation as a whole keeps the sections that are valid on
+    their own (invalid events or matches are dropped one by one), so one malformed
+    field doesn't discard the rest of the analysis.
+    """
+    try:
+        data, _ = extract_json(response_text)
+    except ValueError:
+        logger.warning(f"Failed to parse call analysis response: {(response_text or '')[:500]}")
+        return CallAnalysis()
+    if not isinstance(data, dict):
+        return CallAnalysis()
+
+    try:
+        return CallAnalysis(**data)
+    except ValidationError as e:
+        logger.warning(f"Call analysis response failed validation, keeping valid sections: {e}")
+
+    details = data.get('details')
+    try:
+        details = CallDetails(**details) if isinstance(details, dict) else CallDetails()
+    except ValidationError:
+        details = CallDetails()
+    return CallAnalysis(
+        summary=data['summary'] if isinstance(data.get('summary'), str) else "",
+        events=_valid_items(KeyEvent, data.get('events')),
+        details=details,
+        checklist_matches=_valid_items(ChecklistMatch, data.get('checklist_matches')),
+    )
+
+
+def normalize_details(details: CallDetails) -> Dict:
+    """Details in the /api/analyze-call-details response shape, with values kept in range"""
+    return {
+        "sentiment_score": round(min(max(details.sentiment_score, 1.0), 5.0), 2),
+        "topics": details.topics[:3],
+        "flags": details.flags,
+        "call_type": details.call_type if details.call_type in CALL_TYPES else "other",
+    }
@@ -0,0 +1,354 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CallSource(ABC):
+    """Base class for sources that yield newly inserted `calls` rows"""
+
+    async def start(self):
+        """Connect to the underlying notification channel"""
+
+    @abstractmethod
+    def stream(self) -> AsyncIterator[Dict]:
+        """Yield calls as they become available"""
+
+    async def close(self):
+        """Release any connection held by the source"""
+
+
+class LocalCallSource(CallSource):
+    """In-process stand-in for database notifications, used by tests and local runs"""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def publish(self, call: Dict):
+        """Simulate an INSERT on the calls table"""
+        self._queue.put_nowait(call)
+
+    async def stream(self) -> AsyncIterator[Dict]:
+        while True:
+            yield await self._queue.get()
+
+
+class IteratorCallSource(CallSource):
+    """Adapt an async iterator of calls (e.g. a paginated backlog fetch) to a source"""
+
+    def __init__(self, calls: AsyncIterator[Dict]):
+        self.calls = calls
+
+    async def stream(self) -> AsyncIterator[Dict]:
+        async for call in self.calls:
+            yield call
+
+    async def close(self):
+        aclose = getattr(self.calls, 'aclose', None)
+        if aclose:
+            await aclose()
+
+
+class PollingCallSource(CallSource):
+    """
+    Poll for unprocessed calls and emit each new one
+
+    Every poll pages forward through the unprocessed calls with a (created_at, id)
+    keyset cursor until it reaches the end, then wraps around so the next poll starts
+    from the oldest call again. Calls that are stuck or keep failing therefore never
+    hide newer ones, however many there are.
+
+    A call that is still unprocessed `retry_delay` seconds after it was emitted (its
+    processing failed, or the run stopped before starting it) is emitted again, with
+    the delay doubling on every retry up to `max_retry_delay`. Calls still in flight
+    when that happens are deduplicated by the worker pool. The retry state is kept in
+    an LRU of at most `max_tracked` calls; calls not seen by a poll for `state_ttl`
+    seconds (processed, or deleted) are forgotten.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[Optional[Tuple[str, str]]], List[Dict]],
+        interval: float = 30.0,
+        retry_delay: float = 300.0,
+        max_retry_delay: float = 3600.0,
+        page_size: int = 500,
+        max_tracked: int = 100000,
+        state_ttl: float = 86400.0,
+    ):
+        """
+        Args:
+            fetch: Blocking callable returning up to page_size unprocessed calls ordered by
+                (created_at, id), starting after the given keyset (None for the oldest)
+            interval: Seconds between polls
+            retry_delay: Seconds before a call that is still unprocessed is emitted again
+            max_retry_delay: Upper bound of the doubling retry delay
+            page_size: Number of calls fetch returns per page; a shorter page ends a poll
+            max_tracked: Maximum number of calls whose retry state is remembered
+            state_ttl: Seconds after which the retry state of a call no poll has seen is dropped
+        """
+        self.fetch = fetch
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.page_size = page_size
+        self.max_tracked = max_tracked
+        self.state_ttl = state_ttl
+        # Call id -> (time it may be emitted again, times emitted, last seen), least recently seen first
+        self._emitted: OrderedDict = OrderedDict()
+
+    def _due(self, call_id) -> bool:
+        """Whether to emit a call now, recording the emission if so"""
+        now = time.monotonic()
+        retry_at, emissions, _ = self._emitted.get(call_id, (now, 0, now))
+        if now < retry_at:
+            self._emitted[call_id] = (retry_at, emissions, now)
+            self._emitted.move_to_end(call_id)
+            return False
+        if emissions:
+            logger.info(f"Call {call_id} is still unprocessed, emitting it again (retry {emissions})")
+        delay = min(self.max_retry_delay, self.retry_delay * 2 ** emissions)
+        self._emitted[call_id] = (now + delay, emissions + 1, now)
+        self._emitted.move_to_end(call_id)
+        return True
+
+    def _prune(self):
+        """Drop retry state of calls not seen for state_ttl and keep at most max_tracked"""
+        expired_before = time.monotonic() - self.state_ttl
+        while self._emitted:
+            call_id, (_, _, last_seen) = next(iter(self._emitted.items()))
+            if last_seen >= expired_before and len(self._emitted) <= self.max_tracked:
+                break
+            del self._emitted[call_id]
+
+    async def stream(self) -> AsyncIterator[Dict]:
+        while True:
+            after = None
+            while True:
+                try:
+                    calls = await asyncio.to_thread(self.fetch, after)
+                except Exception as e:
+                    logger.error(f"Polling for new calls failed: {str(e)}")
+                    break
+
+                for call in calls:
+                    if self._due(call['id']):
+                        yield call
+                self._prune()
+
+                if len(calls) < self.page_size:
+                    break
+                after = (calls[-1]['created_at'], calls[-1]['id'])
+
+            await asyncio.sleep(self.interval)
+
+
+class RealtimeCallSource(CallSource):
+    """Subscribe to INSERTs on `calls` through Supabase Realtime (Postgres logical replication)"""
+
+    def __init__(self, supabase_url: str, supabase_key: str, channel_name: str = 'calls-inserts'):
+        self.supabase_url = supabase_url
+        self.supabase_key = supabase_key
+        self.channel_name = channel_name
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._client = None
+        self._channel = None
+
+    def _on_insert(self, payload: Dict):
+        data = payload.get('data', payload)
+        record = data.get('record') or data.get('new') or payload.get('new')
+        if not record:
+            logger.warning(f"Ignoring realtime payload without a record: {payload}")
+            return
+        if record.get('processed'):
+            return
+        self._queue.put_nowait(record)
+
+    async def start(self):
+        from supabase import acreate_client
+
+        self._client = await acreate_client(self.supabase_url, self.supabase_key)
+        self._channel = self._client.channel(self.channel_name)
+        await self._channel.on_postgres_changes(
+            'INSERT',
+            schema='public',
+            table='calls',
+            callback=self._on_insert
+        ).subscribe()
+        logger.info("Subscribed to calls inserts via Supabase Realtime")
+
+    async def stream(self) -> AsyncIterator[Dict]:
+        while True:
+            yield await self._queue.get()
+
+    async def close(self):
+        if self._channel is not None:
+            try:
+                await self._channel.unsubscribe()
+            except Exception as e:
+                logger.warning(f"Error unsubscribing from realtime channel: {str(e)}")
+            self._channel = None
+
+
+class CallWorkerPool:
+    """
+    Feed calls from one or more sources to a bounded set of workers.
+
+    A call id is only handed to a worker once while it is in flight or recently
+    finished, so a call seen both by the startup catch-up and by a notification is
+    processed once. Calls whose processing failed are forgotten so a source can
+    offer them again (see PollingCallSource). stop() stops intake and lets in-flight calls finish; calls that
+    were queued but not started stay unprocessed in the database for the next run.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict], Awaitable[Dict]],
+        concurrency: int = 4,
+        recent_ids_size: int = 10000,
+        scheduler=None,
+    ):
+        """
+        Args:
+            handler: Coroutine function processing one call and returning its result dict
+            concurrency: Number of workers
+            recent_ids_size: How many finished call ids to remember for deduplication
+            scheduler: Optional queue deciding the order calls are handed to workers
+                (e.g. FairCallScheduler); defaults to a FIFO queue
+        """
+        self.handler = handler
+        self.concurrency = concurrency
+        self.scheduler = scheduler
+        self.recent_ids_size = recent_ids_size
+        self.results: List[Dict] = []
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._in_flight = set()
+        self._recent_ids: OrderedDict = OrderedDict()
+        self._sources: List[CallSource] = []
+        self._feeders: List[asyncio.Task] = []
+        self._running = False
+        self._limit: Optional[int] = None
+        self._started = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def stop(self):
+        """Stop accepting new calls; in-flight calls are drained"""
+        if self._stop_event and not self._stop_event.is_set():
+            logger.info(f"Stopping: draining {len(self._in_flight)} in-flight call(s)")
+            self._stop_event.set()
+
+    def add_source(self, source: CallSource):
+        """Start pulling calls from another source while run() is in progress"""
+        if not self._running:
+            raise RuntimeError("Sources can only be added while the pool is running")
+        self._sources.append(source)
+        self._feeders.append(asyncio.create_task(self._feed(source)))
+
+    def _accept(self, call: Dict) -> bool:
+        call_id = call.get('id')
+        if call_id is None or call_id in self._in_flight or call_id in self._recent_ids:
+            return False
+        self._recent_ids[call_id] = True
+        if len(self._recent_ids) > self.recent_ids_size:
+            self._recent_ids.popitem(last=False)
+        return True
+
+    async def _feed(self, source: CallSource):
+        async for call in source.stream():
+            if self._stop_event.is_set():
+                break
+            if self._accept(call):
+                await self._queue.put(call)
+
+    async def _worker(self):
+        while True:
+            call = await self._queue.get()
+            if call is None:
+                return
+            if self._stop_event.is_set():
+                # Stopped while queued: leave it for the next run
+                continue
+            self._started += 1
+            if self._limit is not None and self._started >= self._limit:
+                logger.info(f"Reached the limit of {self._limit} calls")
+                self._stop_event.set()
+            self._in_flight.add(call['id'])
+            try:
+                result = await self.handler(call)
+            except Exception as e:
+                logger.error(f"Error processing call {call['id']}: {str(e)}")
+                result = {'success': False, 'call_id': call['id'], 'error': str(e)}
+            finally:
+                self._in_flight.discard(call['id'])
+            if not (isinstance(result, dict) and result.get('success')):
+                self._recent_ids.pop(call['id'], None)
+            if isinstance(result, dict) and 'queue_wait' in call:
+                result.setdefault('queue_wait', call['queue_wait'])
+            self.results.append(result)
+
+    async def run(self, *sources: CallSource, stop_when_exhausted: bool = False, limit: Optional[int] = None):
+        """
+        Process calls from the sources until stop() is called
+
+        Args:
+            sources: Sources to pull calls from
+            stop_when_exhausted: Also finish once every source has run out of calls,
+                after the calls already queued have been processed
+            limit: Stop once this many calls have been handed to workers; which calls
+                those are is decided by the scheduler, as for any other call
+        """
+        self._stop_event = asyncio.Event()
+        self._limit = limit
+        self._started = 0
+        # Without a scheduler, queue only as many calls as there are workers; the rest stay in the source
+        self._queue = self.scheduler if self.scheduler is not None else asyncio.Queue(maxsize=self.concurrency)
+
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._sources = []
+        self._feeders = []
+        self._running = True
+        for source in sources:
+            self.add_source(source)
+        # Sources added later through add_source() don't hold up stop_when_exhausted
+        feeding = asyncio.gather(*self._feeders, return_exceptions=True)
+        stop_waiter = asyncio.create_task(self._stop_event.wait())
+
+        try:
+            waiting_on = {stop_waiter, feeding} if stop_when_exhausted else {stop_waiter}
+            await asyncio.wait(waiting_on, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self._running = False
+            for feeder in self._feeders:
+                feeder.cancel()
+            await feeding
+            for error in await asyncio.gather(*self._feeders, return_exceptions=True):
+                if isinstance(error, Exception):
+                    logger.error(f"Call source failed: {str(error)}")
+            stop_waiter.cancel()
+
+            if self._stop_event.is_set():
+                # Drop calls that were queued but never started
+                dropped = 0
+                while not self._queue.empty():
+                    if self._queue.get_nowait() is not None:
+                        dropped += 1
+                if dropped:
+                    logger.info(f"{dropped} queued call(s) left for the next run")
+
+            for _ in workers:
+                await self._queue.put(None)
+            await asyncio.gather(*workers, return_exceptions=True)
+
+            for source in self._sources:
+                await source.close()
+
+        return self.results
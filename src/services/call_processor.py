@@ -17,11 +17,16 @@ import uuid
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from src.models.models import ProcessingSettings
 from src.services.transcription_service import ElevenLabsTranscriptionService
+from src.services.call_feed import CallWorkerPool, IteratorCallSource, PollingCallSource, RealtimeCallSource
+from src.services.call_scheduler import DEFAULT_ORGANIZATION, FairCallScheduler
 
 load_dotenv()
 console = Console()
 
 class CallProcessor:
+    # Only the columns the processing pipeline needs, plus the keyset columns
+    CALL_COLUMNS = 'id, recording_url, organization_id, duration, created_at'
+
     def __init__(self, skip_transcription=False, collect_stats=False, reprocess=False):
         self.supabase: Client = create_client(
             os.getenv('SUPABASE_URL'),
@@ -34,6 +39,7 @@ class CallProcessor:
         self.reprocess = reprocess
         self.settings = ProcessingSettings()
         self.transcription_service = ElevenLabsTranscriptionService(api_key=os.getenv('ELEVENLABS_API_KEY'))
+        self.worker_pool = None
         
         # Set up logging
         self.setup_logging()
@@ -77,38 +83,87 @@ class CallProcessor:
         console.print(f"[bold blue]Starting processing run [/bold blue][bold green]{self.run_id}[/bold green]")
         console.print(f"[blue]Detailed logs will be saved to: [/blue][cyan]{logs_dir / self.log_filename}[/cyan]")
         
-    def fetch_unprocessed_calls(self, limit=None):
-        """Fetch calls from the calls table with optional limit"""
-        console.print("[bold blue]Fetching calls...[/bold blue]")
-        self.file_logger.info("Fetching calls")
-        
-        query = self.supabase.table('calls') \
-            .select('id, recording_url, organization_id')
-        
-        # Only filter by processed=False if reprocess is False
+    def _fetch_organization_ids(self, page_size=1000):
+        """
+        Fetch the ids of all organizations, plus DEFAULT_ORGANIZATION for calls without one
+        """
+        organization_ids = []
+        while True:
+            query = self.supabase.table('organizations').select('id').order('id').limit(page_size)
+            if organization_ids:
+                query = query.gt('id', organization_ids[-1])
+            page = query.execute().data
+            organization_ids.extend(row['id'] for row in page)
+            if len(page) < page_size:
+                return organization_ids + [DEFAULT_ORGANIZATION]
+
+    def _fetch_calls_page(self, after=None, page_size=500, organization=None):
+        """
+        Fetch one page of calls ordered by (created_at, id)
+
+        Args:
+            after: Optional (created_at, id) keyset of the last row of the previous page
+            page_size: Maximum number of rows to return
+            organization: Only return calls of this organization (DEFAULT_ORGANIZATION
+                for calls without one); None returns calls of every organization
+        """
+        query = self.supabase.table('calls').select(self.CALL_COLUMNS)
         if not self.reprocess:
             query = query.eq('processed', False)
-            console.print("[yellow]Only fetching unprocessed calls[/yellow]")
-            self.file_logger.info("Only fetching unprocessed calls")
-        else:
-            console.print("[yellow]Fetching all calls (including processed ones)[/yellow]")
-            self.file_logger.info("Fetching all calls (including processed ones)")
-        
-        # Apply limit if specified
-        if limit is not None:
-            query = query.limit(limit)
-            self.file_logger.info(f"Limiting to {limit} calls")
-        
-        response = query.execute()
-        call_count = len(response.data)
-        
-        console.print(f"[green]Found {call_count} calls[/green]")
-        self.file_logger.info(f"Found {call_count} calls")
-        
-        if limit is not None and call_count > 0:
-            console.print(f"[yellow]Limited to processing {limit} calls[/yellow]")
-        
+        if organization == DEFAULT_ORGANIZATION:
+            query = query.is_('organization_id', 'null')
+        elif organization is not None:
+            query = query.eq('organization_id', organization)
+        if after is not None:
+            created_at, call_id = after
+            query = query.or_(
+                f'created_at.gt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.gt.{call_id})'
+            )
+        response = query.order('created_at').order('id').limit(page_size).execute()
         return response.data
+
+    async def iter_unprocessed_calls(self, page_size=500, limit=None, organization=None):
+        """
+        Stream the backlog page by page using (created_at, id) keyset pagination.
+
+        The next page is requested as soon as the current one arrives, so callers can
+        start working on the first page while later pages are still being fetched.
+        Keyset pagination keeps a stable order even while calls are being marked
+        processed underneath it. `organization` limits the stream to one organization
+        (see _fetch_calls_page).
+        """
+        self.file_logger.info(
+            f"Streaming calls with page_size={page_size}, limit={limit}, organization={organization}"
+        )
+        remaining = limit
+        next_page = asyncio.create_task(asyncio.to_thread(
+            self._fetch_calls_page, None, page_size if limit is None else min(page_size, limit), organization
+        ))
+        pages = 0
+        try:
+            while next_page is not None:
+                page = await next_page
+                next_page = None
+                pages += 1
+
+                if remaining is not None:
+                    page = page[:remaining]
+                    remaining -= len(page)
+                self.file_logger.info(f"Fetched page {pages} with {len(page)} calls")
+
+                if page and len(page) >= page_size and (remaining is None or remaining > 0):
+                    last = page[-1]
+                    size = page_size if remaining is None else min(page_size, remaining)
+                    next_page = asyncio.create_task(asyncio.to_thread(
+                        self._fetch_calls_page, (last['created_at'], last['id']), size, organization
+                    ))
+
+                for call in page:
+                    yield call
+        finally:
+            if next_page is not None:
+                next_page.cancel()
         
     async def process_call(self, call_id: str, recording_url: str, organization_id: str):
         """Process a single call"""
@@ -136,10 +191,12 @@ class CallProcessor:
                 console.print("[yellow]Checking for existing transcription...[/yellow]")
                 call_logger.info("Checking for existing transcription")
                 
-                existing_analytics = self.supabase.table('call_analytics') \
-                    .select('transcription') \
-                    .eq('call_id', call_id) \
-                    .execute()
+                existing_analytics = await asyncio.to_thread(
+                    self.supabase.table('call_analytics')
+                    .select('transcription')
+                    .eq('call_id', call_id)
+                    .execute
+                )
                 
                 call_logger.debug(f"Existing analytics query response: {json.dumps(existing_analytics.data)}")
                     
@@ -159,7 +216,7 @@ class CallProcessor:
                 console.print("[yellow]Downloading audio file...[/yellow]")
                 call_logger.info("Downloading audio file")
                 
-                response = requests.get(recording_url)
+                response = await asyncio.to_thread(requests.get, recording_url)
                 response.raise_for_status()
                 
                 console.print("[green]✓ Audio file downloaded successfully[/green]")
@@ -177,7 +234,8 @@ class CallProcessor:
                 
                 # Use the ElevenLabs transcription service
                 call_logger.info("Sending transcription request to ElevenLabs")
-                transcription_segments = self.transcription_service.transcribe_from_bytes(
+                transcription_segments = await asyncio.to_thread(
+                    self.transcription_service.transcribe_from_bytes,
                     audio_bytes=response.content,
                     language_code=language_code,
                     num_speakers=num_speakers
@@ -202,7 +260,8 @@ class CallProcessor:
                     
                     # Retry transcription with 3 speakers
                     call_logger.info("Sending transcription request to ElevenLabs with 3 speakers")
-                    transcription_segments = self.transcription_service.transcribe_from_bytes(
+                    transcription_segments = await asyncio.to_thread(
+                        self.transcription_service.transcribe_from_bytes,
                         audio_bytes=response.content,
                         language_code=language_code,
                         num_speakers=num_speakers
@@ -254,7 +313,8 @@ class CallProcessor:
             }
             call_logger.debug(f"Events analysis request: {json.dumps(events_request)}")
             
-            events_response = requests.post(
+            events_response = await asyncio.to_thread(
+                requests.post,
                 f"{self.api_url}/api/analyze-events",
                 json=events_request
             )
@@ -298,7 +358,8 @@ class CallProcessor:
             }
             call_logger.debug(f"Summary request: {json.dumps(summary_request)}")
             
-            summary_response = requests.post(
+            summary_response = await asyncio.to_thread(
+                requests.post,
                 f"{self.api_url}/api/summarize-conversation",
                 json=summary_request
             )
@@ -342,7 +403,8 @@ class CallProcessor:
             }
             call_logger.debug(f"Call details request: {json.dumps(details_request)}")
             
-            details_response = requests.post(
+            details_response = await asyncio.to_thread(
+                requests.post,
                 f"{self.api_url}/api/analyze-call-details",
                 json=details_request
             )
@@ -380,38 +442,46 @@ class CallProcessor:
             }
             
             # Check if analytics record exists
-            existing_record = self.supabase.table('call_analytics') \
-                .select('*') \
-                .eq('call_id', call_id) \
-                .execute()
+            existing_record = await asyncio.to_thread(
+                self.supabase.table('call_analytics')
+                .select('*')
+                .eq('call_id', call_id)
+                .execute
+            )
             
             call_logger.debug(f"Existing record check response: {json.dumps(existing_record.data)}")
                 
             if existing_record.data:
                 # Update existing record
                 call_logger.info("Updating existing analytics record")
-                self.supabase.table('call_analytics') \
-                    .update(analytics_data) \
-                    .eq('call_id', call_id) \
-                    .execute()
+                await asyncio.to_thread(
+                    self.supabase.table('call_analytics')
+                    .update(analytics_data)
+                    .eq('call_id', call_id)
+                    .execute
+                )
                 console.print("[green]✓ Analytics data updated successfully[/green]")
                 call_logger.info("Analytics data updated successfully")
             else:
                 # Insert new record
                 call_logger.info("Inserting new analytics record")
-                self.supabase.table('call_analytics') \
-                    .insert(analytics_data) \
-                    .execute()
+                await asyncio.to_thread(
+                    self.supabase.table('call_analytics')
+                    .insert(analytics_data)
+                    .execute
+                )
                 console.print("[green]✓ Analytics data inserted successfully[/green]")
                 call_logger.info("Analytics data inserted successfully")
                 
             # Mark call as processed
             call_logger.info("Marking call as processed")
             now = datetime.datetime.now(datetime.timezone.utc).isoformat()
-            self.supabase.table('calls') \
-                .update({'processed': True, 'updated_at': now}) \
-                .eq('id', call_id) \
-                .execute()
+            await asyncio.to_thread(
+                self.supabase.table('calls')
+                .update({'processed': True, 'updated_at': now})
+                .eq('id', call_id)
+                .execute
+            )
             console.print("[green]✓ Call marked as processed[/green]")
             call_logger.info("Call marked as processed")
             
@@ -453,32 +523,41 @@ class CallProcessor:
                 'processing_time': total_time
             }
     
-    async def process_all_calls(self, limit=None):
-        """Process unprocessed calls with optional limit"""
-        self.file_logger.info(f"Starting process_all_calls with limit={limit}")
-        
-        unprocessed_calls = self.fetch_unprocessed_calls(limit)
-        if not unprocessed_calls:
+    async def process_all_calls(self, limit=None, concurrency=4, page_size=500, scheduler=None, stats_interval=300.0):
+        """
+        Process unprocessed calls with optional limit, streaming the backlog page by page.
+
+        Each organization's backlog (calls without one share a default bucket) is
+        streamed with its own keyset cursor into the scheduler, which shares the workers
+        between organizations by weighted round-robin. An organization's bulk import
+        therefore only delays its own calls, however much older than the others' it is.
+        The limit applies to the total over all organizations, picked by the scheduler
+        like any other calls. Queue-wait percentiles
+        are logged every stats_interval seconds (0 disables).
+        """
+        self.file_logger.info(f"Starting process_all_calls with limit={limit}, concurrency={concurrency}")
+        console.print("[bold blue]Streaming calls...[/bold blue]")
+        if not self.reprocess:
+            console.print("[yellow]Only fetching unprocessed calls[/yellow]")
+        else:
+            console.print("[yellow]Fetching all calls (including processed ones)[/yellow]")
+
+        scheduler = scheduler or FairCallScheduler()
+        self.worker_pool = CallWorkerPool(self._process_queued_call, concurrency=concurrency, scheduler=scheduler)
+
+        organization_ids = await asyncio.to_thread(self._fetch_organization_ids)
+        sources = [
+            IteratorCallSource(self.iter_unprocessed_calls(page_size=page_size, limit=limit, organization=org_id))
+            for org_id in organization_ids
+        ]
+        results = await self._run_worker_pool(
+            scheduler, stats_interval, *sources, stop_when_exhausted=True, limit=limit
+        )
+
+        if not results:
             console.print("[yellow]No unprocessed calls found[/yellow]")
             self.file_logger.info("No unprocessed calls found")
             return []
-            
-        console.print(f"\n[bold]Starting processing of {len(unprocessed_calls)} calls[/bold]")
-        self.file_logger.info(f"Starting processing of {len(unprocessed_calls)} calls")
-        
-        tasks = []
-        
-        for call in unprocessed_calls:
-            task = asyncio.create_task(
-                self.process_call(
-                    call['id'], 
-                    call['recording_url'],
-                    call['organization_id']
-                )
-            )
-            tasks.append(task)
-        
-        results = await asyncio.gather(*tasks)
         
         # Print summary
         successful = sum(1 for r in results if r['success'])
@@ -492,6 +571,7 @@ class CallProcessor:
         ))
         
         self.file_logger.info(f"Processing completed. Total: {len(results)}, Successful: {successful}, Failed: {failed}")
+        self._display_queue_wait_stats(scheduler)
         
         # Calculate and display detailed stats if enabled
         if self.collect_stats and results:
@@ -499,6 +579,140 @@ class CallProcessor:
         
         return results
 
+    async def _process_queued_call(self, call):
+        """Worker pool handler; process_call offloads its blocking HTTP and database calls to threads"""
+        return await self.process_call(call['id'], call['recording_url'], call['organization_id'])
+
+    async def follow(self, concurrency=4, poll_interval=30.0, use_realtime=True, reconcile_interval=300.0,
+                     scheduler=None, stats_interval=300.0):
+        """
+        Process calls continuously as they are inserted until stop_following() is called.
+
+        New calls arrive through Supabase Realtime when available, otherwise by polling
+        every poll_interval seconds. With realtime, a slow reconciliation poll still runs
+        to catch the backlog and any inserts missed while disconnected. Each organization
+        is polled with its own cursor, so one organization's backlog cannot hide the
+        others' new calls; organizations created while following are picked up at the
+        next poll. Queue-wait percentiles are logged every stats_interval seconds (0 disables).
+        """
+        self.file_logger.info(f"Starting follow mode with concurrency={concurrency}")
+        scheduler = scheduler or FairCallScheduler()
+        self.worker_pool = CallWorkerPool(self._process_queued_call, concurrency=concurrency, scheduler=scheduler)
+
+        sources = []
+        if use_realtime:
+            realtime_source = RealtimeCallSource(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY'))
+            try:
+                await realtime_source.start()
+                sources.append(realtime_source)
+                console.print("[green]✓ Subscribed to new calls via Supabase Realtime[/green]")
+                self.file_logger.info("Subscribed to new calls via Supabase Realtime")
+            except Exception as e:
+                console.print(f"[yellow]Realtime unavailable, falling back to polling: {str(e)}[/yellow]")
+                self.file_logger.warning(f"Realtime unavailable, falling back to polling: {str(e)}")
+
+        interval = reconcile_interval if sources else poll_interval
+
+        def polling_source(org_id):
+            # Pages through the organization's backlog on every poll; in-flight calls are deduplicated by the pool
+            return PollingCallSource(
+                lambda after: self._fetch_calls_page(after, page_size=500, organization=org_id), interval
+            )
+
+        organization_ids = set(await asyncio.to_thread(self._fetch_organization_ids))
+        sources.extend(polling_source(org_id) for org_id in sorted(organization_ids))
+        console.print(f"[bold blue]Following new calls (polling every {interval:.0f}s)[/bold blue]")
+
+        discovery = asyncio.create_task(self._poll_new_organizations(organization_ids, interval, polling_source))
+        try:
+            results = await self._run_worker_pool(scheduler, stats_interval, *sources)
+        finally:
+            discovery.cancel()
+
+        successful = sum(1 for r in results if r.get('success'))
+        console.print(Panel(
+            f"[bold]Follow Mode Summary[/bold]\n"
+            f"Total Calls: {len(results)}\n"
+            f"[green]✓ Successful: {successful}[/green]\n"
+            f"[red]✗ Failed: {len(results) - successful}[/red]"
+        ))
+        self.file_logger.info(f"Follow mode stopped. Total: {len(results)}, Successful: {successful}")
+        self._display_queue_wait_stats(scheduler)
+
+        if self.collect_stats and results:
+            self._display_detailed_stats(results)
+
+        return results
+
+    async def _poll_new_organizations(self, known_ids, interval, make_source):
+        """Add a polling source to the running worker pool for every organization created later"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                organization_ids = await asyncio.to_thread(self._fetch_organization_ids)
+                for org_id in organization_ids:
+                    if org_id not in known_ids:
+                        self.worker_pool.add_source(make_source(org_id))
+                        known_ids.add(org_id)
+                        self.file_logger.info(f"Polling calls of new organization {org_id}")
+            except Exception as e:
+                self.file_logger.error(f"Polling for new organizations failed: {str(e)}")
+
+    async def _run_worker_pool(self, scheduler, stats_interval, *sources, **options):
+        """Run the worker pool, logging queue-wait stats periodically while it runs"""
+        reporter = asyncio.create_task(self._report_queue_wait_stats(scheduler, stats_interval)) if stats_interval else None
+        try:
+            return await self.worker_pool.run(*sources, **options)
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+
+    async def _report_queue_wait_stats(self, scheduler, interval):
+        while True:
+            await asyncio.sleep(interval)
+            stats = self._log_queue_wait_stats(scheduler)
+            if stats['count']:
+                console.print(
+                    f"[blue]⏳ Queue wait p50={stats['p50']:.2f}s p95={stats['p95']:.2f}s "
+                    f"max={stats['max']:.2f}s over {stats['count']} calls, {len(scheduler)} queued[/blue]"
+                )
+
+    def stop_following(self):
+        """Stop taking new calls and drain the ones in flight"""
+        if self.worker_pool:
+            self.worker_pool.stop()
+
+    def _log_queue_wait_stats(self, scheduler):
+        """Write the scheduler's queue-wait percentiles, overall and per organization, to the log file"""
+        stats = scheduler.wait_stats()
+        if stats['count']:
+            self.file_logger.info(
+                f"Queue wait: mean={stats['mean']:.2f}s p50={stats['p50']:.2f}s "
+                f"p95={stats['p95']:.2f}s max={stats['max']:.2f}s over {stats['count']} calls"
+            )
+            for org_id, org_stats in stats['organizations'].items():
+                self.file_logger.info(
+                    f"  {org_id}: count={org_stats['count']} p95={org_stats['p95']:.2f}s max={org_stats['max']:.2f}s"
+                )
+        return stats
+
+    def _display_queue_wait_stats(self, scheduler):
+        """Display how long calls waited in the scheduler before a worker picked them up"""
+        stats = self._log_queue_wait_stats(scheduler)
+        if not stats['count']:
+            return
+
+        lines = [
+            "[bold cyan]Queue Wait[/bold cyan]",
+            f"Mean: {stats['mean']:.2f}s  P50: {stats['p50']:.2f}s  P95: {stats['p95']:.2f}s  Max: {stats['max']:.2f}s",
+            "",
+            "[bold]Per Organization (P95 / Max):[/bold]",
+        ]
+        for org_id, org_stats in stats['organizations'].items():
+            lines.append(f"{org_id}: {org_stats['p95']:.2f}s / {org_stats['max']:.2f}s ({org_stats['count']} calls)")
+
+        console.print(Panel("\n".join(lines), title="⏳ Scheduler", border_style="blue"))
+
     def _display_detailed_stats(self, results):
         """Calculate and display detailed statistics about the processing run"""
         self.file_logger.info("Calculating detailed statistics")
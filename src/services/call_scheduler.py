@@ -0,0 +1,191 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional
+
+from src.utils.stats import percentile
+
+DEFAULT_PRIORITY = 0
+# Bucket for calls without an organization (organization_id is nullable)
+DEFAULT_ORGANIZATION = 'default'
+
+
+class FairCallScheduler:
+    """
+    Queue in front of CallProcessor.process_call that shares workers fairly between organizations.
+
+    Ordering rules, in order of precedence:
+    1. Calls with a lower priority value are always served first. The priority comes
+       from `priority_overrides[call_id]`, then the call's own `priority` field, then
+       DEFAULT_PRIORITY.
+    2. Among calls of the same priority, organizations are served by weighted
+       round-robin: an organization with weight 3 gets three calls for every one call
+       of an organization with weight 1.
+    3. Within an organization, calls are served shortest `duration` first when
+       `shortest_first` is enabled, otherwise in arrival order.
+
+    Calls without an organization share the DEFAULT_ORGANIZATION bucket.
+
+    The scheduler has the same put/get/empty/get_nowait surface as asyncio.Queue so
+    CallWorkerPool can use either. put() blocks while `max_queued` calls are waiting,
+    which bounds the buffer like a sized asyncio.Queue, and, when `max_queued_per_org`
+    is set, while the call's organization already has that many calls waiting. When
+    several organizations are blocked in put(), freed room goes to the one with the
+    fewest calls waiting, so feeding each organization from its own source keeps a
+    bulk import from filling the buffer. Fairness applies to the calls in the buffer:
+    a single ordered stream is only interleaved within a window of `max_queued` calls.
+    Putting None queues a sentinel that is returned only once no calls are left.
+    """
+
+    def __init__(
+        self,
+        org_weights: Optional[Dict[str, int]] = None,
+        shortest_first: bool = False,
+        priority_overrides: Optional[Dict[str, int]] = None,
+        max_queued: Optional[int] = 100,
+        max_queued_per_org: Optional[int] = None,
+        default_weight: int = 1,
+        wait_history_size: int = 10000,
+    ):
+        self.org_weights = org_weights or {}
+        self.shortest_first = shortest_first
+        self.priority_overrides = priority_overrides or {}
+        self.max_queued = max_queued
+        self.max_queued_per_org = max_queued_per_org
+        self.default_weight = default_weight
+
+        self._queues: Dict[str, List] = defaultdict(list)
+        self._rotation: Deque[str] = deque()
+        self._credits: Dict[str, int] = {}
+        self._counter = itertools.count()
+        self._size = 0
+        self._sentinels = 0
+        self._changed = asyncio.Condition()
+        # Organization -> number of put() calls waiting for room
+        self._blocked: Dict[str, int] = defaultdict(int)
+
+        self._waits: Deque[float] = deque(maxlen=wait_history_size)
+        self._org_waits: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=wait_history_size))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0 and self._sentinels == 0
+
+    def _weight(self, org_id: str) -> int:
+        return max(1, int(self.org_weights.get(org_id, self.default_weight)))
+
+    @staticmethod
+    def _organization(call: Dict) -> str:
+        return call.get('organization_id') or DEFAULT_ORGANIZATION
+
+    def _has_room(self, org_id: str) -> bool:
+        if self.max_queued is not None and self._size >= self.max_queued:
+            return False
+        queued = len(self._queues.get(org_id, ()))
+        if self.max_queued_per_org is not None and queued >= self.max_queued_per_org:
+            return False
+        # Let blocked organizations with fewer calls waiting go first
+        return not any(
+            len(self._queues.get(other, ())) < queued for other in self._blocked if other != org_id
+        )
+
+    def _priority(self, call: Dict) -> int:
+        override = self.priority_overrides.get(call.get('id'))
+        if override is not None:
+            return override
+        priority = call.get('priority')
+        return DEFAULT_PRIORITY if priority is None else priority
+
+    def _push(self, call: Dict):
+        org_id = self._organization(call)
+        duration = (call.get('duration') or 0) if self.shortest_first else 0
+        entry = (self._priority(call), duration, next(self._counter), time.monotonic(), call)
+        if not self._queues[org_id]:
+            self._rotation.append(org_id)
+            self._credits[org_id] = self._weight(org_id)
+        heapq.heappush(self._queues[org_id], entry)
+        self._size += 1
+
+    def _pop(self) -> Dict:
+        best_priority = min(self._queues[org][0][0] for org in self._rotation)
+
+        # Weighted round-robin over organizations that have a call at the best priority
+        for _ in range(len(self._rotation)):
+            org_id = self._rotation[0]
+            if self._queues[org_id][0][0] == best_priority and self._credits[org_id] > 0:
+                break
+            if self._credits[org_id] <= 0:
+                self._credits[org_id] = self._weight(org_id)
+            self._rotation.rotate(-1)
+        else:
+            org_id = next(org for org in self._rotation if self._queues[org][0][0] == best_priority)
+
+        _, _, _, enqueued_at, call = heapq.heappop(self._queues[org_id])
+        self._size -= 1
+        self._credits[org_id] -= 1
+
+        if not self._queues[org_id]:
+            self._rotation.remove(org_id)
+            del self._queues[org_id]
+            del self._credits[org_id]
+        elif self._credits[org_id] <= 0:
+            self._credits[org_id] = self._weight(org_id)
+            self._rotation.rotate(-1)
+
+        wait = time.monotonic() - enqueued_at
+        self._waits.append(wait)
+        self._org_waits[self._organization(call)].append(wait)
+        call['queue_wait'] = wait
+        return call
+
+    async def put(self, call: Optional[Dict]):
+        async with self._changed:
+            if call is None:
+                self._sentinels += 1
+            else:
+                org_id = self._organization(call)
+                self._blocked[org_id] += 1
+                try:
+                    await self._changed.wait_for(lambda: self._has_room(org_id))
+                finally:
+                    self._blocked[org_id] -= 1
+                    if not self._blocked[org_id]:
+                        del self._blocked[org_id]
+                self._push(call)
+            self._changed.notify_all()
+
+    def get_nowait(self) -> Optional[Dict]:
+        if self._size:
+            return self._pop()
+        if self._sentinels:
+            self._sentinels -= 1
+            return None
+        raise asyncio.QueueEmpty
+
+    async def get(self) -> Optional[Dict]:
+        async with self._changed:
+            await self._changed.wait_for(lambda: not self.empty())
+            item = self.get_nowait()
+            self._changed.notify_all()
+            return item
+
+    def wait_stats(self) -> Dict:
+        """Queue-wait statistics in seconds, overall and per organization"""
+        def summarize(waits):
+            waits = list(waits)
+            return {
+                'count': len(waits),
+                'mean': sum(waits) / len(waits) if waits else 0.0,
+                'p50': percentile(waits, 50),
+                'p95': percentile(waits, 95),
+                'max': max(waits) if waits else 0.0,
+            }
+
+        return {
+            **summarize(self._waits),
+            'organizations': {org: summarize(waits) for org, waits in self._org_waits.items()},
+        }
@@ -0,0 +1,147 @@
+import logging
+from typing import Dict, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+LISTING_COLUMNS = 'id, document_id, page_number, chunk_number'
+
+
+def fetch_document_titles(supabase) -> Dict[str, str]:
+    return {doc['id']: doc['title'] for doc in supabase.table('documents').select('id, title').execute().data}
+
+
+def iter_chunk_rows(supabase, columns: str, page_size: int = 1000) -> Iterator[List[Dict]]:
+    """Pages of document_chunks rows in id order (keyset pagination)"""
+    last_id = None
+    while True:
+        query = supabase.table('document_chunks').select(columns).order('id').limit(page_size)
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        page = query.execute().data
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]['id']
+
+
+def fetch_chunks_by_id(supabase, chunk_ids: List[str], columns: str, batch_size: int = 200) -> List[Dict]:
+    rows = []
+    for start in range(0, len(chunk_ids), batch_size):
+        rows.extend(
+            supabase.table('document_chunks').select(columns).in_('id', chunk_ids[start:start + batch_size]).execute().data
+        )
+    return rows
+
+
+class ChunkMirror:
+    """
+    Bookkeeping shared by the local copies of `document_chunks` (the vector and
+    lexical indexes)
+
+    Other workers, instances and direct database edits change chunks without going
+    through this process, so a persisted copy is reconciled against the database when
+    it is loaded and on every resync(): chunks missing locally are fetched and added,
+    chunks gone from the database are removed and moved chunks get their new
+    positions. Changes made by this process while a build or reconcile is running are
+    buffered and replayed once it finishes, so they are not lost to the rebuilt copy.
+
+    Subclasses set CHUNK_COLUMNS and implement load(), build_from_supabase(),
+    _local_positions() and _apply_sync(); they hold `self._lock` and call _defer()
+    at the start of every mutation.
+    """
+
+    CHUNK_COLUMNS = 'id, document_id, content, page_number, chunk_number'
+
+    def _init_mirror(self):
+        self._syncing = False
+        self._pending: List[Tuple[str, tuple]] = []
+
+    def _defer(self, method: str, *args) -> bool:
+        """Buffer a mutation while a sync runs; call with self._lock held"""
+        if self._syncing:
+            self._pending.append((method, args))
+            return True
+        return False
+
+    def _begin_sync(self):
+        with self._lock:
+            self._syncing = True
+
+    def _end_sync(self):
+        with self._lock:
+            self._syncing = False
+            pending, self._pending = self._pending, []
+        # Replayed changes are idempotent, so it doesn't matter if the sync already saw them
+        for method, args in pending:
+            getattr(self, method)(*args)
+        if pending:
+            logger.info(f"{type(self).__name__}: replayed {len(pending)} change(s) made during sync")
+
+    def load(self) -> bool:
+        raise NotImplementedError
+
+    def build_from_supabase(self, supabase, page_size: int = 1000):
+        raise NotImplementedError
+
+    def _local_positions(self) -> Dict[str, Tuple]:
+        """Live chunk ids mapped to their (page_number, chunk_number)"""
+        raise NotImplementedError
+
+    def _apply_sync(self, titles: Dict[str, str], added: List[Dict], removed: List[str], moved: List[Dict]):
+        raise NotImplementedError
+
+    def reconcile(self, supabase, page_size: int = 1000) -> Dict[str, int]:
+        """Patch the local copy to match document_chunks; rebuilds when most of it is missing"""
+        remote = {
+            row['id']: row
+            for page in iter_chunk_rows(supabase, LISTING_COLUMNS, page_size)
+            for row in page
+        }
+        titles = fetch_document_titles(supabase)
+        local = self._local_positions()
+
+        missing = [chunk_id for chunk_id in remote if chunk_id not in local]
+        if remote and len(missing) > len(remote) // 2:
+            self.build_from_supabase(supabase, page_size)
+            return {'added': len(remote), 'removed': len(local), 'moved': 0, 'rebuilt': 1}
+
+        removed = [chunk_id for chunk_id in local if chunk_id not in remote]
+        moved = [
+            row for chunk_id, row in remote.items()
+            if chunk_id in local and local[chunk_id] != (row.get('page_number'), row.get('chunk_number'))
+        ]
+        added = fetch_chunks_by_id(supabase, missing, self.CHUNK_COLUMNS)
+        self._apply_sync(titles, added, removed, moved)
+        if added or removed or moved:
+            logger.info(
+                f"{type(self).__name__} reconciled: {len(added)} added, {len(removed)} removed, {len(moved)} moved"
+            )
+        return {'added': len(added), 'removed': len(removed), 'moved': len(moved), 'rebuilt': 0}
+
+    def load_or_build(self, supabase):
+        """Startup hook: load the persisted copy and reconcile it, or build it from the database"""
+        self._begin_sync()
+        try:
+            if self.load():
+                self.reconcile(supabase)
+            else:
+                self.build_from_supabase(supabase)
+        except Exception as e:
+            logger.error(f"{type(self).__name__} unavailable: {str(e)}")
+            self.ready = False
+        finally:
+            self._end_sync()
+
+    def resync(self, supabase):
+        """Periodic hook: reconcile a ready copy, or retry loading one that failed"""
+        if not self.ready:
+            self.load_or_build(supabase)
+            return
+        self._begin_sync()
+        try:
+            self.reconcile(supabase)
+        except Exception as e:
+            logger.warning(f"{type(self).__name__} resync failed: {str(e)}")
+        finally:
+            self._end_sync()
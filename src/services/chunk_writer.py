@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from typing import Dict, List
+
+from src.utils.provider_limiter import get_provider_limiter
+
+logger = logging.getLogger(__name__)
+
+# Rough size of a row's JSON keys, ids and numbers on top of its content and embedding
+ROW_OVERHEAD_BYTES = 200
+
+_vector_formats: Dict[int, str] = {}
+
+
+def encode_embedding(embedding: List[float]) -> str:
+    """
+    Encode an embedding as a pgvector text literal with 7 significant digits
+
+    That is all the precision a float32 vector column keeps, and the literal is about
+    half the size of the JSON float list it replaces.
+    """
+    fmt = _vector_formats.get(len(embedding))
+    if fmt is None:
+        fmt = _vector_formats[len(embedding)] = '[' + ','.join(['%.7g'] * len(embedding)) + ']'
+    return fmt % tuple(embedding)
+
+
+class BulkWriteError(Exception):
+    """Raised when some batches could not be written; `written_ids` lists the rows that were"""
+
+    def __init__(self, message: str, written_ids: List[str]):
+        super().__init__(message)
+        self.written_ids = written_ids
+
+
+class BulkChunkWriter:
+    """
+    Write document_chunks rows in large, concurrent batches.
+
+    Batches are closed at `max_batch_bytes` of estimated payload or `max_batch_rows`
+    rows, whichever comes first, and up to `max_concurrent_batches` are in flight at
+    once. Requests go through the 'supabase' provider limiter, which retries
+    throttled and failed requests with backoff. Rows carry client-generated ids and
+    are upserted on id, so retrying a batch that actually landed is harmless and an
+    interrupted write can be resumed by writing the same rows again. Rows without an
+    'embedding' only update the columns they carry on existing chunks.
+    """
+
+    def __init__(
+        self,
+        supabase,
+        table: str = 'document_chunks',
+        max_batch_bytes: int = 4 * 1024 * 1024,
+        max_batch_rows: int = 1000,
+        max_concurrent_batches: int = 4,
+    ):
+        self.supabase = supabase
+        self.table = table
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_rows = max_batch_rows
+        self.max_concurrent_batches = max_concurrent_batches
+        self.limiter = get_provider_limiter('supabase')
+
+    def _encode(self, rows: List[Dict]) -> List[Dict]:
+        return [
+            {**row, 'embedding': encode_embedding(row['embedding'])} if 'embedding' in row else row
+            for row in rows
+        ]
+
+    def _make_batches(self, rows: List[Dict]) -> List[List[Dict]]:
+        batches = []
+        current = []
+        current_bytes = 0
+        for row in rows:
+            # Embeddings dominate the payload: ~10 bytes per dimension once encoded
+            size = len(row['content'].encode('utf-8')) + 10 * len(row.get('embedding') or ()) + ROW_OVERHEAD_BYTES
+            if current and (len(current) >= self.max_batch_rows or current_bytes + size > self.max_batch_bytes):
+                batches.append(current)
+                current = []
+                current_bytes = 0
+            current.append(row)
+            current_bytes += size
+        if current:
+            batches.append(current)
+        return batches
+
+    def _insert(self, batch: List[Dict]):
+        return self.supabase.table(self.table).upsert(
+            batch, on_conflict='id', returning='minimal'
+        ).execute()
+
+    async def write(self, rows: List[Dict]) -> int:
+        """
+        Write rows, each with a client-generated 'id' and usually an 'embedding' float list
+
+        Returns:
+            Number of rows written
+
+        Raises:
+            BulkWriteError: if any batch still failed after retries
+        """
+        if not rows:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+        written: List[str] = []
+        errors: List[Exception] = []
+
+        async def write_batch(batch: List[Dict]):
+            async with semaphore:
+                if errors:
+                    # Don't start new batches once the write is known to have failed
+                    return
+                try:
+                    # Encoding is CPU-bound; keep it off the event loop and overlap it with other batches' I/O
+                    encoded = await asyncio.to_thread(self._encode, batch)
+                    await self.limiter.acall(lambda: self._insert(encoded))
+                    written.extend(row['id'] for row in batch)
+                except Exception as e:
+                    errors.append(e)
+
+        await asyncio.gather(*(write_batch(batch) for batch in self._make_batches(rows)))
+
+        if errors:
+            logger.error(f"Bulk write to {self.table} failed after {len(written)}/{len(rows)} rows: {errors[0]}")
+            raise BulkWriteError(f"Failed to write {len(rows) - len(written)} rows: {errors[0]}", written)
+        return len(written)
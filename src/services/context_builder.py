@@ -0,0 +1,157 @@
+from typing import Dict, List, Optional
+
+from src.services.lexical_index import tokenize
+
+
+def _similarity(a: set, b: set) -> float:
+    """Jaccard similarity of two term sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _containment(a: set, b: set) -> float:
+    """Share of the smaller term set that also appears in the other one"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def _merge_overlapping(first: str, second: str, max_words: int = 200) -> str:
+    """Join two adjacent chunks, dropping the start of `second` that repeats the end of `first`"""
+    first_words = first.split()
+    second_words = second.split()
+    for size in range(min(max_words, len(first_words), len(second_words)), 0, -1):
+        if first_words[-size:] == second_words[:size]:
+            return first + ' ' + ' '.join(second_words[size:]) if size < len(second_words) else first
+    return first + '\n' + second
+
+
+class ContextBuilder:
+    """
+    Pack retrieved chunks into a prompt context under a token budget.
+
+    1. Near-duplicates (chunks whose terms are mostly contained in an already
+       chosen chunk, e.g. overlapping neighbours) are dropped.
+    2. The rest are picked by maximal marginal relevance, trading retrieval rank
+       against term overlap with what is already chosen (`diversity` = 0 keeps
+       the retrieval order, 1 favours novelty only).
+    3. Chunks are added while the context stays within `max_tokens`, counted with
+       the generation model's tokenizer.
+    4. Chosen chunks that are adjacent on the same page are merged into one block
+       with their shared overlap removed.
+
+    Similarity is measured on normalized terms rather than embeddings, so packing
+    costs no API calls.
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        max_tokens: int = 3000,
+        max_chunks: Optional[int] = None,
+        diversity: float = 0.3,
+        duplicate_threshold: float = 0.8,
+    ):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.max_chunks = max_chunks
+        self.diversity = diversity
+        self.duplicate_threshold = duplicate_threshold
+        self._encode = getattr(tokenizer, 'encode_ordinary', tokenizer.encode)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._encode(text))
+
+    @staticmethod
+    def _format(block: Dict) -> str:
+        return f"Source: {block['source']}, Page: {block['page_number']}\n{block['content']}"
+
+    def _select(self, chunks: List[Dict], max_chunks: int) -> List[Dict]:
+        """Drop near-duplicates, then order the rest by maximal marginal relevance"""
+        candidates = []
+        for rank, chunk in enumerate(chunks):
+            terms = set(tokenize(chunk['content']))
+            if any(_containment(terms, other['terms']) >= self.duplicate_threshold for other in candidates):
+                continue
+            # Results arrive best first; rank is the one relevance signal every retriever provides
+            candidates.append({'chunk': chunk, 'terms': terms, 'relevance': 1.0 - rank / len(chunks)})
+
+        selected = []
+        while candidates and len(selected) < max_chunks:
+            def mmr(candidate):
+                redundancy = max((_similarity(candidate['terms'], s['terms']) for s in selected), default=0.0)
+                return (1 - self.diversity) * candidate['relevance'] - self.diversity * redundancy
+
+            best = max(candidates, key=mmr)
+            candidates.remove(best)
+            selected.append(best)
+        return [item['chunk'] for item in selected]
+
+    def _merge_adjacent(self, chunks: List[Dict]) -> List[Dict]:
+        """Merge chunks that follow each other on the same page, keeping blocks in selection order"""
+        blocks: List[Dict] = []
+        for chunk in chunks:
+            block = {
+                'document_id': chunk.get('document_id'),
+                'source': chunk.get('source'),
+                'page_number': chunk.get('page_number'),
+                'first': chunk.get('chunk_number'),
+                'last': chunk.get('chunk_number'),
+                'content': chunk['content'],
+                'chunks': [chunk],
+            }
+            blocks.append(block)
+
+        merged = True
+        while merged:
+            merged = False
+            for a in blocks:
+                for b in blocks:
+                    if (
+                        a is not b
+                        and a['first'] is not None and b['first'] is not None
+                        and a['document_id'] == b['document_id']
+                        and a['page_number'] == b['page_number']
+                        and b['first'] == a['last'] + 1
+                    ):
+                        a['content'] = _merge_overlapping(a['content'], b['content'])
+                        a['last'] = b['last']
+                        a['chunks'].extend(b['chunks'])
+                        blocks.remove(b)
+                        merged = True
+                        break
+                if merged:
+                    break
+        return blocks
+
+    def build(self, chunks: List[Dict], max_chunks: Optional[int] = None) -> Dict:
+        """
+        Build the context for a question from retrieved chunks (best first)
+
+        Returns:
+            Dict with `context` (the prompt text), `chunks` (the chunks used),
+            `blocks` (merged blocks) and `context_tokens`
+        """
+        limit = max_chunks or self.max_chunks or len(chunks)
+        chosen = []
+        blocks: List[Dict] = []
+        context_tokens = 0
+        for chunk in self._select(chunks, len(chunks)):
+            if len(chosen) >= limit:
+                break
+            candidate_blocks = self._merge_adjacent(chosen + [chunk])
+            tokens = self.count_tokens("\n\n".join(self._format(block) for block in candidate_blocks))
+            # Skip chunks that would overflow the budget; a shorter one further down may still fit
+            if tokens > self.max_tokens:
+                continue
+            chosen.append(chunk)
+            blocks = candidate_blocks
+            context_tokens = tokens
+
+        return {
+            'context': "\n\n".join(self._format(block) for block in blocks),
+            'chunks': chosen,
+            'blocks': blocks,
+            'context_tokens': context_tokens,
+        }
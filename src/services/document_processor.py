@@ -1,155 +1,45 @@
-from typing import List, Optional
-import fitz  # PyMuPDF
+from typing import Iterator, List, Optional
 from pathlib import Path
 import tiktoken
-import openai
 from src.models.document_models import DocumentChunk, DocumentMetadata
-import os
-import docx
-import asyncio
-from src.utils.openai_client import get_openai_client
-from openai import OpenAI
+from src.services.embedding_service import EmbeddingService
+from src.services.ingestion_pipeline import count_pages, iter_pages
+from src.services.text_chunker import TextChunker
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50, embedding_service: EmbeddingService = None):
         self.tokenizer = tiktoken.get_encoding("cl100k_base")
-        self.chunk_size = 1000
-        self.chunk_overlap = 200
-        self.openai_client = get_openai_client()
-        # Create a separate OpenAI client for embeddings
-        self.embeddings_client = OpenAI(
-            api_key=os.getenv('OPENAI_API_KEY'),
-        )
+        # Both sizes are in tokens; the overlap must stay below the chunk size
+        self.chunker = TextChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap, tokenizer=self.tokenizer)
+        self.embedding_service = embedding_service or EmbeddingService()
 
     async def process_document(self, file_path: str, metadata: DocumentMetadata) -> List[DocumentChunk]:
         """Process a document and return chunks"""
-        file_ext = Path(file_path).suffix.lower()
-        
-        if file_ext == '.pdf':
-            return await self._process_pdf(file_path, metadata)
-        elif file_ext == '.docx':
-            return await self._process_docx(file_path, metadata)
-        elif file_ext in ['.txt', '.md']:
-            return await self._process_text(file_path, metadata)
-        else:
-            raise ValueError(f"Unsupported file type: {file_ext}")
-    
-    async def _process_pdf(self, file_path: str, metadata: DocumentMetadata) -> List[DocumentChunk]:
-        chunks = []
-        doc = fitz.open(file_path)
-        metadata.total_pages = len(doc)
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text()
-            page_chunks = self._create_chunks(text, metadata.title, page_num + 1)
-            chunks.extend(page_chunks)
-            
-        return chunks
-    
-    async def _process_docx(self, file_path: str, metadata: DocumentMetadata) -> List[DocumentChunk]:
-        chunks = []
-        doc = docx.Document(file_path)
-        metadata.total_pages = len(doc.paragraphs)  # Approximate pages
-        
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-        chunks = self._create_chunks(text, metadata.title, None)
-        return chunks
-    
-    async def _process_text(self, file_path: str, metadata: DocumentMetadata) -> List[DocumentChunk]:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            text = f.read()
-        
-        chunks = self._create_chunks(text, metadata.title, None)
-        return chunks
-    
-    def _create_chunks(self, text: str, source: str, page_num: Optional[int]) -> List[DocumentChunk]:
-        """Split text into chunks with overlap"""
-        chunks = []
-        
-        # Split text into chunks
-        words = text.split()
-        current_chunk = []
-        current_size = 0
-        chunk_number = 0
-        
-        for word in words:
-            current_chunk.append(word)
-            current_size += len(word) + 1  # +1 for space
-            
-            if current_size >= self.chunk_size:
-                # Create chunk
-                chunk_text = " ".join(current_chunk)
-                chunks.append(DocumentChunk(
-                    content=chunk_text,
-                    source=source,
-                    page_number=page_num,
-                    chunk_number=chunk_number
-                ))
-                
-                # Keep overlap for next chunk
-                overlap_words = current_chunk[-self.chunk_overlap:]
-                current_chunk = overlap_words
-                current_size = sum(len(word) + 1 for word in overlap_words)
-                chunk_number += 1
-        
-        # Add final chunk if there's remaining text
-        if current_chunk:
-            chunk_text = " ".join(current_chunk)
-            chunks.append(DocumentChunk(
-                content=chunk_text,
-                source=source,
-                page_number=page_num,
-                chunk_number=chunk_number
-            ))
-        
-        return chunks
+        return list(self.iter_document_chunks(file_path, metadata))
 
-    def extract_text_from_pdf(self, file_path: str) -> List[tuple[str, int]]:
-        doc = fitz.open(file_path)
-        text_pages = []
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text_pages.append((page.get_text(), page_num + 1))
-        return text_pages
+    def iter_document_chunks(self, file_path: str, metadata: DocumentMetadata) -> Iterator[DocumentChunk]:
+        """Lazily read and chunk a document, one page at a time, the same way IngestionPipeline does"""
+        if Path(file_path).suffix.lower() == '.pdf':
+            metadata.total_pages = count_pages(file_path)
 
-    def create_chunks(self, text: str, source: str, page_number: Optional[int] = None) -> List[DocumentChunk]:
-        tokens = self.tokenizer.encode(text)
-        chunks = []
-        
-        for i in range(0, len(tokens), self.chunk_size - self.chunk_overlap):
-            chunk_tokens = tokens[i:i + self.chunk_size]
-            chunk_text = self.tokenizer.decode(chunk_tokens)
-            chunks.append(
-                DocumentChunk(
-                    content=chunk_text,
-                    source=source,
-                    page_number=page_number,
-                    chunk_number=len(chunks) + 1
-                )
+        for chunk in self.chunker.iter_chunks(iter_pages(file_path)):
+            yield DocumentChunk(
+                content=chunk['content'],
+                source=metadata.title,
+                page_number=chunk['page_number'],
+                chunk_number=chunk['chunk_number']
             )
-        return chunks
 
-    async def get_embeddings(self, chunks):
-        try:
-            embeddings = []
-            for chunk in chunks:
-                response = self.embeddings_client.embeddings.create(
-                    input=chunk.content,
-                    model="text-embedding-3-small"
-                )
-                embeddings.append(response.data[0].embedding)
-            return embeddings
-        except Exception as e:
-            print(f"Error in get_embeddings: {str(e)}")
-            raise Exception(f"Error getting embeddings: {str(e)}")
+    def create_chunks(self, text: str, source: str, page_number: Optional[int] = None) -> List[DocumentChunk]:
+        return [
+            DocumentChunk(
+                content=chunk['content'],
+                source=source,
+                page_number=chunk['page_number'],
+                chunk_number=chunk['chunk_number']
+            )
+            for chunk in self.chunker.iter_chunks([(text, page_number)])
+        ]
 
     async def create_embeddings(self, chunks: List[DocumentChunk]) -> List[List[float]]:
-        embeddings = []
-        for chunk in chunks:
-            response = self.embeddings_client.embeddings.create(
-                input=chunk.content,
-                model="text-embedding-3-small"
-            )
-            embeddings.append(response.data[0].embedding)
-        return embeddings 
\ No newline at end of file
+        return await self.embedding_service.embed_texts([chunk.content for chunk in chunks])
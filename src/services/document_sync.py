@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from src.services.text_chunker import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Document columns an update may change besides the ones derived from the file
+UPDATABLE_FIELDS = ('title', 'category', 'summary', 'tags', 'ai_suggestion', 'file_type')
+
+
+def diff_chunks(existing: List[Dict], new: List[Dict]) -> Dict[str, List[Dict]]:
+    """
+    Match a document's new chunks against its stored chunks by content hash
+
+    Args:
+        existing: Stored chunks with id, content_hash (or content), page_number and chunk_number
+        new: New chunks with content, page_number and chunk_number
+
+    Returns:
+        Dict with
+        - `added`: new chunks with no stored match; these need embedding
+        - `moved`: stored chunks reused for unchanged content whose position or hash
+          column needs updating, as rows with id, content, page_number, chunk_number, content_hash
+        - `unchanged`: ids of stored chunks reused as they are
+        - `removed`: ids of stored chunks no longer in the document
+    """
+    available = defaultdict(list)
+    for row in existing:
+        # Rows stored before content hashes existed are fingerprinted from their content
+        row_hash = row.get('content_hash') or content_hash(row['content'])
+        available[row_hash].append({**row, 'stored_hash': row.get('content_hash'), 'content_hash': row_hash})
+    for rows in available.values():
+        rows.sort(key=lambda row: (row.get('chunk_number') or 0))
+
+    added, moved, unchanged = [], [], []
+    for chunk in new:
+        chunk_hash = content_hash(chunk['content'])
+        candidates = available.get(chunk_hash)
+        if not candidates:
+            added.append({**chunk, 'content_hash': chunk_hash})
+            continue
+        row = candidates.pop(0)
+        if (
+            row['page_number'] != chunk['page_number']
+            or row['chunk_number'] != chunk['chunk_number']
+            or row['stored_hash'] != chunk_hash
+        ):
+            moved.append({
+                'id': row['id'],
+                'content': row['content'],
+                'page_number': chunk['page_number'],
+                'chunk_number': chunk['chunk_number'],
+                'content_hash': chunk_hash,
+            })
+        else:
+            unchanged.append(row['id'])
+
+    removed = [row['id'] for rows in available.values() for row in rows]
+    return {'added': added, 'moved': moved, 'unchanged': unchanged, 'removed': removed}
+
+
+class DocumentSync:
+    """
+    Update a stored document from a new version of its file.
+
+    The new file is split into pages with the ingestion pipeline's extractors (see
+    ingestion_pipeline.iter_pages) and chunked like on first ingestion; since chunks never
+    span pages, an edit only changes the chunks of the pages it touches. Chunks are
+    matched to the stored ones by content hash, so only new or edited chunks are
+    embedded and inserted, chunks that are gone are deleted, and unchanged chunks
+    that merely moved get their page and chunk numbers updated in place. New chunks
+    are written before old ones are deleted, so searches never see the document
+    missing content mid-update.
+    """
+
+    def __init__(self, processor, vector_store):
+        self.processor = processor
+        self.vector_store = vector_store
+
+    async def update(
+        self,
+        document_id: str,
+        file_path: str,
+        metadata: Dict,
+        progress: Optional[Callable[[Dict], None]] = None,
+    ) -> Dict:
+        """
+        Re-ingest a document in place
+
+        Args:
+            document_id: Document to update
+            file_path: Path to the new version of the file
+            metadata: New document fields (title, category, ..., source_url, file_size)
+            progress: Optional callback receiving the diff counters
+
+        Returns:
+            Dict with the document_id and the number of chunks added, moved, unchanged and removed
+        """
+        from src.models.document_models import DocumentMetadata
+
+        document = await self.vector_store.get_document(document_id)
+        if document is None:
+            raise KeyError(document_id)
+
+        fields = {key: metadata[key] for key in UPDATABLE_FIELDS if metadata.get(key) is not None}
+        doc_metadata = DocumentMetadata(**{
+            'title': document['title'],
+            'file_type': document.get('file_type') or '',
+            'file_size': metadata.get('file_size') or document.get('file_size') or 0,
+            'category': document.get('category') or '',
+            **fields,
+        })
+
+        new_chunks = await asyncio.to_thread(
+            lambda: list(self.processor.iter_document_chunks(file_path, doc_metadata))
+        )
+        # Stored chunk numbers are 1-based
+        new_rows = [
+            {'chunk': chunk, 'content': chunk.content, 'page_number': chunk.page_number or 1, 'chunk_number': i + 1}
+            for i, chunk in enumerate(new_chunks)
+        ]
+        existing = await self.vector_store.get_chunk_fingerprints(document_id)
+        diff = diff_chunks(existing, new_rows)
+        counters = {key: len(value) for key, value in diff.items()}
+        if progress:
+            progress(dict(counters))
+
+        if diff['added']:
+            added_chunks = [
+                row['chunk'].model_copy(update={'page_number': row['page_number'], 'chunk_number': row['chunk_number']})
+                for row in diff['added']
+            ]
+            embeddings = await self.processor.embedding_service.embed_texts([c.content for c in added_chunks])
+            await self.vector_store.store_chunks(document_id, doc_metadata.title, added_chunks, embeddings)
+        if diff['moved']:
+            await self.vector_store.update_chunk_positions(document_id, diff['moved'])
+        if diff['removed']:
+            await self.vector_store.delete_chunks(diff['removed'])
+
+        await self.vector_store.update_document(document_id, {
+            **fields,
+            'total_pages': doc_metadata.total_pages or document.get('total_pages') or 0,
+            'file_size': doc_metadata.file_size,
+            'source_url': metadata.get('source_url') or document.get('source_url'),
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+        })
+
+        logger.info(f"Updated document {document_id}: {counters}")
+        return {'document_id': document_id, **counters}
@@ -1,10 +1,11 @@
 from pathlib import Path
 from typing import Dict, List
+from supabase import Client
 from .base_file_uploader import BaseFileUploader
 
 class DocumentUploader(BaseFileUploader):
-    def __init__(self):
-        super().__init__(bucket_name='documents')
+    def __init__(self, supabase: Client = None):
+        super().__init__(bucket_name='documents', supabase=supabase)
 
     def upload_document(self, file_path: Path, original_filename: str = None) -> Dict:
         """Upload a document file to the documents bucket"""
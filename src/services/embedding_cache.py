@@ -0,0 +1,126 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_CACHE_PATH = '.cache/embeddings.sqlite3'
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs (spacing, unicode forms) share an embedding"""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by hash of (model, dimensions, normalized text).
+
+    The first tier is an in-memory LRU; the second is a SQLite file storing vectors as
+    float32 blobs, so embeddings survive restarts and are shared between the upload
+    and query paths. Pass path=None to keep the cache in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH, memory_size: int = 10000):
+        self.memory_size = memory_size
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats_counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)'
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, dimensions: Optional[int], text: str) -> str:
+        payload = f"{model}\0{dimensions or ''}\0{normalize_text(text)}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        """Look up keys in memory, then on disk; returns only the keys that were found"""
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self.stats_counters['memory_hits'] += 1
+                else:
+                    missing.append(key)
+
+            if missing and self._db is not None:
+                # Stay well below SQLite's bound-parameter limit
+                for start in range(0, len(missing), 500):
+                    batch = missing[start:start + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = array('f', blob).tolist()
+                        found[key] = vector
+                        self._remember(key, vector)
+                        self.stats_counters['disk_hits'] += 1
+
+            self.stats_counters['misses'] += sum(1 for key in missing if key not in found)
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            if self._db is not None and items:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)',
+                    [(key, array('f', vector).tobytes()) for key, vector in items.items()]
+                )
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.stats_counters)
+            memory_entries = len(self._memory)
+        lookups = sum(counters.values())
+        hits = counters['memory_hits'] + counters['disk_hits']
+        return {
+            **counters,
+            'lookups': lookups,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'memory_entries': memory_entries,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide embedding cache; EMBEDDING_CACHE_PATH='' disables the SQLite tier"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(
+                path=os.getenv('EMBEDDING_CACHE_PATH', DEFAULT_CACHE_PATH) or None,
+                memory_size=int(os.getenv('EMBEDDING_CACHE_MEMORY_SIZE', 10000)),
+            )
+        return _cache
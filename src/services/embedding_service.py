@@ -0,0 +1,153 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+import tiktoken
+from openai import OpenAI
+
+from src.services.embedding_cache import EmbeddingCache, get_embedding_cache
+from src.utils.openai_client import get_embeddings_client
+from src.utils.provider_limiter import get_provider_limiter
+
+
+class EmbeddingService:
+    """
+    Generate embeddings with as few requests as possible.
+
+    Texts are packed into multi-input requests bounded by the provider's input count
+    and token limits, batches are sent concurrently (capped, and under the OpenAI
+    provider limiter which retries a failed batch on its own), and results are
+    returned in the order of the input texts. Texts already in the embedding cache
+    are never sent. Tokenizing and cache I/O run in worker threads so the event loop
+    stays responsive while large documents are embedded. If a batch fails, batches
+    not yet sent are cancelled and the error is raised; batches that completed are
+    already cached.
+    """
+
+    # OpenAI embeddings limits: 2048 inputs and 300k tokens per request, 8191 tokens per input
+    MAX_INPUT_TOKENS = 8191
+
+    def __init__(
+        self,
+        client: Optional[OpenAI] = None,
+        model: str = "text-embedding-3-small",
+        dimensions: Optional[int] = None,
+        max_batch_inputs: int = 2048,
+        max_batch_tokens: int = 250000,
+        max_concurrent_batches: int = 4,
+        cache: Optional[EmbeddingCache] = None,
+        tokenizer=None,
+    ):
+        # Use direct OpenAI API for embeddings; retries are handled by the provider limiter
+        self.client = client or get_embeddings_client()
+        self.model = model
+        self.dimensions = dimensions
+        self.max_batch_inputs = max_batch_inputs
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrent_batches = max_concurrent_batches
+        self.tokenizer = tokenizer or tiktoken.get_encoding("cl100k_base")
+        self.limiter = get_provider_limiter('openai')
+        self.cache = cache or get_embedding_cache()
+
+    def _prepare(self, text: str) -> Tuple[str, int]:
+        """Return the text as it will be sent (truncated to the per-input limit) and its token count"""
+        # The API rejects empty inputs
+        text = text if text.strip() else " "
+        tokens = self.tokenizer.encode(text)
+        if len(tokens) > self.MAX_INPUT_TOKENS:
+            tokens = tokens[:self.MAX_INPUT_TOKENS]
+            text = self.tokenizer.decode(tokens)
+        return text, len(tokens)
+
+    def _make_batches(self, texts: List[str]) -> List[List[Tuple[int, str, int]]]:
+        """Greedily pack (index, text, tokens) items into batches within the request limits"""
+        batches = []
+        current = []
+        current_tokens = 0
+        for index, text in enumerate(texts):
+            prepared, token_count = self._prepare(text)
+            if current and (
+                len(current) >= self.max_batch_inputs
+                or current_tokens + token_count > self.max_batch_tokens
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append((index, prepared, token_count))
+            current_tokens += token_count
+        if current:
+            batches.append(current)
+        return batches
+
+    def _request(self, inputs: List[str]):
+        kwargs = {'input': inputs, 'model': self.model}
+        if self.dimensions:
+            kwargs['dimensions'] = self.dimensions
+        return self.client.embeddings.create(**kwargs)
+
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of texts, returning one embedding per text in the same order"""
+        if not texts:
+            return []
+
+        keys = await asyncio.to_thread(
+            lambda: [EmbeddingCache.make_key(self.model, self.dimensions, text) for text in texts]
+        )
+        cached = await asyncio.to_thread(self.cache.get_many, set(keys))
+        results: List[Optional[List[float]]] = [cached.get(key) for key in keys]
+
+        # Embed each distinct uncached text once
+        pending = {}
+        for index, key in enumerate(keys):
+            if results[index] is None and key not in pending:
+                pending[key] = texts[index]
+        if not pending:
+            return results
+
+        pending_keys = list(pending)
+        pending_texts = [pending[key] for key in pending_keys]
+        fresh: List[Optional[List[float]]] = [None] * len(pending_texts)
+        semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+        failed = False
+
+        async def run_batch(batch):
+            nonlocal failed
+            inputs = [text for _, text, _ in batch]
+            async with semaphore:
+                if failed:
+                    # A sibling failed while this batch waited for its turn; it is about to be cancelled
+                    return
+                try:
+                    response = await self.limiter.acall(
+                        lambda: self._request(inputs),
+                        tokens=sum(tokens for _, _, tokens in batch),
+                        actual_tokens=lambda r: r.usage.total_tokens if getattr(r, 'usage', None) else None
+                    )
+                except Exception:
+                    failed = True
+                    raise
+            for item in response.data:
+                fresh[batch[item.index][0]] = item.embedding
+            # Cache each batch as it lands so a later failing batch doesn't lose this work
+            await asyncio.to_thread(
+                self.cache.put_many, {pending_keys[index]: fresh[index] for index, _, _ in batch}
+            )
+
+        batches = await asyncio.to_thread(self._make_batches, pending_texts)
+        tasks = [asyncio.create_task(run_batch(batch)) for batch in batches]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        except BaseException:
+            # Don't keep paying for the other batches once the result can't be returned
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        by_key = dict(zip(pending_keys, fresh))
+        return [result if result is not None else by_key[key] for result, key in zip(results, keys)]
+
+    async def embed_text(self, text: str) -> List[float]:
+        """Embed a single text"""
+        return (await self.embed_texts([text]))[0]
@@ -0,0 +1,331 @@
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+# (size, mtime_ns) of a file, used both for debouncing and to remember what was processed
+FileSignature = Tuple[int, int]
+
+# How often processed files that were since moved, deleted or changed are forgotten
+SEEN_PRUNE_INTERVAL = 60.0
+
+
+class InotifyBackend:
+    """Minimal inotify wrapper built on ctypes so no extra dependency is needed"""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c')
+        if not sys.platform.startswith('linux') or not libc_name:
+            raise OSError("inotify is only available on Linux")
+
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches: Dict[int, Path] = {}
+
+    def add_watch(self, directory: Path):
+        wd = self._libc.inotify_add_watch(self.fd, str(directory).encode(), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self._watches[wd] = directory
+
+    def read_events(self) -> Tuple[List[Tuple[Path, int]], bool]:
+        """
+        Drain pending events
+
+        Returns:
+            Tuple of ([(path, mask), ...], overflowed)
+        """
+        events = []
+        overflowed = False
+        while True:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not buffer:
+                break
+
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _cookie, name_len = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = buffer[offset:offset + name_len].rstrip(b'\0').decode(errors='replace')
+                offset += name_len
+
+                if mask & IN_Q_OVERFLOW:
+                    overflowed = True
+                    continue
+                directory = self._watches.get(wd)
+                if directory is not None and name:
+                    events.append((directory / name, mask))
+        return events, overflowed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """
+    Watch directories for new recordings and hand them to a processing callback.
+
+    Files are only handed over once their size and mtime have stopped changing for
+    `settle_seconds`, so recordings that are still being written by the PBX are not
+    picked up half-way. Processing runs in worker threads with at most
+    `max_concurrency` files in flight.
+    """
+
+    def __init__(
+        self,
+        directories: Iterable[Path],
+        handler: Callable[[Path], object],
+        recursive: bool = False,
+        settle_seconds: float = 5.0,
+        poll_interval: float = 2.0,
+        max_concurrency: int = 4,
+        use_inotify: bool = True,
+        process_existing: bool = True,
+        file_filter: Optional[Callable[[Path], bool]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the folder watcher
+
+        Args:
+            directories: Directories to watch
+            handler: Blocking callable invoked with the path of each settled file
+            recursive: Whether to watch subdirectories as well
+            settle_seconds: How long a file must be unchanged before it is processed
+            poll_interval: Seconds between debounce checks (and scans in polling mode)
+            max_concurrency: Maximum number of files processed at the same time
+            use_inotify: Try inotify first and fall back to polling if unavailable
+            process_existing: Whether files already present at startup are processed
+            file_filter: Optional predicate deciding whether a path is interesting
+            clock: Monotonic time source used for settling and pruning
+        """
+        self.directories = [Path(d) for d in directories]
+        self.handler = handler
+        self.recursive = recursive
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.max_concurrency = max_concurrency
+        self.use_inotify = use_inotify
+        self.process_existing = process_existing
+        self.file_filter = file_filter or (lambda path: True)
+        self._clock = clock
+
+        self._pending: Dict[Path, Tuple[FileSignature, float]] = {}
+        self._seen: Dict[Path, FileSignature] = {}
+        self._in_flight: Set[Path] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._inotify: Optional[InotifyBackend] = None
+
+        self.processed_count = 0
+        self.failed_count = 0
+
+    def _iter_files(self) -> Iterable[Path]:
+        for directory in self.directories:
+            pattern = '**/*' if self.recursive else '*'
+            for path in directory.glob(pattern):
+                if path.is_file():
+                    yield path
+
+    def _iter_dirs(self) -> Iterable[Path]:
+        for directory in self.directories:
+            yield directory
+            if self.recursive:
+                for path in directory.glob('**/*'):
+                    if path.is_dir():
+                        yield path
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[FileSignature]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _mark_pending(self, path: Path):
+        """Record activity on a file; it is processed once it has settled"""
+        if path in self._in_flight or not self.file_filter(path):
+            return
+        signature = self._signature(path)
+        if signature is None or self._seen.get(path) == signature:
+            return
+        self._seen.pop(path, None)
+        previous = self._pending.get(path)
+        if previous is None or previous[0] != signature:
+            self._pending[path] = (signature, self._clock())
+
+    def _scan(self):
+        for path in self._iter_files():
+            self._mark_pending(path)
+
+    def _remember_existing(self):
+        """Treat files already present as processed, so only new or changed ones are handled"""
+        for path in self._iter_files():
+            signature = self._signature(path)
+            if signature:
+                self._seen[path] = signature
+
+    def _prune_seen(self):
+        """Forget processed files that are gone or have changed since they were handled"""
+        for path, signature in list(self._seen.items()):
+            if path not in self._in_flight and self._signature(path) != signature:
+                del self._seen[path]
+
+    def _setup_inotify(self) -> bool:
+        if not self.use_inotify:
+            return False
+        try:
+            self._inotify = InotifyBackend()
+            for directory in self._iter_dirs():
+                self._inotify.add_watch(directory)
+        except OSError as e:
+            logger.warning(f"inotify unavailable ({e}), falling back to polling")
+            if self._inotify:
+                self._inotify.close()
+            self._inotify = None
+            return False
+
+        asyncio.get_running_loop().add_reader(self._inotify.fd, self._on_inotify_readable)
+        logger.info("Watching with inotify")
+        return True
+
+    def _on_inotify_readable(self):
+        events, overflowed = self._inotify.read_events()
+        if overflowed:
+            logger.warning("inotify queue overflowed, rescanning watched directories")
+            self._scan()
+        for path, mask in events:
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        self._inotify.add_watch(path)
+                    except OSError as e:
+                        logger.warning(f"Could not watch new directory {path}: {e}")
+                    for file_path in path.glob('**/*'):
+                        if file_path.is_file():
+                            self._mark_pending(file_path)
+                continue
+            self._mark_pending(path)
+
+    def _collect_settled(self) -> List[Path]:
+        """Return pending files whose size and mtime have not changed for settle_seconds"""
+        now = self._clock()
+        settled = []
+        for path, (signature, changed_at) in list(self._pending.items()):
+            current = self._signature(path)
+            if current is None:
+                del self._pending[path]
+            elif current != signature:
+                self._pending[path] = (current, now)
+            elif now - changed_at >= self.settle_seconds:
+                del self._pending[path]
+                settled.append(path)
+        return settled
+
+    async def _process(self, path: Path, signature: FileSignature):
+        async with self._semaphore:
+            try:
+                result = await asyncio.to_thread(self.handler, path)
+                success = getattr(result, 'success', result is not None)
+                if success:
+                    self.processed_count += 1
+                    logger.info(f"✓ {path.name}")
+                else:
+                    self.failed_count += 1
+                    logger.info(f"✗ {path.name}: {getattr(result, 'message', 'skipped')}")
+            except Exception as e:
+                self.failed_count += 1
+                logger.error(f"Error processing {path}: {str(e)}")
+            finally:
+                # Remember the signature even on failure so a broken file is not retried
+                # in a hot loop; touching or replacing the file makes it eligible again.
+                # Files the handler moved or deleted don't need remembering.
+                if self._signature(path) == signature:
+                    self._seen[path] = signature
+                self._in_flight.discard(path)
+
+    def _dispatch(self, path: Path):
+        signature = self._signature(path)
+        if signature is None:
+            return
+        self._in_flight.add(path)
+        task = asyncio.create_task(self._process(path, signature))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _tick(self, scan: bool):
+        """One pass of the watch loop: rescan when polling, then hand over settled files"""
+        if scan:
+            self._scan()
+        for path in self._collect_settled():
+            self._dispatch(path)
+
+    def stop(self):
+        """Ask the watcher to stop after in-flight files are finished"""
+        if self._stop_event:
+            self._stop_event.set()
+
+    async def run(self):
+        """Watch until stop() is called, then wait for in-flight files to finish"""
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._stop_event = asyncio.Event()
+
+        missing = [d for d in self.directories if not d.is_dir()]
+        if missing:
+            raise ValueError(f"Not a directory: {', '.join(str(d) for d in missing)}")
+
+        if not self.process_existing:
+            self._remember_existing()
+
+        using_inotify = self._setup_inotify()
+        if not using_inotify:
+            logger.info(f"Polling watched directories every {self.poll_interval}s")
+        # Initial scan picks up files that arrived before the watch was in place
+        self._scan()
+        last_prune = self._clock()
+
+        try:
+            while not self._stop_event.is_set():
+                self._tick(scan=not using_inotify)
+                if self._clock() - last_prune >= SEEN_PRUNE_INTERVAL:
+                    self._prune_seen()
+                    last_prune = self._clock()
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._inotify:
+                asyncio.get_running_loop().remove_reader(self._inotify.fd)
+                self._inotify.close()
+                self._inotify = None
+
+            if self._tasks:
+                logger.info(f"Waiting for {len(self._tasks)} in-flight file(s) to finish")
+                await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,367 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPOOL_DIR = '.cache/ingestion_jobs'
+# Finished jobs are kept for status queries (and retries) for a week
+DEFAULT_JOB_TTL = 7 * 24 * 3600
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+# Stages run in this order; a retried job resumes at the first stage that hasn't completed
+STAGES = ['upload', 'ingest']
+
+
+async def upload_to_storage(file_path: Path, filename: str) -> Dict:
+    """Default upload stage: copy the spooled file to the documents bucket"""
+    from src.services.service_container import get_service_container
+
+    uploader = await asyncio.to_thread(lambda: get_service_container().document_uploader)
+    result = await asyncio.to_thread(uploader.upload_document, file_path, filename)
+    if not result.get('success'):
+        raise RuntimeError(f"Failed to upload file: {result.get('error', 'Unknown error')}")
+    return result
+
+
+async def ingest_document(file_path: Path, metadata: Dict, progress: Callable[[Dict], None]) -> Dict:
+    """Default ingest stage: extract, chunk, embed and store the document"""
+    import pytz
+    from src.models.document_models import DocumentMetadata
+    from src.services.ingestion_pipeline import IngestionPipeline
+    from src.services.service_container import get_service_container
+
+    metadata_obj = DocumentMetadata(**metadata)
+    metadata_obj.last_updated = datetime.now(pytz.UTC)
+    services = get_service_container()
+    pipeline = IngestionPipeline(services.document_processor, services.vector_store, progress=progress)
+    return await pipeline.run(str(file_path), metadata_obj)
+
+
+async def update_document(
+    file_path: Path, document_id: str, metadata: Dict, progress: Callable[[Dict], None]
+) -> Dict:
+    """Ingest stage for updates: re-embed only the chunks that changed"""
+    from src.services.document_sync import DocumentSync
+    from src.services.service_container import get_service_container
+
+    services = get_service_container()
+    return await DocumentSync(services.document_processor, services.vector_store).update(
+        document_id, str(file_path), metadata, progress
+    )
+
+
+class IngestionJobManager:
+    """
+    Runs document ingestion in the background so uploads return immediately.
+
+    submit() spools the uploaded file and a job record to `spool_dir/<job_id>/` and
+    queues the job; worker tasks then upload the file to storage and run the
+    ingestion pipeline, recording the current stage and pipeline progress in the
+    job record. A failed job can be retried from the stage that failed without
+    uploading the file again. The spooled file is deleted once the job completes.
+
+    The spool directory is the source of truth and may be shared by several server
+    processes: status queries read the job record from disk, so any process can
+    answer them, and a process runs a job only while holding an exclusive lock on
+    its `lock` file. Every `scan_interval` seconds each process looks for queued or
+    interrupted jobs that no one holds (their process stopped or crashed) and
+    resumes them, and deletes finished jobs not updated for `job_ttl` seconds.
+
+    A job submitted with a document_id updates that document in place instead of
+    creating a new one.
+    """
+
+    def __init__(
+        self,
+        spool_dir: str = DEFAULT_SPOOL_DIR,
+        concurrency: int = 1,
+        upload: Callable[[Path, str], Awaitable[Dict]] = upload_to_storage,
+        ingest: Callable[[Path, Dict, Callable[[Dict], None]], Awaitable[Dict]] = ingest_document,
+        update: Callable[[Path, str, Dict, Callable[[Dict], None]], Awaitable[Dict]] = update_document,
+        progress_interval: float = 1.0,
+        scan_interval: float = 60.0,
+        job_ttl: float = DEFAULT_JOB_TTL,
+    ):
+        self.spool_dir = Path(spool_dir)
+        self.concurrency = concurrency
+        self.upload = upload
+        self.ingest = ingest
+        self.update = update
+        self.progress_interval = progress_interval
+        self.scan_interval = scan_interval
+        self.job_ttl = job_ttl
+        # Jobs this process is running, with the lock files it holds for them
+        self._jobs: Dict[str, Dict] = {}
+        self._locks: Dict[str, IO] = {}
+        self._queued = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def _job_dir(self, job_id: str) -> Path:
+        return self.spool_dir / job_id
+
+    def _save(self, job: Dict):
+        job['updated_at'] = time.time()
+        path = self._job_dir(job['id']) / 'job.json'
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(job))
+        os.replace(tmp_path, path)
+
+    def _read(self, job_id: str) -> Optional[Dict]:
+        if job_id in self._jobs:
+            return self._jobs[job_id]
+        path = self._job_dir(job_id) / 'job.json'
+        try:
+            return json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable ingestion job {path}: {str(e)}")
+            return None
+
+    def _job_ids(self) -> List[str]:
+        if not self.spool_dir.exists():
+            return []
+        return [path.parent.name for path in self.spool_dir.glob('*/job.json')]
+
+    def _lock(self, job_id: str) -> bool:
+        """Take the job's lock without waiting; False if another process (or task) holds it"""
+        if job_id in self._locks:
+            return False
+        try:
+            lock_file = open(self._job_dir(job_id) / 'lock', 'a')
+        except FileNotFoundError:
+            # Removed after its TTL
+            return False
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._locks[job_id] = lock_file
+        return True
+
+    def _unlock(self, job_id: str):
+        lock_file = self._locks.pop(job_id, None)
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _enqueue(self, job_id: str):
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    def _scan(self) -> List[str]:
+        """Delete finished jobs past their TTL; returns the unfinished jobs this process isn't running"""
+        now = time.time()
+        unfinished = []
+        for job_id in self._job_ids():
+            if job_id in self._locks:
+                continue
+            job = self._read(job_id)
+            if job is None:
+                continue
+            if job['status'] in (QUEUED, RUNNING):
+                unfinished.append(job_id)
+            elif now - job.get('updated_at', now) > self.job_ttl and self._lock(job_id):
+                try:
+                    shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+                finally:
+                    self._unlock(job_id)
+                logger.info(f"Removed ingestion job {job_id} ({job['status']}) after its TTL")
+        return unfinished
+
+    async def _scan_and_enqueue(self):
+        for job_id in await asyncio.to_thread(self._scan):
+            self._enqueue(job_id)
+
+    async def _scan_periodically(self):
+        while True:
+            await asyncio.sleep(self.scan_interval)
+            try:
+                await self._scan_and_enqueue()
+            except Exception as e:
+                logger.warning(f"Scanning ingestion jobs failed: {str(e)}")
+
+    async def start(self):
+        """Queue unfinished jobs from the spool directory and start the workers"""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._queue = asyncio.Queue()
+        # Jobs interrupted by a restart are resumed from the stage they were in
+        await self._scan_and_enqueue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._workers.append(asyncio.create_task(self._scan_periodically()))
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, content: bytes, filename: str, metadata: Dict, document_id: Optional[str] = None) -> Dict:
+        """Spool an uploaded file and queue it for ingestion, or for updating `document_id` if given"""
+        job_id = str(uuid.uuid4())
+        job_dir = self._job_dir(job_id)
+        job_dir.mkdir(parents=True)
+        # Keep the original name (and suffix, which selects the extractor) inside the job directory
+        file_path = job_dir / Path(filename).name
+        await asyncio.to_thread(file_path.write_bytes, content)
+
+        job = {
+            'id': job_id,
+            'filename': Path(filename).name,
+            'file_path': str(file_path),
+            'metadata': metadata,
+            'status': QUEUED,
+            'stage': STAGES[0],
+            'completed_stages': [],
+            'progress': {},
+            'attempts': 0,
+            'error': None,
+            'file_url': None,
+            'document_id': document_id,
+            'mode': 'update' if document_id else 'create',
+            'created_at': time.time(),
+        }
+        self._save(job)
+        self._enqueue(job_id)
+        return self.public_view(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self._read(job_id)
+        return self.public_view(job) if job else None
+
+    def list_jobs(self) -> List[Dict]:
+        jobs = [job for job in map(self._read, self._job_ids()) if job]
+        return [self.public_view(job) for job in sorted(jobs, key=lambda job: job.get('created_at', 0))]
+
+    async def retry(self, job_id: str) -> Dict:
+        """Re-queue a failed job; stages that already completed are not repeated"""
+        job = self._read(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job['status'] != FAILED or not self._lock(job_id):
+            raise ValueError(f"Only failed jobs can be retried (job is {job['status']})")
+        try:
+            # Re-read under the lock: another process may have retried it meanwhile
+            job = self._read(job_id)
+            if job['status'] != FAILED:
+                raise ValueError(f"Only failed jobs can be retried (job is {job['status']})")
+            job['status'] = QUEUED
+            job['error'] = None
+            self._save(job)
+        finally:
+            self._unlock(job_id)
+        self._enqueue(job_id)
+        return self.public_view(job)
+
+    @staticmethod
+    def public_view(job: Dict) -> Dict:
+        return {key: value for key, value in job.items() if key not in ('file_path', 'metadata')}
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            if not self._lock(job_id):
+                # Another process is running it
+                continue
+            try:
+                job = self._read(job_id)
+                # It may have finished elsewhere between being queued here and the lock being taken
+                if job is None or job['status'] not in (QUEUED, RUNNING):
+                    continue
+                self._jobs[job_id] = job
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Unexpected error in ingestion job {job_id}: {str(e)}")
+            finally:
+                self._jobs.pop(job_id, None)
+                self._unlock(job_id)
+
+    async def _run(self, job: Dict):
+        job['status'] = RUNNING
+        job['attempts'] += 1
+        self._save(job)
+        file_path = Path(job['file_path'])
+
+        last_saved = 0.0
+
+        def report(counters: Dict):
+            nonlocal last_saved
+            job['progress'] = counters
+            # Progress is always current in memory; the record on disk is refreshed at most once per interval
+            if time.monotonic() - last_saved >= self.progress_interval:
+                last_saved = time.monotonic()
+                self._save(job)
+
+        try:
+            for stage in STAGES:
+                if stage in job['completed_stages']:
+                    continue
+                job['stage'] = stage
+                self._save(job)
+
+                if stage == 'upload':
+                    result = await self.upload(file_path, job['filename'])
+                    job['file_url'] = result['file_url']
+                elif stage == 'ingest':
+                    metadata = {
+                        **job['metadata'],
+                        'source_url': job['file_url'],
+                        'file_size': file_path.stat().st_size,
+                    }
+                    if job.get('mode') == 'update':
+                        result = await self.update(file_path, job['document_id'], metadata, report)
+                    else:
+                        result = await self.ingest(file_path, metadata, report)
+                    job['document_id'] = result['document_id']
+                    job['progress'] = {key: value for key, value in result.items() if key != 'document_id'}
+
+                job['completed_stages'].append(stage)
+                self._save(job)
+        except Exception as e:
+            logger.error(f"Ingestion job {job['id']} failed at stage {job['stage']}: {str(e)}")
+            job['status'] = FAILED
+            job['error'] = str(e)
+            self._save(job)
+            return
+
+        job['status'] = COMPLETED
+        self._save(job)
+        # The job record stays for status queries; the spooled file is no longer needed
+        await asyncio.to_thread(lambda: file_path.unlink(missing_ok=True))
+
+
+_manager: Optional[IngestionJobManager] = None
+
+
+def get_ingestion_job_manager() -> IngestionJobManager:
+    """
+    Process-wide job manager; configure with INGESTION_SPOOL_DIR, INGESTION_JOB_CONCURRENCY
+    and INGESTION_JOB_TTL (seconds finished jobs are kept)
+    """
+    global _manager
+    if _manager is None:
+        _manager = IngestionJobManager(
+            spool_dir=os.getenv('INGESTION_SPOOL_DIR', DEFAULT_SPOOL_DIR),
+            concurrency=int(os.getenv('INGESTION_JOB_CONCURRENCY', 1)),
+            job_ttl=float(os.getenv('INGESTION_JOB_TTL', DEFAULT_JOB_TTL)),
+        )
+    return _manager
@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.models.document_models import DocumentChunk, DocumentMetadata
+
+logger = logging.getLogger(__name__)
+
+PageText = Tuple[str, Optional[int]]
+
+# Paragraphs per pseudo-page when streaming a .docx, which has no real pages
+DOCX_PARAGRAPHS_PER_PAGE = 50
+
+
+def count_pages(file_path: str) -> Optional[int]:
+    """Number of pages reported as progress; unknown up front for .docx"""
+    file_ext = Path(file_path).suffix.lower()
+    if file_ext == '.pdf':
+        import fitz  # PyMuPDF
+        with fitz.open(file_path) as doc:
+            return len(doc)
+    return None if file_ext == '.docx' else 1
+
+
+def extract_pdf_pages(file_path: str, start: int, end: int) -> List[PageText]:
+    """Extract pages [start, end) of a PDF; runs in a worker process"""
+    import fitz  # PyMuPDF
+    with fitz.open(file_path) as doc:
+        return [(doc[page_num].get_text(), page_num + 1) for page_num in range(start, min(end, len(doc)))]
+
+
+def extract_docx_pages(file_path: str) -> List[PageText]:
+    """Extract a .docx as groups of paragraphs separated by blank lines; runs in a worker process"""
+    import docx
+    paragraphs = [paragraph.text for paragraph in docx.Document(file_path).paragraphs]
+    return [
+        ("\n\n".join(paragraphs[i:i + DOCX_PARAGRAPHS_PER_PAGE]), None)
+        for i in range(0, len(paragraphs), DOCX_PARAGRAPHS_PER_PAGE)
+    ]
+
+
+def extract_text_pages(file_path: str) -> List[PageText]:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return [(f.read(), None)]
+
+
+def iter_pages(file_path: str, pages_per_batch: int = 8) -> Iterator[PageText]:
+    """
+    Extract a document in-process, page by page, split exactly as IngestionPipeline splits it
+
+    Anything that re-chunks a stored document (e.g. DocumentSync) must use this so its
+    chunk boundaries match the ones written at ingestion.
+    """
+    file_ext = Path(file_path).suffix.lower()
+    if file_ext == '.pdf':
+        total_pages = count_pages(file_path)
+        for start in range(0, total_pages, pages_per_batch):
+            yield from extract_pdf_pages(file_path, start, start + pages_per_batch)
+    elif file_ext == '.docx':
+        yield from extract_docx_pages(file_path)
+    elif file_ext in ['.txt', '.md']:
+        yield from extract_text_pages(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {file_ext}")
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_extraction_executor() -> ProcessPoolExecutor:
+    """Process pool shared by all ingestions; size with INGESTION_WORKERS"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=int(os.getenv('INGESTION_WORKERS', min(4, os.cpu_count() or 1)))
+        )
+    return _executor
+
+
+class IngestionPipeline:
+    """
+    Streaming document ingestion: extract -> chunk -> embed -> store.
+
+    PDF pages are extracted in a process pool a few pages at a time, chunked as they
+    arrive, embedded in batches while extraction continues and written to the vector
+    store in bulk. Stages are connected by bounded queues, so memory stays flat no
+    matter how big the document is: a slow stage makes the ones before it wait.
+
+    `progress` is called with a dict of counters (pages_total, pages_done,
+    chunks_created, chunks_embedded, chunks_stored) as pages and batches complete.
+    If any stage fails, the other stages are cancelled and the partly stored
+    document is removed.
+    """
+
+    def __init__(
+        self,
+        processor,
+        vector_store,
+        pages_per_task: int = 8,
+        embed_batch_size: int = 256,
+        max_concurrent_embeds: int = 2,
+        store_batch_size: int = 1000,
+        queue_size: int = 4,
+        progress: Optional[Callable[[Dict], None]] = None,
+    ):
+        self.processor = processor
+        self.vector_store = vector_store
+        self.pages_per_task = pages_per_task
+        self.embed_batch_size = embed_batch_size
+        self.max_concurrent_embeds = max_concurrent_embeds
+        self.store_batch_size = store_batch_size
+        self.queue_size = queue_size
+        self.progress = progress
+
+    def _report(self, counters: Dict):
+        logger.debug(f"Ingestion progress: {counters}")
+        if self.progress:
+            try:
+                self.progress(dict(counters))
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {str(e)}")
+
+    async def _extract(self, file_path: str, total_pages: int, pages: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        executor = get_extraction_executor()
+        file_ext = Path(file_path).suffix.lower()
+
+        if file_ext == '.pdf':
+            # Bound the extraction tasks in flight, and consume results in page order
+            pending = []
+            for start in range(0, total_pages, self.pages_per_task):
+                pending.append(loop.run_in_executor(
+                    executor, extract_pdf_pages, file_path, start, start + self.pages_per_task
+                ))
+                if len(pending) >= self.queue_size:
+                    for page in await pending.pop(0):
+                        await pages.put(page)
+            for future in pending:
+                for page in await future:
+                    await pages.put(page)
+        elif file_ext == '.docx':
+            for page in await loop.run_in_executor(executor, extract_docx_pages, file_path):
+                await pages.put(page)
+        elif file_ext in ['.txt', '.md']:
+            for page in await asyncio.to_thread(extract_text_pages, file_path):
+                await pages.put(page)
+        else:
+            raise ValueError(f"Unsupported file type: {file_ext}")
+        await pages.put(None)
+
+    async def _chunk(self, source: str, pages: asyncio.Queue, chunks: asyncio.Queue, counters: Dict):
+        chunk_number = 0
+        batch: List[DocumentChunk] = []
+        while True:
+            page = await pages.get()
+            if page is None:
+                break
+            text, page_number = page
+            page_chunks = await asyncio.to_thread(lambda: list(self.processor.chunker.split_text(text)))
+            for chunk in page_chunks:
+                chunk_number += 1
+                batch.append(DocumentChunk(
+                    content=chunk['content'],
+                    source=source,
+                    page_number=page_number,
+                    chunk_number=chunk_number
+                ))
+                if len(batch) >= self.embed_batch_size:
+                    await chunks.put(batch)
+                    batch = []
+            counters['pages_done'] += 1
+            counters['chunks_created'] = chunk_number
+            self._report(counters)
+        if batch:
+            await chunks.put(batch)
+        await chunks.put(None)
+
+    async def _embed(self, chunks: asyncio.Queue, embedded: asyncio.Queue, counters: Dict):
+        semaphore = asyncio.Semaphore(self.max_concurrent_embeds)
+        in_flight = set()
+        errors = []
+
+        async def embed_batch(batch: List[DocumentChunk]):
+            try:
+                embeddings = await self.processor.embedding_service.embed_texts([c.content for c in batch])
+                counters['chunks_embedded'] += len(batch)
+                await embedded.put((batch, embeddings))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                semaphore.release()
+
+        try:
+            while True:
+                batch = await chunks.get()
+                if batch is None:
+                    break
+                await semaphore.acquire()
+                if errors:
+                    raise errors[0]
+                task = asyncio.create_task(embed_batch(batch))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            await asyncio.gather(*in_flight)
+            if errors:
+                raise errors[0]
+        finally:
+            for task in in_flight:
+                task.cancel()
+        await embedded.put(None)
+
+    async def _store(self, document_id: str, title: str, embedded: asyncio.Queue, counters: Dict):
+        pending_chunks: List[DocumentChunk] = []
+        pending_embeddings: List[List[float]] = []
+
+        async def flush():
+            await self.vector_store.store_chunks(document_id, title, pending_chunks, pending_embeddings)
+            counters['chunks_stored'] += len(pending_chunks)
+            self._report(counters)
+            pending_chunks.clear()
+            pending_embeddings.clear()
+
+        while True:
+            item = await embedded.get()
+            if item is None:
+                break
+            batch, embeddings = item
+            pending_chunks.extend(batch)
+            pending_embeddings.extend(embeddings)
+            if len(pending_chunks) >= self.store_batch_size:
+                await flush()
+        if pending_chunks:
+            await flush()
+
+    async def run(self, file_path: str, metadata: DocumentMetadata) -> Dict:
+        """
+        Ingest a document and store it in the vector store
+
+        Returns:
+            Dict with the document_id and the final counters
+        """
+        started = time.monotonic()
+        total_pages = await asyncio.to_thread(count_pages, file_path)
+        if Path(file_path).suffix.lower() == '.pdf':
+            metadata.total_pages = total_pages
+        counters = {
+            'pages_total': total_pages,
+            'pages_done': 0,
+            'chunks_created': 0,
+            'chunks_embedded': 0,
+            'chunks_stored': 0,
+        }
+        document_id = await self.vector_store.create_document(metadata)
+
+        pages = asyncio.Queue(maxsize=self.queue_size * self.pages_per_task)
+        chunks = asyncio.Queue(maxsize=self.queue_size)
+        embedded = asyncio.Queue(maxsize=self.queue_size)
+        tasks = [
+            asyncio.create_task(self._extract(file_path, total_pages, pages)),
+            asyncio.create_task(self._chunk(metadata.title, pages, chunks, counters)),
+            asyncio.create_task(self._embed(chunks, embedded, counters)),
+            asyncio.create_task(self._store(document_id, metadata.title, embedded, counters)),
+        ]
+        try:
+            # Fail fast: the first stage error cancels the rest instead of leaving them blocked on queues
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await self.vector_store.delete_document(document_id)
+            except Exception as e:
+                logger.error(f"Failed to clean up partly ingested document {document_id}: {str(e)}")
+            raise
+
+        counters['seconds'] = round(time.monotonic() - started, 2)
+        logger.info(f"Ingested {metadata.title}: {counters}")
+        return {'document_id': document_id, **counters}
@@ -0,0 +1,265 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from src.services.chunk_mirror import ChunkMirror, fetch_document_titles, iter_chunk_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = '.cache/lexical_index.sqlite3'
+
+# Harakat, superscript alef and tatweel carry no meaning for matching
+ARABIC_DIACRITICS = re.compile(r'[\u064B-\u0652\u0670\u0640]')
+ARABIC_FOLDING = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    # Arabic-Indic and Persian digits, so "٢٥٠" matches "250"
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+})
+# Definite article, optionally behind a one-letter conjunction/preposition (و، ف، ب، ك، ل)
+ARABIC_ARTICLE = re.compile(r'^(?:[وفبكل]?ال|لل)(?=\w{2,})')
+# Codes like "PLAN-250" or "v2.1" are kept whole as well as split into parts
+TOKEN = re.compile(r'\w+(?:[-_/.]\w+)*')
+
+
+def normalize_arabic(text: str) -> str:
+    """Lowercase, strip diacritics and fold alef/ya/ta-marbuta variants and digits"""
+    return ARABIC_DIACRITICS.sub('', text).translate(ARABIC_FOLDING).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """Normalized search terms of a text; documents and queries go through the same function"""
+    tokens = []
+    for match in TOKEN.finditer(normalize_arabic(text)):
+        token = match.group()
+        parts = re.split(r'[-_/.]', token)
+        if len(parts) > 1:
+            tokens.append(''.join(parts))
+        for part in parts:
+            if part:
+                tokens.append(ARABIC_ARTICLE.sub('', part))
+    return tokens
+
+
+def reciprocal_rank_fusion(result_lists: Iterable[List[Dict]], limit: int, k: int = 60) -> List[Dict]:
+    """
+    Merge ranked result lists by reciprocal-rank fusion
+
+    Each chunk scores sum(1 / (k + rank)) over the lists it appears in, so chunks that
+    rank well for both lexical and vector search come first without having to make
+    BM25 and cosine scores comparable. Fields from earlier lists win when a chunk
+    appears in several.
+    """
+    fused: Dict[str, Dict] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            entry = fused.setdefault(result['id'], {**result, 'rrf_score': 0.0})
+            for key, value in result.items():
+                entry.setdefault(key, value)
+            entry['rrf_score'] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda entry: entry['rrf_score'], reverse=True)[:limit]
+
+
+class LexicalIndex(ChunkMirror):
+    """
+    Local BM25 inverted index over `document_chunks`, for exact terms like product
+    codes and plan names that embeddings match poorly.
+
+    Chunk text is normalized with tokenize() (Arabic diacritics stripped, letter
+    variants folded, definite article removed) and stored in a SQLite FTS5 table,
+    which keeps the postings and ranks with BM25. Queries are normalized the same
+    way and matched on any of their terms. The persisted index is reconciled with
+    the database on load and on resync() (see ChunkMirror).
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        self.ready = False
+        self._lock = threading.RLock()
+        self._init_mirror()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                rowid INTEGER PRIMARY KEY,
+                chunk_id TEXT UNIQUE,
+                document_id TEXT,
+                content TEXT,
+                page_number INTEGER,
+                chunk_number INTEGER
+            )
+        """)
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks(document_id)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS documents (document_id TEXT PRIMARY KEY, title TEXT)')
+        # Terms are pre-normalized, so FTS5 only needs to split on whitespace
+        self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5(body, tokenize='unicode61')")
+        self._db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self._db.commit()
+
+    # Building
+
+    def build_from_supabase(self, supabase, page_size: int = 1000):
+        """Rebuild the index from the document_chunks and documents tables"""
+        titles = fetch_document_titles(supabase)
+        rows = [row for page in iter_chunk_rows(supabase, self.CHUNK_COLUMNS, page_size) for row in page]
+        total = len(rows)
+        with self._lock:
+            self._db.execute('DELETE FROM chunks')
+            self._db.execute('DELETE FROM terms')
+            self._db.execute('DELETE FROM documents')
+            self._db.executemany('INSERT INTO documents (document_id, title) VALUES (?, ?)', list(titles.items()))
+            self._insert_rows(rows)
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+            self._db.commit()
+            self.ready = True
+        logger.info(f"Built lexical index with {total} chunks")
+
+    def load(self) -> bool:
+        """Use the persisted index if it was built before; returns False if it wasn't"""
+        with self._lock:
+            if not self._db.execute("SELECT value FROM meta WHERE key = 'built'").fetchone():
+                return False
+            self.ready = True
+            return True
+
+    def _local_positions(self) -> Dict[str, tuple]:
+        with self._lock:
+            rows = self._db.execute('SELECT chunk_id, page_number, chunk_number FROM chunks').fetchall()
+        return {chunk_id: (page_number, chunk_number) for chunk_id, page_number, chunk_number in rows}
+
+    def _apply_sync(self, titles: Dict[str, str], added: List[Dict], removed: List[str], moved: List[Dict]):
+        with self._lock:
+            self._db.execute('DELETE FROM documents')
+            self._db.executemany('INSERT INTO documents (document_id, title) VALUES (?, ?)', list(titles.items()))
+            self._delete_where('chunk_id', removed)
+            self._update_positions(moved)
+            self._insert_rows(added)
+            self._db.commit()
+
+    # Incremental updates
+
+    def _insert_rows(self, rows: List[Dict]):
+        for row in rows:
+            self._delete_where('chunk_id', [row['id']])
+            cursor = self._db.execute(
+                'INSERT INTO chunks (chunk_id, document_id, content, page_number, chunk_number) VALUES (?, ?, ?, ?, ?)',
+                (row['id'], row['document_id'], row['content'], row.get('page_number'), row.get('chunk_number'))
+            )
+            self._db.execute(
+                'INSERT INTO terms (rowid, body) VALUES (?, ?)',
+                (cursor.lastrowid, ' '.join(tokenize(row['content'])))
+            )
+
+    def _delete_where(self, column: str, values: List):
+        for start in range(0, len(values), 500):
+            batch = values[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            self._db.execute(
+                f"DELETE FROM terms WHERE rowid IN (SELECT rowid FROM chunks WHERE {column} IN ({placeholders}))",
+                batch
+            )
+            self._db.execute(f"DELETE FROM chunks WHERE {column} IN ({placeholders})", batch)
+
+    def add_chunks(self, document_id: str, title: str, rows: List[Dict]):
+        """Index newly stored chunks (rows with id, content, page_number and chunk_number)"""
+        if not rows:
+            return
+        with self._lock:
+            if self._defer('add_chunks', document_id, title, rows) or not self.ready:
+                return
+            self._db.execute(
+                'INSERT OR REPLACE INTO documents (document_id, title) VALUES (?, ?)',
+                (document_id, title)
+            )
+            self._insert_rows([{**row, 'document_id': document_id} for row in rows])
+            self._db.commit()
+
+    def update_chunk_positions(self, rows: List[Dict]):
+        if not rows:
+            return
+        with self._lock:
+            if self._defer('update_chunk_positions', rows) or not self.ready:
+                return
+            self._update_positions(rows)
+            self._db.commit()
+
+    def _update_positions(self, rows: List[Dict]):
+        self._db.executemany(
+            'UPDATE chunks SET page_number = ?, chunk_number = ? WHERE chunk_id = ?',
+            [(row['page_number'], row['chunk_number'], row['id']) for row in rows]
+        )
+
+    def remove_chunks(self, chunk_ids: List[str]):
+        if not chunk_ids:
+            return
+        with self._lock:
+            if self._defer('remove_chunks', chunk_ids) or not self.ready:
+                return
+            self._delete_where('chunk_id', chunk_ids)
+            self._db.commit()
+
+    def remove_document(self, document_id: str):
+        with self._lock:
+            if self._defer('remove_document', document_id) or not self.ready:
+                return
+            self._delete_where('document_id', [document_id])
+            self._db.execute('DELETE FROM documents WHERE document_id = ?', (document_id,))
+            self._db.commit()
+
+    # Search
+
+    def search(self, query: str, match_count: int = 3) -> List[Dict]:
+        """Return the best BM25 matches as dicts shaped like vector search results"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not self.ready or not terms:
+            return []
+        match = ' OR '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT c.chunk_id, c.document_id, c.content, c.page_number, c.chunk_number, d.title, bm25(terms) '
+                'FROM terms JOIN chunks c ON c.rowid = terms.rowid '
+                'LEFT JOIN documents d ON d.document_id = c.document_id '
+                'WHERE terms MATCH ? ORDER BY bm25(terms) LIMIT ?',
+                (match, match_count)
+            ).fetchall()
+        return [
+            {
+                'id': row[0],
+                'document_id': row[1],
+                'content': row[2],
+                'page_number': row[3],
+                'chunk_number': row[4],
+                'source': row[5],
+                # FTS5 returns negated BM25 so that smaller is better
+                'bm25': -row[6],
+            }
+            for row in rows
+        ]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            chunks = self._db.execute('SELECT COUNT(*) FROM chunks').fetchone()[0]
+        return {'ready': self.ready, 'chunks': chunks}
+
+
+_index: Optional[LexicalIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> Optional[LexicalIndex]:
+    """Process-wide lexical index, or None when LEXICAL_INDEX_PATH is set to an empty value"""
+    global _index
+    path = os.getenv('LEXICAL_INDEX_PATH', DEFAULT_INDEX_PATH)
+    if not path:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = LexicalIndex(path)
+        return _index
@@ -0,0 +1,377 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import faiss
+import numpy as np
+
+from src.services.chunk_mirror import ChunkMirror, fetch_document_titles, iter_chunk_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = '.cache/vector_index'
+
+
+class LocalVectorIndex(ChunkMirror):
+    """
+    Local FAISS mirror of `document_chunks` embeddings.
+
+    Vectors live in a FAISS index (HNSW, or IVF once there is enough data to train it)
+    persisted to `chunks.faiss` and memory-mapped on startup; chunk and document metadata
+    live next to it in `chunks_meta.sqlite3`, so a query needs no database round-trip.
+    Deleted chunks are tombstoned in the metadata and filtered out of results; the
+    index is rebuilt once tombstones make up a large share of it. The persisted index is
+    reconciled with the database on load and on resync() (see ChunkMirror).
+    """
+
+    CHUNK_COLUMNS = 'id, document_id, content, page_number, chunk_number, embedding'
+
+    def __init__(
+        self,
+        index_dir: str = DEFAULT_INDEX_DIR,
+        index_type: str = 'hnsw',
+        hnsw_m: int = 32,
+        hnsw_ef_search: int = 128,
+        ivf_nprobe: int = 16,
+        rebuild_tombstone_ratio: float = 0.2,
+    ):
+        if index_type not in ('hnsw', 'ivf'):
+            raise ValueError(f"Unsupported index type: {index_type}")
+
+        self.index_dir = Path(index_dir)
+        self.index_path = self.index_dir / 'chunks.faiss'
+        self.index_type = index_type
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_search = hnsw_ef_search
+        self.ivf_nprobe = ivf_nprobe
+        self.rebuild_tombstone_ratio = rebuild_tombstone_ratio
+
+        self.index = None
+        self.ready = False
+        self._mmapped = False
+        self._lock = threading.RLock()
+        self._init_mirror()
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.index_dir / 'chunks_meta.sqlite3', check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                vector_id INTEGER PRIMARY KEY,
+                chunk_id TEXT UNIQUE,
+                document_id TEXT,
+                content TEXT,
+                page_number INTEGER,
+                chunk_number INTEGER,
+                deleted INTEGER DEFAULT 0
+            )
+        """)
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks(document_id)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS documents (document_id TEXT PRIMARY KEY, title TEXT)')
+        self._db.commit()
+
+    # Index construction
+
+    def _new_index(self, dimension: int, training_vectors: Optional[np.ndarray] = None):
+        if self.index_type == 'ivf' and training_vectors is not None:
+            # ~39 training points per list is FAISS' rule of thumb
+            nlist = int(min(4 * np.sqrt(len(training_vectors)), len(training_vectors) // 39))
+            if nlist >= 8:
+                quantizer = faiss.IndexFlatIP(dimension)
+                index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+                index.train(training_vectors)
+                index.nprobe = min(self.ivf_nprobe, nlist)
+                return faiss.IndexIDMap2(index)
+        if self.index_type == 'hnsw':
+            index = faiss.IndexHNSWFlat(dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efSearch = self.hnsw_ef_search
+            return faiss.IndexIDMap2(index)
+        # Too little data to train IVF yet: exact search until the next rebuild
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+
+    @staticmethod
+    def _as_matrix(embeddings: Iterable) -> np.ndarray:
+        matrix = np.array([
+            json.loads(e) if isinstance(e, str) else e for e in embeddings
+        ], dtype=np.float32)
+        faiss.normalize_L2(matrix)
+        return matrix
+
+    def _save(self):
+        faiss.write_index(self.index, str(self.index_path))
+
+    def _ensure_writable(self):
+        # A memory-mapped index is read-only; load it fully before the first write
+        if self._mmapped:
+            self.index = faiss.read_index(str(self.index_path))
+            self._apply_search_params()
+            self._mmapped = False
+
+    def _apply_search_params(self):
+        inner = faiss.downcast_index(self.index.index) if isinstance(self.index, faiss.IndexIDMap2) else None
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = self.hnsw_ef_search
+        elif isinstance(inner, faiss.IndexIVF):
+            inner.nprobe = min(self.ivf_nprobe, inner.nlist)
+
+    def load(self) -> bool:
+        """Load a persisted index (memory-mapped); returns False if there is none"""
+        with self._lock:
+            if not self.index_path.exists():
+                return False
+            try:
+                self.index = faiss.read_index(str(self.index_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                self._mmapped = True
+            except RuntimeError:
+                self.index = faiss.read_index(str(self.index_path))
+                self._mmapped = False
+            self.index = faiss.downcast_index(self.index)
+            self._apply_search_params()
+            self.ready = True
+            logger.info(f"Loaded local vector index with {self.index.ntotal} vectors")
+            return True
+
+    def build_from_supabase(self, supabase, page_size: int = 1000):
+        """Rebuild the index and metadata from the document_chunks and documents tables"""
+        titles = fetch_document_titles(supabase)
+        rows = [row for page in iter_chunk_rows(supabase, self.CHUNK_COLUMNS, page_size) for row in page]
+        self.rebuild(rows, titles)
+
+    def rebuild(self, rows: List[Dict], titles: Dict[str, str]):
+        """Replace the index with the given chunk rows (each including its embedding)"""
+        with self._lock:
+            self._db.execute('DELETE FROM chunks')
+            self._db.execute('DELETE FROM documents')
+            self._db.executemany(
+                'INSERT INTO documents (document_id, title) VALUES (?, ?)',
+                list(titles.items())
+            )
+            self.index = None
+            self._mmapped = False
+            if rows:
+                matrix = self._as_matrix(row['embedding'] for row in rows)
+                self.index = self._new_index(matrix.shape[1], matrix)
+                self._insert_rows(rows, matrix)
+                self._save()
+            elif self.index_path.exists():
+                self.index_path.unlink()
+            self._db.commit()
+            self.ready = True
+            logger.info(f"Built local vector index with {len(rows)} vectors ({self.index_type})")
+
+    def _local_positions(self) -> Dict[str, tuple]:
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT chunk_id, page_number, chunk_number FROM chunks WHERE deleted = 0'
+            ).fetchall()
+        return {chunk_id: (page_number, chunk_number) for chunk_id, page_number, chunk_number in rows}
+
+    def _apply_sync(self, titles: Dict[str, str], added: List[Dict], removed: List[str], moved: List[Dict]):
+        with self._lock:
+            self._ensure_writable()
+            self._db.execute('DELETE FROM documents')
+            self._db.executemany('INSERT INTO documents (document_id, title) VALUES (?, ?)', list(titles.items()))
+            self._tombstone('chunk_id', removed)
+            self._update_positions(moved)
+            if added:
+                matrix = self._as_matrix(row['embedding'] for row in added)
+                if self.index is None:
+                    self.index = self._new_index(matrix.shape[1], matrix)
+                self._tombstone('chunk_id', [row['id'] for row in added])
+                self._insert_rows(added, matrix)
+                self._save()
+            self._db.commit()
+            self._maybe_compact()
+
+    # Incremental updates
+
+    def _insert_rows(self, rows: List[Dict], matrix: np.ndarray):
+        cursor = self._db.execute('SELECT COALESCE(MAX(vector_id), -1) FROM chunks')
+        next_id = cursor.fetchone()[0] + 1
+        ids = np.arange(next_id, next_id + len(rows), dtype=np.int64)
+        self._db.executemany(
+            'INSERT OR REPLACE INTO chunks '
+            '(vector_id, chunk_id, document_id, content, page_number, chunk_number, deleted) '
+            'VALUES (?, ?, ?, ?, ?, ?, 0)',
+            [
+                (int(vector_id), row.get('id'), row['document_id'], row['content'],
+                 row.get('page_number'), row.get('chunk_number'))
+                for vector_id, row in zip(ids, rows)
+            ]
+        )
+        self.index.add_with_ids(matrix, ids)
+
+    def add_chunks(self, document_id: str, title: str, rows: List[Dict]):
+        """
+        Add newly stored chunks
+
+        Args:
+            document_id: Document the chunks belong to
+            title: Document title, returned as the chunk source
+            rows: Chunk rows with id, content, page_number, chunk_number and embedding
+        """
+        if not rows:
+            return
+        with self._lock:
+            if self._defer('add_chunks', document_id, title, rows) or not self.ready:
+                return
+            self._ensure_writable()
+            matrix = self._as_matrix(row['embedding'] for row in rows)
+            if self.index is None:
+                self.index = self._new_index(matrix.shape[1], matrix)
+            self._db.execute(
+                'INSERT OR REPLACE INTO documents (document_id, title) VALUES (?, ?)',
+                (document_id, title)
+            )
+            # Re-added chunk ids replace their old vectors
+            self._tombstone('chunk_id', [row['id'] for row in rows if row.get('id')])
+            self._insert_rows([{**row, 'document_id': document_id} for row in rows], matrix)
+            self._db.commit()
+            self._save()
+
+    def _tombstone(self, column: str, values: List):
+        for start in range(0, len(values), 500):
+            batch = values[start:start + 500]
+            self._db.execute(
+                f"UPDATE chunks SET deleted = 1 WHERE {column} IN ({','.join('?' * len(batch))})",
+                batch
+            )
+
+    def remove_chunks(self, chunk_ids: List[str]):
+        """Hide deleted chunks from search results"""
+        if not chunk_ids:
+            return
+        with self._lock:
+            if self._defer('remove_chunks', chunk_ids) or not self.ready:
+                return
+            self._tombstone('chunk_id', chunk_ids)
+            self._db.commit()
+            self._maybe_compact()
+
+    def update_chunk_positions(self, rows: List[Dict]):
+        """Record new page and chunk numbers for chunks whose content didn't change"""
+        if not rows:
+            return
+        with self._lock:
+            if self._defer('update_chunk_positions', rows) or not self.ready:
+                return
+            self._update_positions(rows)
+            self._db.commit()
+
+    def _update_positions(self, rows: List[Dict]):
+        self._db.executemany(
+            'UPDATE chunks SET page_number = ?, chunk_number = ? WHERE chunk_id = ?',
+            [(row['page_number'], row['chunk_number'], row['id']) for row in rows]
+        )
+
+    def remove_document(self, document_id: str):
+        with self._lock:
+            if self._defer('remove_document', document_id) or not self.ready:
+                return
+            self._tombstone('document_id', [document_id])
+            self._db.execute('DELETE FROM documents WHERE document_id = ?', (document_id,))
+            self._db.commit()
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        total, deleted = self._db.execute('SELECT COUNT(*), COALESCE(SUM(deleted), 0) FROM chunks').fetchone()
+        if not total or deleted / total < self.rebuild_tombstone_ratio:
+            return
+        self._ensure_writable()
+        inner = faiss.downcast_index(self.index.index)
+        if isinstance(inner, faiss.IndexIVF):
+            # IVF lists need a direct map before vectors can be reconstructed by id
+            inner.make_direct_map()
+        live = self._db.execute(
+            'SELECT vector_id, chunk_id, document_id, content, page_number, chunk_number '
+            'FROM chunks WHERE deleted = 0 ORDER BY vector_id'
+        ).fetchall()
+        vectors = np.vstack([self.index.reconstruct(int(row[0])) for row in live]) if live else None
+        titles = dict(self._db.execute('SELECT document_id, title FROM documents').fetchall())
+        rows = [
+            {'id': row[1], 'document_id': row[2], 'content': row[3], 'page_number': row[4],
+             'chunk_number': row[5], 'embedding': vector}
+            for row, vector in zip(live, vectors if vectors is not None else [])
+        ]
+        logger.info(f"Compacting local vector index: dropping {deleted} tombstoned vectors")
+        self.rebuild(rows, titles)
+
+    # Search
+
+    def search(self, query_embedding: List[float], match_count: int = 3, match_threshold: float = 0.0) -> List[Dict]:
+        """Return the closest live chunks as dicts shaped like match_document_chunks results"""
+        with self._lock:
+            if not self.ready or self.index is None or self.index.ntotal == 0:
+                return []
+            query = self._as_matrix([query_embedding])
+            # Oversample so tombstoned hits don't leave us short
+            k = min(self.index.ntotal, max(match_count * 4, match_count + 16))
+            scores, ids = self.index.search(query, k)
+
+            hits = [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i != -1 and s >= match_threshold]
+            if not hits:
+                return []
+            rows = self._db.execute(
+                'SELECT c.vector_id, c.chunk_id, c.document_id, c.content, c.page_number, c.chunk_number, d.title '
+                'FROM chunks c LEFT JOIN documents d ON d.document_id = c.document_id '
+                f"WHERE c.deleted = 0 AND c.vector_id IN ({','.join('?' * len(hits))})",
+                [vector_id for vector_id, _ in hits]
+            ).fetchall()
+
+        by_id = {row[0]: row for row in rows}
+        results = []
+        for vector_id, score in hits:
+            row = by_id.get(vector_id)
+            if row is None:
+                continue
+            results.append({
+                'id': row[1],
+                'document_id': row[2],
+                'content': row[3],
+                'page_number': row[4],
+                'chunk_number': row[5],
+                'source': row[6],
+                'similarity': score,
+            })
+            if len(results) >= match_count:
+                break
+        return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total, deleted = self._db.execute('SELECT COUNT(*), COALESCE(SUM(deleted), 0) FROM chunks').fetchone()
+        return {
+            'ready': self.ready,
+            'index_type': self.index_type,
+            'vectors': self.index.ntotal if self.index is not None else 0,
+            'live_chunks': total - deleted,
+            'tombstones': deleted,
+        }
+
+
+_index: Optional[LocalVectorIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_local_vector_index() -> Optional[LocalVectorIndex]:
+    """
+    Process-wide local index, or None when disabled.
+
+    LOCAL_VECTOR_INDEX selects 'hnsw' (default), 'ivf' or 'off'; LOCAL_VECTOR_INDEX_DIR
+    sets where the index and metadata files are kept.
+    """
+    global _index
+    index_type = os.getenv('LOCAL_VECTOR_INDEX', 'hnsw').lower()
+    if index_type == 'off':
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = LocalVectorIndex(
+                index_dir=os.getenv('LOCAL_VECTOR_INDEX_DIR', DEFAULT_INDEX_DIR),
+                index_type=index_type,
+            )
+        return _index
@@ -1,65 +1,153 @@
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Tuple
 import openai
 import os
+import time
+import asyncio
+import tiktoken
 from src.services.vector_store import VectorStore
-from src.utils.openai_client import get_openai_client
-from openai import OpenAI
+from src.utils.openai_client import get_openai_client, create_chat_completion, stream_chat_completion
+from src.services.embedding_service import EmbeddingService
+from src.services.context_builder import ContextBuilder
+from src.services.answer_cache import get_answer_cache
 
 class RAGService:
-    def __init__(self):
-        self.vector_store = VectorStore()
+    def __init__(self, vector_store: VectorStore = None):
         self.embedding_model = "text-embedding-3-small"
+        self.vector_store = vector_store or VectorStore(
+            embedding_service=EmbeddingService(model=self.embedding_model)
+        )
+        self.embedding_service = self.vector_store.embedding_service
         self.generation_model = "gpt-4o"
         self.openai_client = get_openai_client(self.generation_model)
-        # Use direct OpenAI API for embeddings
-        self.embeddings_client = OpenAI(
-            api_key=os.getenv('OPENAI_API_KEY'),
-            # Don't set base_url to use the default OpenAI API endpoint
+        # Minimum cosine similarity for vector hits; lexical hits are fused in regardless
+        self.match_threshold = float(os.getenv('RAG_MATCH_THRESHOLD', 0.1))
+        try:
+            tokenizer = tiktoken.encoding_for_model(self.generation_model)
+        except KeyError:
+            tokenizer = tiktoken.get_encoding("cl100k_base")
+        self.context_builder = ContextBuilder(
+            tokenizer,
+            max_tokens=int(os.getenv('RAG_CONTEXT_TOKENS', 3000))
         )
         
-    async def get_answer(self, question: str, max_chunks: int = 5) -> Dict:
-        # Get relevant chunks
-        chunks = await self.vector_store.search_similar_chunks(
+    async def _check_cache(self, question: str, max_chunks: int, use_cache: bool) -> Dict:
+        """Look the question up in the answer cache; returns the lookup state needed to store the answer later"""
+        state = {'cache': get_answer_cache() if use_cache else None, 'cached': None}
+        if state['cache']:
+            # Read the version before retrieval so an answer built on content that changes meanwhile isn't cached
+            state['kb_version'] = state['cache'].version
+            state['embedding'] = await self.embedding_service.embed_text(question)
+            state['cached'] = await asyncio.to_thread(state['cache'].lookup, state['embedding'], max_chunks)
+        return state
+
+    async def _store_in_cache(self, state: Dict, question: str, max_chunks: int, result: Dict, started: float):
+        if state['cache']:
+            await asyncio.to_thread(
+                state['cache'].store, question, state['embedding'], max_chunks, result,
+                time.monotonic() - started, state['kb_version']
+            )
+
+    async def _build_prompt(self, question: str, max_chunks: int) -> Dict:
+        """Retrieve and pack context; returns the messages to send and the chunks used"""
+        # Retrieve more candidates than needed so duplicates can be dropped and the budget filled
+        candidates = await self.vector_store.hybrid_search(
             query=question,
-            match_count=max_chunks
+            match_count=max(max_chunks * 3, 10),
+            match_threshold=self.match_threshold
         )
         
-        # Format context from chunks
-        context = "\n\n".join([
-            f"Source: {chunk['source']}, Page: {chunk['page_number']}\n{chunk['content']}"
-            for chunk in chunks
-        ])
+        # Pack deduplicated, diverse chunks into the context token budget
+        packed = self.context_builder.build(candidates, max_chunks=max_chunks)
+        context = packed['context']
         
         print(context)
-        # Generate answer using context
-        messages = [
+        packed['messages'] = [
             {"role": "system", "content": "You are a helpful assistant. Use the provided context to answer the user's question. If you cannot find the answer in the context, say so."},
             {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"}
         ]
+        packed['sources'] = [
+            {
+                "content": chunk['content'],
+                "source": chunk['source'],
+                "page": chunk['page_number'],
+                "similarity": chunk['similarity']
+            }
+            for chunk in packed['chunks']
+        ]
+        return packed
+
+    @staticmethod
+    def _make_result(answer: str, packed: Dict, usage) -> Dict:
+        return {
+            "answer": answer,
+            "sources": packed['sources'],
+            "usage": {
+                "context_tokens": packed['context_tokens'],
+                "prompt_tokens": usage.prompt_tokens if usage else None,
+                "completion_tokens": usage.completion_tokens if usage else None,
+                "total_tokens": usage.total_tokens if usage else None
+            }
+        }
+
+    async def get_answer(self, question: str, max_chunks: int = 5, use_cache: bool = True) -> Dict:
+        started = time.monotonic()
+        cache_state = await self._check_cache(question, max_chunks, use_cache)
+        if cache_state['cached']:
+            return {**cache_state['cached'], "cached": True}
+
+        packed = await self._build_prompt(question, max_chunks)
         
-        response = self.openai_client.chat.completions.create(
+        # Generate answer using context
+        response = await create_chat_completion(
+            self.openai_client,
             model=self.generation_model,
-            messages=messages,
+            messages=packed['messages'],
             temperature=0.3,
             max_tokens=500
         )
         
-        return {
-            "answer": response.choices[0].message.content,
-            "sources": [
-                {
-                    "content": chunk['content'],
-                    "source": chunk['source'],
-                    "page": chunk['page_number'],
-                    "similarity": chunk['similarity']
-                }
-                for chunk in chunks
-            ]
-        }
+        result = self._make_result(response.choices[0].message.content, packed, response.usage)
+        await self._store_in_cache(cache_state, question, max_chunks, result, started)
+        return {**result, "cached": False}
+
+    async def stream_answer(
+        self, question: str, max_chunks: int = 5, use_cache: bool = True
+    ) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Answer a question as a stream of (event, data) pairs
+
+        Yields `sources` (the chunks used) as soon as retrieval is done, then `token`
+        events with answer text as the model produces it, then `result` with the same
+        payload get_answer returns.
+        """
+        started = time.monotonic()
+        cache_state = await self._check_cache(question, max_chunks, use_cache)
+        if cache_state['cached']:
+            cached = cache_state['cached']
+            yield 'sources', cached['sources']
+            yield 'token', cached['answer']
+            yield 'result', {**cached, "cached": True}
+            return
+
+        packed = await self._build_prompt(question, max_chunks)
+        yield 'sources', packed['sources']
+
+        usage = {}
+        parts = []
+        async for text in stream_chat_completion(
+            self.openai_client,
+            on_usage=lambda value: usage.update(value=value),
+            model=self.generation_model,
+            messages=packed['messages'],
+            temperature=0.3,
+            max_tokens=500
+        ):
+            parts.append(text)
+            yield 'token', text
+
+        result = self._make_result(''.join(parts), packed, usage.get('value'))
+        await self._store_in_cache(cache_state, question, max_chunks, result, started)
+        yield 'result', {**result, "cached": False}
 
     async def create_embeddings(self, text: str) -> List[float]:
-        response = self.embeddings_client.embeddings.create(
-            input=text,
-            model=self.embedding_model
-        )
-        return response.data[0].embedding 
\ No newline at end of file
+        return await self.embedding_service.embed_text(text) 
\ No newline at end of file
@@ -0,0 +1,124 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+def request_fingerprint(endpoint: str, arguments: Dict) -> str:
+    """Hash of an endpoint and its (pydantic) request arguments, independent of key order"""
+    payload = {
+        name: value.model_dump(mode='json') if isinstance(value, BaseModel) else value
+        for name, value in arguments.items()
+    }
+    text = json.dumps([endpoint, payload], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class RequestCoalescer:
+    """
+    Single-flight execution of identical in-flight requests
+
+    The first request with a given fingerprint runs; identical requests arriving
+    while it is still running wait for it and get the same result (or exception)
+    instead of making their own upstream calls. Nothing is kept once the request
+    finishes, so this never serves stale results; it only merges concurrent work.
+
+    The shared run is shielded from cancellation, so one client disconnecting
+    doesn't fail the others waiting on it.
+    """
+
+    def __init__(self, endpoints: Optional[Set[str]] = None):
+        # None enables every endpoint that opts in
+        self.endpoints = endpoints
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.stats_counters: Dict[str, Dict[str, int]] = {}
+
+    def enabled(self, endpoint: str) -> bool:
+        return self.endpoints is None or endpoint in self.endpoints
+
+    def _count(self, endpoint: str, key: str):
+        with self._lock:
+            counters = self.stats_counters.setdefault(
+                endpoint, {'requests': 0, 'upstream': 0, 'coalesced': 0, 'errors': 0}
+            )
+            counters[key] += 1
+
+    async def run(self, endpoint: str, key: str, compute: Callable[[], Awaitable]):
+        """Run `compute`, or join the run already in flight for the same key"""
+        self._count(endpoint, 'requests')
+        task = self._in_flight.get(key)
+        if task is None:
+            self._count(endpoint, 'upstream')
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+
+            def finished(done: asyncio.Future):
+                self._in_flight.pop(key, None)
+                if not done.cancelled() and done.exception() is not None:
+                    self._count(endpoint, 'errors')
+
+            task.add_done_callback(finished)
+        else:
+            self._count(endpoint, 'coalesced')
+            logger.debug(f"Coalesced {endpoint} request with one in flight")
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = {endpoint: dict(counters) for endpoint, counters in self.stats_counters.items()}
+        for counters in stats.values():
+            counters['coalesced_rate'] = round(counters['coalesced'] / counters['requests'], 4) if counters['requests'] else 0.0
+        stats['in_flight'] = len(self._in_flight)
+        return stats
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_request_coalescer() -> RequestCoalescer:
+    """
+    Process-wide coalescer; COALESCE_ENDPOINTS narrows which opted-in endpoints
+    coalesce (comma-separated names, `all` by default, `none` to disable)
+    """
+    global _coalescer
+    with _coalescer_lock:
+        if _coalescer is None:
+            setting = os.getenv('COALESCE_ENDPOINTS', 'all').strip()
+            if setting == 'all':
+                endpoints = None
+            elif setting == 'none':
+                endpoints = set()
+            else:
+                endpoints = {name.strip() for name in setting.split(',') if name.strip()}
+            _coalescer = RequestCoalescer(endpoints)
+        return _coalescer
+
+
+def coalesce_requests(endpoint: str):
+    """
+    Opt an async FastAPI endpoint into request coalescing
+
+    Requests are keyed by `endpoint` and the endpoint's arguments, so only
+    requests with identical bodies share a run. Use it on endpoints whose result
+    depends only on the request, below the route decorator.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(**kwargs):
+            coalescer = get_request_coalescer()
+            if not coalescer.enabled(endpoint):
+                return await func(**kwargs)
+            key = request_fingerprint(endpoint, kwargs)
+            return await coalescer.run(endpoint, key, lambda: func(**kwargs))
+        return wrapper
+    return decorator
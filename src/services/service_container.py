@@ -0,0 +1,78 @@
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from src.utils.openai_client import close_openai_clients
+
+if TYPE_CHECKING:
+    from supabase import Client
+    from src.services.document_uploader import DocumentUploader
+
+
+class ServiceContainer:
+    """
+    Services shared by every request for the lifetime of the application.
+
+    Building a VectorStore, DocumentProcessor or RAGService creates Supabase and
+    OpenAI clients and a tiktoken encoder, and DocumentUploader checks the storage
+    bucket over the network; doing that once per request added several round trips
+    and a fresh connection pool to each one. The container builds them once around
+    a single Supabase client and embedding service (OpenAI clients come from the
+    pooled clients in src.utils.openai_client). None of these services keep
+    per-request state, so they are safe to share between concurrent requests.
+    """
+
+    def __init__(self, supabase: Optional['Client'] = None):
+        # Imported here so that importing the container (e.g. from main) stays cheap
+        from supabase import create_client
+        from src.services.document_processor import DocumentProcessor
+        from src.services.embedding_service import EmbeddingService
+        from src.services.rag_service import RAGService
+        from src.services.vector_store import VectorStore
+
+        self.supabase = supabase or create_client(
+            os.getenv('SUPABASE_URL'),
+            os.getenv('SUPABASE_KEY')
+        )
+        self.embedding_service = EmbeddingService()
+        self.vector_store = VectorStore(embedding_service=self.embedding_service, supabase=self.supabase)
+        self.document_processor = DocumentProcessor(embedding_service=self.embedding_service)
+        self.rag_service = RAGService(vector_store=self.vector_store)
+        self._document_uploader: Optional['DocumentUploader'] = None
+        self._lock = threading.Lock()
+
+    @property
+    def document_uploader(self) -> 'DocumentUploader':
+        # Created on first upload so an unreachable storage API doesn't fail startup
+        from src.services.document_uploader import DocumentUploader
+
+        with self._lock:
+            if self._document_uploader is None:
+                self._document_uploader = DocumentUploader(supabase=self.supabase)
+            return self._document_uploader
+
+    def close(self):
+        close_openai_clients()
+
+
+_container: Optional[ServiceContainer] = None
+_container_lock = threading.Lock()
+
+
+def get_service_container() -> ServiceContainer:
+    """Process-wide service container, built on first use (normally at application startup)"""
+    global _container
+    with _container_lock:
+        if _container is None:
+            _container = ServiceContainer()
+        return _container
+
+
+def close_service_container():
+    global _container
+    with _container_lock:
+        if _container is not None:
+            _container.close()
+            _container = None
+    # LLM endpoints use the pooled clients even when the container was never built
+    close_openai_clients()
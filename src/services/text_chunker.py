@@ -0,0 +1,143 @@
+import hashlib
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.services.embedding_cache import normalize_text
+
+# Sentence-ending punctuation, including the Arabic question mark, semicolon and full stop
+SENTENCE_BOUNDARY = re.compile(r'[^\n.!?؟؛۔…]*(?:[.!?؟؛۔…]+|\n\s*\n|\n|$)\s*')
+WORD = re.compile(r'\S+\s*')
+
+
+def content_hash(text: str) -> str:
+    """Fingerprint of a chunk's normalized content, used to detect unchanged chunks on re-ingestion"""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class TextChunker:
+    """
+    Token-budgeted chunker that keeps sentences and paragraphs intact.
+
+    Text is split into sentences (Latin and Arabic punctuation, line and paragraph
+    breaks) and sentences are packed into chunks of at most `chunk_size` tokens as
+    counted by the embedding tokenizer. Consecutive chunks share up to `chunk_overlap`
+    tokens of whole trailing sentences, which must be smaller than the chunk size so
+    every chunk makes progress. A sentence longer than a whole chunk is split on
+    words, and a single oversized word on tokens.
+
+    Chunks are produced lazily, so a large document never has to be held in memory
+    as a list of chunks.
+    """
+
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50, tokenizer=None):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError("chunk_overlap must be at least 0 and smaller than chunk_size")
+
+        if tokenizer is None:
+            import tiktoken
+            tokenizer = tiktoken.get_encoding("cl100k_base")
+        self.tokenizer = tokenizer
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        # Documents may contain text like "<|endoftext|>" that must not be treated as special tokens
+        self._encode = getattr(tokenizer, 'encode_ordinary', tokenizer.encode)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._encode(text))
+
+    def _split_long(self, sentence: str) -> Iterator[Tuple[str, int]]:
+        """Split a sentence that doesn't fit in one chunk into word groups that do"""
+        current = []
+        current_tokens = 0
+        for match in WORD.finditer(sentence):
+            word = match.group()
+            tokens = self.count_tokens(word)
+            if tokens > self.chunk_size:
+                if current:
+                    yield ''.join(current), current_tokens
+                    current, current_tokens = [], 0
+                encoded = self._encode(word)
+                for start in range(0, len(encoded), self.chunk_size):
+                    piece = encoded[start:start + self.chunk_size]
+                    yield self.tokenizer.decode(piece), len(piece)
+                continue
+            if current and current_tokens + tokens > self.chunk_size:
+                yield ''.join(current), current_tokens
+                current, current_tokens = [], 0
+            current.append(word)
+            current_tokens += tokens
+        if current:
+            yield ''.join(current), current_tokens
+
+    def _units(self, text: str) -> Iterator[Tuple[str, int]]:
+        """Yield (sentence, token count) pairs, each no longer than one chunk"""
+        for match in SENTENCE_BOUNDARY.finditer(text):
+            sentence = match.group()
+            if not sentence.strip():
+                continue
+            tokens = self.count_tokens(sentence)
+            if tokens > self.chunk_size:
+                yield from self._split_long(sentence)
+            else:
+                yield sentence, tokens
+
+    def _overlap(self, units: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        """Trailing whole sentences of a chunk that fit in the overlap budget"""
+        kept = []
+        total = 0
+        for unit in reversed(units):
+            if total + unit[1] > self.chunk_overlap:
+                break
+            kept.append(unit)
+            total += unit[1]
+        kept.reverse()
+        return kept
+
+    def split_text(self, text: str) -> Iterator[Dict]:
+        """
+        Lazily split one text into chunks
+
+        Yields:
+            Dicts with `content` and `token_count`
+        """
+        current: List[Tuple[str, int]] = []
+        current_tokens = 0
+        # True once the current chunk holds something that hasn't been emitted yet
+        has_new = False
+
+        for unit in self._units(text):
+            if current and current_tokens + unit[1] > self.chunk_size:
+                if has_new:
+                    yield {'content': ''.join(u[0] for u in current).strip(), 'token_count': current_tokens}
+                current = self._overlap(current)
+                current_tokens = sum(u[1] for u in current)
+                # Drop overlap from the front until the next sentence fits
+                while current and current_tokens + unit[1] > self.chunk_size:
+                    current_tokens -= current.pop(0)[1]
+                has_new = False
+            current.append(unit)
+            current_tokens += unit[1]
+            has_new = True
+
+        if current and has_new:
+            yield {'content': ''.join(u[0] for u in current).strip(), 'token_count': current_tokens}
+
+    def iter_chunks(self, pages: Iterable[Tuple[str, Optional[int]]]) -> Iterator[Dict]:
+        """
+        Lazily chunk a document given as (text, page_number) pairs
+
+        Chunks never span pages so each keeps an exact page number; chunk numbers
+        run across the whole document, starting at 1 as stored in document_chunks.
+
+        Yields:
+            Dicts with `content`, `token_count`, `page_number` and `chunk_number`
+        """
+        chunk_number = 0
+        for text, page_number in pages:
+            for chunk in self.split_text(text):
+                chunk_number += 1
+                chunk['page_number'] = page_number
+                chunk['chunk_number'] = chunk_number
+                yield chunk
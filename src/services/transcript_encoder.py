@@ -0,0 +1,202 @@
+import bisect
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SPEAKER_NUMBER = re.compile(r'^speaker[\s_]*(\d+)$', re.IGNORECASE)
+
+
+def _value(segment, key, default=None):
+    return segment.get(key, default) if isinstance(segment, dict) else getattr(segment, key, default)
+
+
+class EncodedTranscript:
+    """
+    Compact prompt rendering of a transcript, with a mapping back to its segments.
+
+    Instead of JSON with repeated keys and full-precision floats, each segment is one
+    line with a 1-based index, its start time rounded to 0.1 s and a short speaker tag:
+
+        Speakers: S0 = Speaker 0, S1 = Speaker 1
+        1 [0.0] S0: مرحبا، كيف أقدر أساعدك؟
+        2 [3.4] S1: أبغى أسترجع المبلغ
+
+    render(indexed=False) drops the index and time for prompts that don't need them. Indices and
+    timestamps returned by the model are mapped back to segments with segment_position
+    and resolve_timestamp, so responses keep the exact original times.
+    """
+
+    def __init__(self, segments: List):
+        self.segments = segments
+        self.starts = [float(_value(s, 'startTime') or 0.0) for s in segments]
+        names = list(dict.fromkeys(str(_value(s, 'speaker') or 'Unknown') for s in segments))
+        numbers = [SPEAKER_NUMBER.match(name) for name in names]
+        if all(numbers) and len({m.group(1) for m in numbers}) == len(names):
+            # "Speaker 0" becomes S0, so tags match the names the model may mention
+            self.speakers: Dict[str, str] = {name: f"S{m.group(1)}" for name, m in zip(names, numbers)}
+        else:
+            self.speakers = {name: f"S{i}" for i, name in enumerate(names)}
+        self.legend = "Speakers: " + ", ".join(f"{tag} = {name}" for name, tag in self.speakers.items())
+        self.indexed_lines = [
+            f"{i + 1} [{start:.1f}] {self._tag(segment)}: {self._text(segment)}"
+            for i, (segment, start) in enumerate(zip(segments, self.starts))
+        ]
+        self.dialogue_lines = [f"{self._tag(segment)}: {self._text(segment)}" for segment in segments]
+        self.token_stats: Optional[Dict] = None
+        self._windows: Dict = {}
+        self._lock = threading.Lock()
+
+    def _tag(self, segment) -> str:
+        return self.speakers[str(_value(segment, 'speaker') or 'Unknown')]
+
+    @staticmethod
+    def _text(segment) -> str:
+        # Keep every segment on one line
+        return ' '.join(str(_value(segment, 'text') or '').split())
+
+    def render(self, positions: Optional[List[int]] = None, indexed: bool = True) -> str:
+        """Prompt text for the given segment positions (0-based; all segments by default)"""
+        lines = self.indexed_lines if indexed else self.dialogue_lines
+        if positions is None:
+            positions = range(len(lines))
+        return self.legend + "\n" + "\n".join(lines[position] for position in positions)
+
+    def windows(self, windower, indexed: bool = True) -> List[List[int]]:
+        """Token-bounded windows of segment positions, computed once per windower and rendering"""
+        key = (id(windower), windower.max_tokens, windower.overlap_tokens, indexed)
+        with self._lock:
+            if key not in self._windows:
+                lines = self.indexed_lines if indexed else self.dialogue_lines
+                self._windows[key] = windower.split(list(range(len(lines))), lambda position: lines[position])
+            return self._windows[key]
+
+    def segment_position(self, index) -> Optional[int]:
+        """0-based position of the segment a model-returned 1-based index refers to"""
+        try:
+            position = int(index) - 1
+        except (TypeError, ValueError):
+            return None
+        return position if 0 <= position < len(self.segments) else None
+
+    def resolve_timestamp(self, timestamp) -> Optional[int]:
+        """0-based position of the segment a (possibly rounded) timestamp falls in"""
+        try:
+            value = float(timestamp)
+        except (TypeError, ValueError):
+            return None
+        if not self.segments:
+            return None
+        # Times in the prompt are rounded to 0.1 s, so allow for rounding down
+        position = bisect.bisect_right(self.starts, value + 0.05) - 1
+        return max(position, 0)
+
+    def resolve_event(self, event: Dict) -> Dict:
+        """Replace an event's segment index or rounded timestamp with the segment's exact start time"""
+        event = dict(event)
+        position = self.segment_position(event.pop('segment', None))
+        if position is None:
+            position = self.resolve_timestamp(event.get('timestamp'))
+        if position is not None:
+            event['timestamp'] = self.starts[position]
+        return event
+
+    def measure(self, tokenizer) -> Dict:
+        """Token counts of this encoding against the previous pretty-printed JSON rendering"""
+        encode = getattr(tokenizer, 'encode_ordinary', tokenizer.encode)
+        json_text = json.dumps(
+            [segment if isinstance(segment, dict) else segment.dict() for segment in self.segments],
+            ensure_ascii=False, indent=2
+        )
+        json_tokens = len(encode(json_text))
+        compact_tokens = len(encode(self.render()))
+        return {
+            'segments': len(self.segments),
+            'json_tokens': json_tokens,
+            'compact_tokens': compact_tokens,
+            'saved_tokens': json_tokens - compact_tokens,
+            'saved_ratio': round(1 - compact_tokens / json_tokens, 4) if json_tokens else 0.0,
+        }
+
+
+class TranscriptEncoder:
+    """
+    Memoizing factory for EncodedTranscript
+
+    The same call is usually sent to several endpoints (events, summary, details,
+    checklist), so encodings are kept in an LRU keyed by a hash of the segments and
+    reused, along with their token counts and windows.
+    """
+
+    def __init__(self, tokenizer=None, max_entries: int = 256):
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, EncodedTranscript]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats_counters = {'encoded': 0, 'hits': 0, 'json_tokens': 0, 'compact_tokens': 0}
+
+    @staticmethod
+    def fingerprint(segments: List) -> str:
+        key = [
+            (_value(s, 'startTime'), _value(s, 'endTime'), _value(s, 'speaker'), _value(s, 'text'))
+            for s in segments
+        ]
+        return hashlib.sha256(json.dumps(key, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def encode(self, segments: List) -> EncodedTranscript:
+        key = self.fingerprint(segments)
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+                self.stats_counters['hits'] += 1
+                return encoded
+
+        encoded = EncodedTranscript(segments)
+        if self.tokenizer is not None:
+            encoded.token_stats = encoded.measure(self.tokenizer)
+            logger.info(
+                f"Encoded transcript of {len(segments)} segments: {encoded.token_stats['compact_tokens']} tokens "
+                f"instead of {encoded.token_stats['json_tokens']} ({encoded.token_stats['saved_ratio']:.0%} saved)"
+            )
+
+        with self._lock:
+            self._entries[key] = encoded
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats_counters['encoded'] += 1
+            if encoded.token_stats:
+                self.stats_counters['json_tokens'] += encoded.token_stats['json_tokens']
+                self.stats_counters['compact_tokens'] += encoded.token_stats['compact_tokens']
+        return encoded
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.stats_counters)
+            entries = len(self._entries)
+        return {
+            **counters,
+            'saved_tokens': counters['json_tokens'] - counters['compact_tokens'],
+            'entries': entries,
+        }
+
+
+_encoder: Optional[TranscriptEncoder] = None
+_encoder_lock = threading.Lock()
+
+
+def get_transcript_encoder() -> TranscriptEncoder:
+    """Process-wide encoder sharing the transcript windower's tokenizer"""
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            from src.services.transcript_windows import get_transcript_windower
+
+            _encoder = TranscriptEncoder(tokenizer=get_transcript_windower().tokenizer)
+        return _encoder
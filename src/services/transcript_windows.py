@@ -0,0 +1,203 @@
+import asyncio
+import os
+import threading
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class TranscriptWindower:
+    """
+    Split long call transcripts into overlapping windows that fit a token budget.
+
+    Each segment is rendered the way it will appear in the prompt and counted with
+    the tokenizer; segments are packed into windows of at most `max_tokens` and each
+    window starts with the last `overlap_tokens` worth of segments of the previous
+    one, so an event or topic that spans a window boundary is seen whole at least
+    once. A transcript that fits in one window is returned as a single window, so
+    short calls are analyzed exactly as before.
+
+    Windows are analyzed concurrently (map_windows) and their results combined by
+    the reducers below, which keeps latency for long calls close to that of a single
+    window instead of growing with the length of the call.
+    """
+
+    def __init__(self, tokenizer, max_tokens: int = 6000, overlap_tokens: int = 300, max_concurrency: int = 4):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.max_concurrency = max_concurrency
+        self._encode = getattr(tokenizer, 'encode_ordinary', tokenizer.encode)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._encode(text))
+
+    def split(self, segments: List[T], render: Callable[[T], str]) -> List[List[T]]:
+        """Group segments into overlapping windows whose rendered text fits max_tokens"""
+        # One extra token per segment for the line break between them
+        sizes = [self.count_tokens(render(segment)) + 1 for segment in segments]
+        if sum(sizes) <= self.max_tokens:
+            return [list(segments)]
+
+        windows = []
+        start = 0
+        while start < len(segments):
+            end = start
+            tokens = 0
+            # Always take at least one segment, even one larger than the budget
+            while end < len(segments) and (end == start or tokens + sizes[end] <= self.max_tokens):
+                tokens += sizes[end]
+                end += 1
+            windows.append(list(segments[start:end]))
+            if end >= len(segments):
+                break
+
+            # Step back over the tail of this window to form the next window's overlap
+            next_start = end
+            overlap = 0
+            while next_start - 1 > start and overlap + sizes[next_start - 1] <= self.overlap_tokens:
+                next_start -= 1
+                overlap += sizes[next_start]
+            start = next_start
+        return windows
+
+    def group_texts(self, texts: List[str]) -> List[List[str]]:
+        """Pack texts (e.g. partial summaries) into consecutive groups that fit max_tokens"""
+        groups: List[List[str]] = []
+        tokens = 0
+        for text in texts:
+            size = self.count_tokens(text) + 2
+            if groups and tokens + size <= self.max_tokens:
+                groups[-1].append(text)
+                tokens += size
+            else:
+                groups.append([text])
+                tokens = size
+        return groups
+
+    async def reduce_until_fits(self, texts: List[str], combine: Callable[[List[str]], Awaitable[str]]) -> List[str]:
+        """
+        Combine texts level by level until they all fit in one prompt
+
+        Each level combines groups of texts concurrently, so the number of sequential
+        LLM calls grows with the logarithm of the transcript length.
+        """
+        groups = self.group_texts(texts)
+        while len(groups) > 1:
+            combined = await map_windows(groups, combine, self.max_concurrency)
+            groups = self.group_texts(combined)
+        return groups[0] if groups else []
+
+
+async def map_windows(windows: List[T], analyze: Callable[[T], Awaitable[R]], max_concurrency: int = 4) -> List[R]:
+    """Run `analyze` on every window with at most max_concurrency in flight; results keep window order"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(window):
+        async with semaphore:
+            return await analyze(window)
+
+    return await asyncio.gather(*(run(window) for window in windows))
+
+
+def _timestamp(event: Dict) -> Optional[float]:
+    try:
+        return float(event.get('timestamp'))
+    except (TypeError, ValueError):
+        return None
+
+
+def merge_events(window_events: List[List[Dict]], tolerance: float = 5.0) -> List[Dict]:
+    """
+    Merge the events found in each window, ordered by timestamp
+
+    Windows overlap, so the same event can be reported twice; an event is dropped when
+    an event by the same actor from another window is within `tolerance` seconds of it.
+    Events from the same window are always kept.
+    """
+    accepted = []
+    for window_index, events in enumerate(window_events):
+        for event in events or []:
+            if not isinstance(event, dict):
+                continue
+            timestamp = _timestamp(event)
+            actor = str(event.get('actor', '')).lower()
+            duplicate = timestamp is not None and any(
+                other_window != window_index
+                and other_actor == actor
+                and other_timestamp is not None
+                and abs(other_timestamp - timestamp) <= tolerance
+                for other_window, other_actor, other_timestamp, _ in accepted
+            )
+            if not duplicate:
+                accepted.append((window_index, actor, timestamp, event))
+
+    accepted.sort(key=lambda item: (item[2] is None, item[2] or 0.0))
+    return [event for _, _, _, event in accepted]
+
+
+def aggregate_details(results: List[Dict], weights: Optional[List[float]] = None, max_topics: int = 3) -> Dict:
+    """
+    Combine per-window call details into one result
+
+    sentiment_score is the weighted mean of the window scores (weights are normally the
+    windows' lengths), topics are the most frequent ones across windows, flags are
+    the union in order of first appearance and call_type is the weighted majority.
+    """
+    weights = weights or [1.0] * len(results)
+    score_total = 0.0
+    score_weight = 0.0
+    topics = Counter()
+    topic_order = {}
+    flags = []
+    call_types = Counter()
+
+    for result, weight in zip(results, weights):
+        try:
+            score_total += float(result.get('sentiment_score')) * weight
+            score_weight += weight
+        except (TypeError, ValueError):
+            pass
+        for topic in result.get('topics') or []:
+            topics[topic] += weight
+            topic_order.setdefault(topic, len(topic_order))
+        for flag in result.get('flags') or []:
+            if flag not in flags:
+                flags.append(flag)
+        if result.get('call_type'):
+            call_types[result['call_type']] += weight
+
+    return {
+        "sentiment_score": round(score_total / score_weight, 2) if score_weight else 3.0,
+        "topics": sorted(topics, key=lambda topic: (-topics[topic], topic_order[topic]))[:max_topics],
+        "flags": flags,
+        "call_type": call_types.most_common(1)[0][0] if call_types else "other",
+    }
+
+
+_windower: Optional[TranscriptWindower] = None
+_windower_lock = threading.Lock()
+
+
+def get_transcript_windower() -> TranscriptWindower:
+    """
+    Process-wide windower; TRANSCRIPT_WINDOW_TOKENS sets the window size (default 6000),
+    TRANSCRIPT_WINDOW_OVERLAP the overlap (default 300) and TRANSCRIPT_WINDOW_CONCURRENCY
+    how many windows are analyzed at once (default 4)
+    """
+    global _windower
+    with _windower_lock:
+        if _windower is None:
+            import tiktoken
+
+            _windower = TranscriptWindower(
+                tiktoken.get_encoding("cl100k_base"),
+                max_tokens=int(os.getenv('TRANSCRIPT_WINDOW_TOKENS', 6000)),
+                overlap_tokens=int(os.getenv('TRANSCRIPT_WINDOW_OVERLAP', 300)),
+                max_concurrency=int(os.getenv('TRANSCRIPT_WINDOW_CONCURRENCY', 4)),
+            )
+        return _windower
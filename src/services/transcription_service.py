@@ -2,12 +2,14 @@ from elevenlabs import ElevenLabs
 from typing import List, Dict, Any
 import os
 from tempfile import NamedTemporaryFile
+from src.utils.provider_limiter import get_provider_limiter
 
 class ElevenLabsTranscriptionService:
     def __init__(self, api_key=None):
         """Initialize the ElevenLabs transcription service."""
         self.api_key = api_key or os.getenv('ELEVENLABS_API_KEY')
         self.client = ElevenLabs(api_key=self.api_key)
+        self.limiter = get_provider_limiter('elevenlabs')
     
     def transcribe(self, file_path: str, language_code: str = 'en', num_speakers: int = 2) -> List[Dict[str, Any]]:
         """
@@ -30,15 +32,19 @@ class ElevenLabsTranscriptionService:
                 ...
             ]
         """
-        try:
+        def convert():
+            # Reopen the file on every attempt so retries upload the whole recording
             with open(file_path, 'rb') as audio_file:
-                response = self.client.speech_to_text.convert(
+                return self.client.speech_to_text.convert(
                     model_id='scribe_v1',
                     file=audio_file,
                     language_code=language_code,
                     num_speakers=num_speakers,
                     diarize=True,
                 )
+
+        try:
+            response = self.limiter.call(convert)
             
             # Process the response to create segments
             segments = self._process_response(response)
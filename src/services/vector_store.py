@@ -1,21 +1,177 @@
 from supabase import create_client
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 from src.models.document_models import DocumentChunk, DocumentMetadata
-from openai import OpenAI
-import numpy as np
+from src.services.embedding_service import EmbeddingService
+from src.services.chunk_writer import BulkChunkWriter, BulkWriteError
+from src.services.text_chunker import content_hash
+from src.services.local_vector_index import LocalVectorIndex, get_local_vector_index
+from src.services.answer_cache import get_answer_cache
+from src.services.lexical_index import LexicalIndex, get_lexical_index, reciprocal_rank_fusion
+from src.utils.provider_limiter import get_provider_limiter
+import asyncio
+import functools
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
 
 class VectorStore:
-    def __init__(self):
-        self.supabase = create_client(
+    def __init__(
+        self,
+        embedding_service: EmbeddingService = None,
+        local_index: LocalVectorIndex = None,
+        lexical_index: LexicalIndex = None,
+        supabase=None
+    ):
+        self.supabase = supabase or create_client(
             os.getenv('SUPABASE_URL'),
             os.getenv('SUPABASE_KEY')
         )
-        # Use direct OpenAI API for embeddings
-        self.openai_client = OpenAI(
-            api_key=os.getenv('OPENAI_API_KEY'),
-            # Don't set base_url to use the default OpenAI API endpoint
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.local_index = local_index or get_local_vector_index()
+        self.lexical_index = lexical_index or get_lexical_index()
+        self.chunk_writer = BulkChunkWriter(
+            self.supabase,
+            max_batch_bytes=int(os.getenv('CHUNK_WRITE_BATCH_BYTES', 4 * 1024 * 1024)),
+            max_concurrent_batches=int(os.getenv('CHUNK_WRITE_CONCURRENCY', 4))
+        )
+
+    async def _update_local_indexes(self, method: str, *args):
+        """Apply a change to the local vector and lexical indexes, whichever are enabled"""
+        for index in (self.local_index, self.lexical_index):
+            if index:
+                await asyncio.to_thread(getattr(index, method), *args)
+        # Cached answers may be based on the content that just changed
+        answer_cache = get_answer_cache()
+        if answer_cache:
+            await asyncio.to_thread(answer_cache.bump_version)
+
+    def _document_row(self, metadata: DocumentMetadata) -> Dict:
+        return {
+            'title': metadata.title,
+            'file_type': metadata.file_type,
+            'total_pages': metadata.total_pages or 0,
+            'file_size': metadata.file_size,
+            'source_url': metadata.source_url,
+            'category': metadata.category,
+            'summary': metadata.summary,
+            'tags': metadata.tags,
+            'helpful_rating': metadata.helpful_rating or 0,
+            'use_count': metadata.use_count or 0,
+            # UTC timestamp string
+            'updated_at': metadata.get_utc_timestamp(),
+            'ai_suggestion': metadata.ai_suggestion
+        }
+
+    async def create_document(self, metadata: DocumentMetadata) -> str:
+        """Insert the document row and return its id"""
+        doc_response = await asyncio.to_thread(
+            self.supabase.table('documents').insert(self._document_row(metadata)).execute
+        )
+        return doc_response.data[0]['id']
+
+    async def store_chunks(
+        self,
+        document_id: str,
+        title: str,
+        chunks: List[DocumentChunk],
+        embeddings: List[List[float]]
+    ) -> List[Dict]:
+        """
+        Insert chunks with their embeddings for an existing document
+
+        If the write fails, rows that were written are removed again so the document
+        is left as it was.
+
+        Returns:
+            The stored chunk rows
+        """
+        chunks_data = [
+            {
+                # Generated here so writes can be retried idempotently and the local index
+                # can mirror rows without reading them back
+                'id': str(uuid.uuid4()),
+                'document_id': document_id,
+                'content': chunk.content,
+                'embedding': embedding,
+                'page_number': chunk.page_number or 1,
+                'chunk_number': chunk.chunk_number,
+                'content_hash': content_hash(chunk.content)
+            }
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
+
+        try:
+            await self.chunk_writer.write(chunks_data)
+        except BulkWriteError as e:
+            await self.delete_chunks(e.written_ids)
+            raise
+
+        await self._update_local_indexes('add_chunks', document_id, title, chunks_data)
+        return chunks_data
+
+    async def get_document(self, document_id: str) -> Optional[Dict]:
+        result = await asyncio.to_thread(
+            self.supabase.table('documents').select('*').eq('id', document_id).limit(1).execute
         )
+        return result.data[0] if result.data else None
+
+    async def update_document(self, document_id: str, fields: Dict):
+        await asyncio.to_thread(self.supabase.table('documents').update(fields).eq('id', document_id).execute)
+
+    async def get_chunk_fingerprints(self, document_id: str, page_size: int = 1000) -> List[Dict]:
+        """Stored chunks of a document without their embeddings"""
+        rows = []
+        while True:
+            result = await asyncio.to_thread(
+                self.supabase.table('document_chunks')
+                .select('id, content, content_hash, page_number, chunk_number')
+                .eq('document_id', document_id)
+                .order('id')
+                .range(len(rows), len(rows) + page_size - 1)
+                .execute
+            )
+            rows.extend(result.data)
+            if len(result.data) < page_size:
+                return rows
+
+    async def update_chunk_positions(self, document_id: str, rows: List[Dict]):
+        """
+        Update page number, chunk number and content hash of chunks whose content is unchanged
+
+        Each row (id, page_number, chunk_number, content_hash) is applied with an UPDATE
+        rather than an upsert, so a chunk deleted in the meantime is not re-created
+        without its embedding; such rows are skipped. Requests run concurrently under
+        the 'supabase' provider limiter.
+        """
+        limiter = get_provider_limiter('supabase')
+
+        def update(row: Dict):
+            fields = {key: row[key] for key in ('page_number', 'chunk_number', 'content_hash')}
+            return self.supabase.table('document_chunks').update(fields) \
+                .eq('id', row['id']).eq('document_id', document_id).execute()
+
+        results = await asyncio.gather(*(limiter.acall(functools.partial(update, row)) for row in rows))
+        updated = [row for row, result in zip(rows, results) if result.data]
+        if len(updated) < len(rows):
+            logger.warning(f"{len(rows) - len(updated)} chunk(s) of document {document_id} were deleted during the update")
+        await self._update_local_indexes('update_chunk_positions', updated)
+
+    async def delete_chunks(self, chunk_ids: List[str]):
+        for start in range(0, len(chunk_ids), 200):
+            await asyncio.to_thread(
+                self.supabase.table('document_chunks').delete().in_('id', chunk_ids[start:start + 200]).execute
+            )
+        await self._update_local_indexes('remove_chunks', chunk_ids)
+
+    async def delete_document(self, document_id: str):
+        """Remove a document and its chunks, e.g. after a failed ingestion"""
+        await asyncio.to_thread(
+            self.supabase.table('document_chunks').delete().eq('document_id', document_id).execute
+        )
+        await asyncio.to_thread(self.supabase.table('documents').delete().eq('id', document_id).execute)
+        await self._update_local_indexes('remove_document', document_id)
 
     async def store_document(
         self,
@@ -24,46 +180,16 @@ class VectorStore:
         metadata: DocumentMetadata
     ):
         try:
-            # Get UTC timestamp string
-            updated_at = metadata.get_utc_timestamp()
-            
-            # Store document metadata
-            doc_data = {
-                'title': metadata.title,
-                'file_type': metadata.file_type,
-                'total_pages': metadata.total_pages or 0,
-                'file_size': metadata.file_size,
-                'source_url': metadata.source_url,
-                'category': metadata.category,
-                'summary': metadata.summary,
-                'tags': metadata.tags,
-                'helpful_rating': metadata.helpful_rating or 0,
-                'use_count': metadata.use_count or 0,
-                'updated_at': updated_at,
-                'ai_suggestion': metadata.ai_suggestion
-            }
-            
-            doc_response = self.supabase.table('documents').insert(doc_data).execute()
-            document_id = doc_response.data[0]['id']
-
-            # Store chunks with embeddings
-            chunks_data = []
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                embedding_array = np.array(embedding, dtype=np.float32)
-                chunks_data.append({
-                    'document_id': document_id,
-                    'content': chunk.content,
-                    'embedding': embedding_array.tolist(),
-                    'page_number': chunk.page_number or 1,
-                    'chunk_number': i + 1
-                })
-            
-            # Insert chunks in batches
-            batch_size = 5
-            for i in range(0, len(chunks_data), batch_size):
-                batch = chunks_data[i:i + batch_size]
-                self.supabase.table('document_chunks').insert(batch).execute()
-            
+            document_id = await self.create_document(metadata)
+            numbered = [
+                chunk.model_copy(update={'chunk_number': i + 1}) for i, chunk in enumerate(chunks)
+            ]
+            try:
+                await self.store_chunks(document_id, metadata.title, numbered, embeddings)
+            except Exception:
+                # Don't leave a document without its chunks behind
+                await self.delete_document(document_id)
+                raise
             return document_id
             
         except Exception as e:
@@ -76,11 +202,15 @@ class VectorStore:
         match_count: int = 3
     ) -> List[Dict]:
         try:
-            response = self.openai_client.embeddings.create(
-                input=query,
-                model="text-embedding-3-small"
-            )
-            query_embedding = response.data[0].embedding
+            query_embedding = await self.embedding_service.embed_text(query)
+
+            if self.local_index and self.local_index.ready:
+                try:
+                    return await asyncio.to_thread(
+                        self.local_index.search, query_embedding, match_count, match_threshold
+                    )
+                except Exception as e:
+                    logger.warning(f"Local vector search failed, falling back to remote search: {str(e)}")
 
             result = self.supabase.rpc(
                 'match_document_chunks',
@@ -108,4 +238,32 @@ class VectorStore:
             return []
             
         except Exception as e:
-            raise
\ No newline at end of file
+            raise
+
+    async def hybrid_search(
+        self,
+        query: str,
+        match_count: int = 3,
+        match_threshold: float = 0.1,
+        candidates: int = 20
+    ) -> List[Dict]:
+        """
+        Combine vector and BM25 results with reciprocal-rank fusion
+
+        Each retriever contributes up to `candidates` results; exact terms such as
+        product codes are found by the lexical side even when their embedding
+        similarity is low. Falls back to vector search alone when the lexical index
+        is unavailable.
+        """
+        if not (self.lexical_index and self.lexical_index.ready):
+            return await self.search_similar_chunks(query, match_threshold, match_count)
+
+        vector_results, lexical_results = await asyncio.gather(
+            self.search_similar_chunks(query, match_threshold, max(candidates, match_count)),
+            asyncio.to_thread(self.lexical_index.search, query, max(candidates, match_count))
+        )
+        fused = reciprocal_rank_fusion([vector_results, lexical_results], limit=match_count)
+        for chunk in fused:
+            # Chunks found only lexically have no similarity score
+            chunk.setdefault('similarity', 0.0)
+        return fused
@@ -1,7 +1,11 @@
 from services.call_recording_uploader import CallRecordingUploader
 from services.document_uploader import DocumentUploader
 from services.agent_manager import AgentManager
+from services.folder_watcher import FolderWatcher
 import argparse
+import asyncio
+import shutil
+import signal
 from pathlib import Path
 from pydub import AudioSegment
 import pydub.silence
@@ -317,10 +321,63 @@ class FileProcessor:
         
         return results
 
+def watch_directories(processor: FileProcessor, paths: List[Path], args: argparse.Namespace):
+    """
+    Run as a daemon, uploading recordings as soon as they land in the watched directories
+
+    Args:
+        processor: FileProcessor used for every new file
+        paths: Directories to watch
+        args: Command line arguments
+    """
+    archive_dir = Path(args.archive_dir) if args.archive_dir else None
+    if archive_dir:
+        archive_dir.mkdir(parents=True, exist_ok=True)
+
+    def handle_file(file_path: Path) -> Optional[ProcessResult]:
+        result = processor.process_file(file_path, args)
+        if result and result.success and archive_dir:
+            try:
+                shutil.move(str(file_path), str(archive_dir / file_path.name))
+            except Exception as e:
+                logger.warning(f"Could not archive {file_path}: {e}")
+        return result
+
+    def is_candidate(file_path: Path) -> bool:
+        if file_path.name in IGNORED_FILES or file_path.name.startswith('.'):
+            return False
+        if archive_dir and archive_dir in file_path.parents:
+            return False
+        return get_file_type(file_path) != FileType.UNSUPPORTED
+
+    watcher = FolderWatcher(
+        paths,
+        handle_file,
+        recursive=args.recursive,
+        settle_seconds=args.settle_seconds,
+        poll_interval=args.poll_interval,
+        max_concurrency=args.max_concurrency,
+        use_inotify=not args.force_polling,
+        process_existing=not args.skip_existing,
+        file_filter=is_candidate,
+    )
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, watcher.stop)
+        logger.info(f"Watching {', '.join(str(p) for p in paths)} (Ctrl+C to stop)")
+        await watcher.run()
+
+    asyncio.run(run())
+    logger.info(f"\nWatch Summary:")
+    logger.info(f"✓ Successful: {watcher.processed_count}")
+    logger.info(f"✗ Failed: {watcher.failed_count}")
+
 def main():
     """Main entry point for the script"""
     parser = argparse.ArgumentParser(description='Upload audio files to Supabase')
-    parser.add_argument('path', help='Path to file or directory to upload')
+    parser.add_argument('path', nargs='+', help='Path(s) to file or directory to upload')
     parser.add_argument('--org-id', help='ID of the organization', required=True)
     parser.add_argument('--agent-id', help='ID of the agent (optional)')
     parser.add_argument('--skip-silence-removal', action='store_true', 
@@ -335,6 +392,20 @@ def main():
                       help='Verbose output')
     parser.add_argument('--min-duration', type=float, default=0,
                       help='Minimum audio duration in seconds (default: 0, no minimum)')
+    parser.add_argument('--watch', action='store_true',
+                      help='Keep running and upload new files as they appear in the given directories')
+    parser.add_argument('--settle-seconds', type=float, default=5.0,
+                      help='Watch mode: seconds a file must stay unchanged before it is uploaded')
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                      help='Watch mode: seconds between debounce checks and polling scans')
+    parser.add_argument('--max-concurrency', type=int, default=4,
+                      help='Watch mode: maximum number of files processed at the same time')
+    parser.add_argument('--force-polling', action='store_true',
+                      help='Watch mode: use directory polling instead of inotify')
+    parser.add_argument('--skip-existing', action='store_true',
+                      help='Watch mode: ignore files already present when the watcher starts')
+    parser.add_argument('--archive-dir',
+                      help='Watch mode: move successfully uploaded files into this directory')
     args = parser.parse_args()
     
     # Set logging level based on verbose flag
@@ -344,24 +415,33 @@ def main():
     # Initialize file processor
     processor = FileProcessor(args.org_id, args.agent_id, args.verbose)
     
-    path = Path(args.path)
-    
-    if path.is_file():
-        result = processor.process_file(path, args)
-        if result:
-            status = "✓" if result.success else "✗"
-            logger.info(f"{status} {path.name}")
-    elif path.is_dir():
-        results = processor.process_directory(path, args, recursive=args.recursive)
-        
-        # Print summary
-        successful = sum(1 for r in results if r.success)
-        failed = len(results) - successful
-        logger.info(f"\nUpload Summary:")
-        logger.info(f"✓ Successful: {successful}")
-        logger.info(f"✗ Failed: {failed}")
-    else:
-        logger.error(f"Error: Path does not exist: {path}")
+    paths = [Path(p) for p in args.path]
+
+    if args.watch:
+        not_dirs = [p for p in paths if not p.is_dir()]
+        if not_dirs:
+            logger.error(f"Error: --watch requires directories: {', '.join(str(p) for p in not_dirs)}")
+            return
+        watch_directories(processor, paths, args)
+        return
+
+    for path in paths:
+        if path.is_file():
+            result = processor.process_file(path, args)
+            if result:
+                status = "✓" if result.success else "✗"
+                logger.info(f"{status} {path.name}")
+        elif path.is_dir():
+            results = processor.process_directory(path, args, recursive=args.recursive)
+            
+            # Print summary
+            successful = sum(1 for r in results if r.success)
+            failed = len(results) - successful
+            logger.info(f"\nUpload Summary:")
+            logger.info(f"✓ Successful: {successful}")
+            logger.info(f"✗ Failed: {failed}")
+        else:
+            logger.error(f"Error: Path does not exist: {path}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,97 @@
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from src.utils.stats import percentile
+
+MULTI_CALL_ENDPOINTS = ['/api/analyze-events', '/api/summarize-conversation', '/api/analyze-call-details']
+
+
+def load_segments(path: Path) -> List[Dict]:
+    """Read a transcript: a JSON list of segments or an object with a `segments` list"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return data['segments'] if isinstance(data, dict) else data
+
+
+def total_usage(api_url: str) -> Dict[str, int]:
+    """Token usage summed over models, from the server's /api/metrics"""
+    usage = requests.get(f"{api_url}/api/metrics").json().get('llm_usage', {})
+    totals = {'requests': 0, 'prompt_tokens': 0, 'cached_prompt_tokens': 0, 'completion_tokens': 0}
+    for model_usage in usage.values():
+        for key in totals:
+            totals[key] += model_usage.get(key, 0)
+    return totals
+
+
+def run_multi_call(api_url: str, segments: List[Dict], checklist: Optional[List[str]]):
+    """The current path: one request per analysis, in sequence like CallProcessor"""
+    body = {'segments': segments, 'settings': {}}
+    for endpoint in MULTI_CALL_ENDPOINTS:
+        requests.post(f"{api_url}{endpoint}", json=body).raise_for_status()
+    if checklist:
+        requests.post(
+            f"{api_url}/api/analyze-checklist", json={**body, 'checklist': checklist}
+        ).raise_for_status()
+
+
+def run_combined(api_url: str, segments: List[Dict], checklist: Optional[List[str]]):
+    requests.post(
+        f"{api_url}/api/analyze-call", json={'segments': segments, 'settings': {}, 'checklist': checklist}
+    ).raise_for_status()
+
+
+def measure(api_url: str, run, segments: List[Dict], checklist: Optional[List[str]]) -> Dict:
+    before = total_usage(api_url)
+    started = time.perf_counter()
+    run(api_url, segments, checklist)
+    seconds = time.perf_counter() - started
+    after = total_usage(api_url)
+    return {'seconds': seconds, **{key: after[key] - before[key] for key in before}}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare latency and tokens of /api/analyze-call against the per-analysis endpoints'
+    )
+    parser.add_argument('transcripts', nargs='+', type=Path, help='JSON transcript files')
+    parser.add_argument('--api-url', default='http://localhost:8000', help='Running server to benchmark')
+    parser.add_argument('--checklist', nargs='*', help='Checklist items to match as well')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per transcript and path')
+    args = parser.parse_args()
+
+    # Token counts come from the server-wide totals, so run against a server with no other traffic
+    results = {'multi-call': [], 'combined': []}
+    for path in args.transcripts:
+        segments = load_segments(path)
+        for _ in range(args.runs):
+            # Alternate the paths so provider-side warmup and caching affect both alike
+            results['multi-call'].append(measure(args.api_url, run_multi_call, segments, args.checklist))
+            results['combined'].append(measure(args.api_url, run_combined, segments, args.checklist))
+
+    print(f"{len(args.transcripts)} transcripts x {args.runs} runs")
+    for name, runs in results.items():
+        latencies = [run['seconds'] for run in runs]
+        print(
+            f"  {name:<10} latency p50={percentile(latencies, 50):.2f}s p95={percentile(latencies, 95):.2f}s  "
+            f"requests={statistics.mean(r['requests'] for r in runs):.1f}  "
+            f"prompt_tokens={statistics.mean(r['prompt_tokens'] for r in runs):,.0f} "
+            f"(cached {statistics.mean(r['cached_prompt_tokens'] for r in runs):,.0f})  "
+            f"completion_tokens={statistics.mean(r['completion_tokens'] for r in runs):,.0f}"
+        )
+
+    multi = statistics.mean(r['prompt_tokens'] + r['completion_tokens'] for r in results['multi-call'])
+    combined = statistics.mean(r['prompt_tokens'] + r['completion_tokens'] for r in results['combined'])
+    if multi:
+        print(f"Combined path uses {combined / multi:.0%} of the multi-call tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+import tiktoken
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from src.services.text_chunker import TextChunker
+
+
+def iter_pages(path: Path) -> Iterator[Tuple[str, Optional[int]]]:
+    if path.suffix.lower() == '.pdf':
+        with fitz.open(path) as doc:
+            for page_num in range(len(doc)):
+                yield doc[page_num].get_text(), page_num + 1
+    else:
+        yield path.read_text(encoding='utf-8'), None
+
+
+def legacy_chunks(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
+    """The previous character-budget chunker, which carried up to 200 words of overlap"""
+    chunks = []
+    current_chunk = []
+    current_size = 0
+    for word in text.split():
+        current_chunk.append(word)
+        current_size += len(word) + 1
+        if current_size >= chunk_size:
+            chunks.append(" ".join(current_chunk))
+            current_chunk = current_chunk[-chunk_overlap:]
+            current_size = sum(len(word) + 1 for word in current_chunk)
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
+    return chunks
+
+
+def benchmark(paths: List[Path], chunk_size: int, chunk_overlap: int):
+    tokenizer = tiktoken.get_encoding("cl100k_base")
+    chunker = TextChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap, tokenizer=tokenizer)
+
+    for path in paths:
+        pages = list(iter_pages(path))
+        characters = sum(len(text) for text, _ in pages)
+        source_tokens = sum(len(tokenizer.encode_ordinary(text)) for text, _ in pages)
+
+        started = time.perf_counter()
+        old = [chunk for text, _ in pages for chunk in legacy_chunks(text)]
+        old_seconds = time.perf_counter() - started
+        old_tokens = sum(len(tokenizer.encode_ordinary(chunk)) for chunk in old)
+
+        started = time.perf_counter()
+        new = list(chunker.iter_chunks(pages))
+        new_seconds = time.perf_counter() - started
+        new_tokens = sum(chunk['token_count'] for chunk in new)
+
+        print(f"\n{path.name}: {len(pages)} pages, {characters:,} characters, {source_tokens:,} tokens")
+        for name, count, tokens, seconds in (
+            ('legacy', len(old), old_tokens, old_seconds),
+            ('token', len(new), new_tokens, new_seconds),
+        ):
+            print(
+                f"  {name:<7} chunks={count:<6} embedded_tokens={tokens:<9,} "
+                f"overhead={tokens / max(source_tokens, 1):.2f}x "
+                f"throughput={characters / max(seconds, 1e-9) / 1e6:.2f} MB/s "
+                f"({len(pages) / max(seconds, 1e-9):.0f} pages/s)"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare chunk counts and chunking throughput on documents')
+    parser.add_argument('paths', nargs='+', type=Path, help='PDF or text files to chunk')
+    parser.add_argument('--chunk-size', type=int, default=500, help='Chunk size in tokens')
+    parser.add_argument('--chunk-overlap', type=int, default=50, help='Overlap between chunks in tokens')
+    args = parser.parse_args()
+    benchmark(args.paths, args.chunk_size, args.chunk_overlap)
+
+
+if __name__ == "__main__":
+    main()
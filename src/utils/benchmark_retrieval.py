@@ -0,0 +1,73 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from src.services.vector_store import VectorStore
+from src.utils.stats import percentile
+
+
+def load_queries(path: Path) -> List[Dict]:
+    """Read evaluation queries: one JSON object per line with `question` and `relevant` chunk ids"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def benchmark(queries: List[Dict], ks: List[int]):
+    vector_store = VectorStore()
+    for index in (vector_store.local_index, vector_store.lexical_index):
+        if index and not index.ready:
+            await asyncio.to_thread(index.load_or_build, vector_store.supabase)
+
+    max_k = max(ks)
+    retrievers = {
+        'vector': lambda q: vector_store.search_similar_chunks(q, match_threshold=0.0, match_count=max_k),
+        'lexical': lambda q: asyncio.to_thread(vector_store.lexical_index.search, q, max_k),
+        'hybrid': lambda q: vector_store.hybrid_search(q, match_count=max_k, match_threshold=0.0),
+    }
+    # Warm the embedding cache so vector and hybrid latencies measure retrieval, not the embeddings API
+    for query in queries:
+        await vector_store.embedding_service.embed_text(query['question'])
+
+    print(f"{len(queries)} queries")
+    for name, retrieve in retrievers.items():
+        recalls = {k: [] for k in ks}
+        latencies = []
+        for query in queries:
+            relevant = set(query['relevant'])
+            started = time.perf_counter()
+            results = await retrieve(query['question'])
+            latencies.append((time.perf_counter() - started) * 1000)
+            ids = [result['id'] for result in results]
+            for k in ks:
+                recalls[k].append(len(relevant & set(ids[:k])) / len(relevant) if relevant else 0.0)
+
+        recall_text = ' '.join(f"recall@{k}={sum(values) / len(values):.3f}" for k, values in recalls.items())
+        print(
+            f"  {name:<8} {recall_text} "
+            f"latency p50={percentile(latencies, 50):.1f}ms p95={percentile(latencies, 95):.1f}ms"
+        )
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Measure recall@k and latency of vector, lexical and hybrid retrieval')
+    parser.add_argument('queries', type=Path, help='JSONL file of {"question": ..., "relevant": [chunk ids]}')
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 3, 5, 10], help='Cutoffs to report recall at')
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    if not queries:
+        print("No queries found")
+        return
+    asyncio.run(benchmark(queries, args.k))
+
+
+if __name__ == "__main__":
+    main()
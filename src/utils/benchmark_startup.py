@@ -0,0 +1,106 @@
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).parent.parent.parent
+
+# Lines look like "import time:       412 |       1874 |   src.services.vector_store";
+# nesting is shown by two extra spaces of indentation before the module name
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$')
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """Parse `python -X importtime` output into entries with module, depth, self_us and cumulative_us"""
+    entries = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({
+                'module': module,
+                'depth': (len(indent) - 1) // 2,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+            })
+    return entries
+
+
+def direct_imports(entries: List[Dict], module: str) -> Dict:
+    """
+    Cumulative import time of `module` and of each module it imports directly
+
+    Interpreter startup imports (site, encodings) are left out. Entries are listed
+    children first, so the direct imports are the depth-1 entries just before the
+    module's own top-level entry.
+    """
+    for index, entry in enumerate(entries):
+        if entry['depth'] == 0 and entry['module'] == module:
+            children = {}
+            for child in reversed(entries[:index]):
+                if child['depth'] == 0:
+                    break
+                if child['depth'] == 1:
+                    children[child['module']] = child['cumulative_us']
+            return {'total_us': entry['cumulative_us'], 'children': children}
+    raise ValueError(f"{module} not found in import-time output")
+
+
+def measure(module: str) -> Dict:
+    """Import a module in a fresh interpreter and return its total and per-import times"""
+    env = dict(os.environ)
+    # main refuses to load without the key; the benchmark never calls the API
+    env.setdefault('NEURALSPACE_API_KEY', 'benchmark')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return direct_imports(parse_importtime(result.stderr), module)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import time of the app and fail if it exceeds a budget')
+    parser.add_argument('--module', default='main', help='Module to import')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to measure; the median is reported')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest direct imports to list')
+    parser.add_argument(
+        '--budget', type=float, default=float(os.getenv('STARTUP_IMPORT_BUDGET', 2.0)),
+        help='Maximum median import time in seconds (default STARTUP_IMPORT_BUDGET or 2.0)'
+    )
+    args = parser.parse_args()
+
+    # The first run may compile bytecode, so it isn't counted
+    measure(args.module)
+    runs = [measure(args.module) for _ in range(args.runs)]
+
+    totals = [run['total_us'] / 1e6 for run in runs]
+    total = statistics.median(totals)
+
+    cumulative: Dict[str, List[int]] = {}
+    for run in runs:
+        for child, cumulative_us in run['children'].items():
+            cumulative.setdefault(child, []).append(cumulative_us)
+    slowest = sorted(
+        ((module, statistics.median(values) / 1000) for module, values in cumulative.items()),
+        key=lambda item: item[1], reverse=True
+    )[:args.top]
+
+    print(f"import {args.module}: median {total:.3f}s over {args.runs} runs (min {min(totals):.3f}s, max {max(totals):.3f}s)")
+    print(f"Slowest imports made by {args.module}:")
+    for module, ms in slowest:
+        print(f"  {ms:9.1f} ms  {module}")
+
+    if total > args.budget:
+        print(f"FAIL: import time {total:.3f}s exceeds the {args.budget:.3f}s budget")
+        sys.exit(1)
+    print(f"OK: within the {args.budget:.3f}s budget")
+
+
+if __name__ == "__main__":
+    main()
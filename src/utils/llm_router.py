@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from openai import AsyncOpenAI, OpenAI
+
+from src.utils.openai_client import create_chat_completion, get_provider_name, resolve_async_model
+from src.utils.stats import percentile
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a provider whose recent error rate is too high
+
+    The outcomes of the last `window` requests are kept. Once at least `min_requests`
+    are recorded and the share of errors reaches `error_rate`, the breaker opens and
+    the provider is skipped for `cooldown` seconds. Then a single trial request is let
+    through (half-open): its success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, error_rate: float = 0.5, min_requests: int = 5, window: int = 20, cooldown: float = 30.0):
+        self.error_rate = error_rate
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.opened = 0
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Whether a request may be sent now; in the half-open state a True answer
+        reserves the single trial request, so send it (or abandon() it) right away
+        """
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = 'half_open'
+            if self.state == 'half_open':
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+                return True
+            return self.state == 'closed'
+
+    def abandon(self):
+        """A request was cancelled before it finished, so it says nothing about the provider"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record(self, success: bool):
+        with self._lock:
+            if self.state == 'half_open':
+                self._trial_in_flight = False
+                if success:
+                    self.state = 'closed'
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            if self.state == 'open':
+                return
+            self._outcomes.append(success)
+            errors = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_requests and errors / len(self._outcomes) >= self.error_rate:
+                self._open()
+
+    def _open(self):
+        self.state = 'open'
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            outcomes = list(self._outcomes)
+            return {
+                'state': self.state,
+                'opened': self.opened,
+                'error_rate': round(outcomes.count(False) / len(outcomes), 4) if outcomes else 0.0,
+            }
+
+
+class LLMRouter:
+    """
+    Chat completions across two providers/models with failover and hedging
+
+    A request goes to the first route whose provider's circuit breaker allows it. If
+    that fails, it is retried once on the second route (failover). If it is still
+    running after the primary's `hedge_percentile` latency for the stage, a duplicate
+    goes to the second route and whichever succeeds first is returned; the other is
+    cancelled. Until a route has `min_samples` latencies for the stage, `default_delay`
+    seconds is used as the hedge delay. The second route's breaker is only consulted
+    when a failover or hedge actually needs it.
+
+    `resolve` maps a route to a client and model name. By default routes get
+    AsyncOpenAI clients, so cancelling the loser aborts its HTTP request and frees
+    its provider limiter slot.
+    """
+
+    def __init__(
+        self,
+        min_samples: int = 20,
+        default_delay: float = 8.0,
+        resolve: Callable[[str], Tuple[Union[OpenAI, AsyncOpenAI], str]] = resolve_async_model,
+        **breaker_settings
+    ):
+        self.min_samples = min_samples
+        self.resolve = resolve
+        self.default_delay = default_delay
+        self.breaker_settings = breaker_settings
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = {}
+        self._lock = threading.Lock()
+        self.stats_counters = {'requests': 0, 'failovers': 0, 'hedged': 0, 'hedge_wins': 0, 'breaker_skips': 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats_counters[key] += 1
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = CircuitBreaker(**self.breaker_settings)
+            return self._breakers[provider]
+
+    def hedge_delay(self, stage: str, route: str, hedge_percentile: float) -> float:
+        with self._lock:
+            samples = list(self._latencies.get((stage, route), ()))
+        if len(samples) < self.min_samples:
+            return self.default_delay
+        return percentile(samples, hedge_percentile)
+
+    def _route_breaker(self, route: str) -> CircuitBreaker:
+        return self.breaker(get_provider_name(self.resolve(route)[0]))
+
+    def _admit(self, route: str) -> bool:
+        """Ask the route's breaker for permission to send, counting refusals"""
+        if self._route_breaker(route).allow():
+            return True
+        self._count('breaker_skips')
+        return False
+
+    async def _attempt(self, stage: str, route: str, kwargs: Dict):
+        """Send one request on a route already admitted by its breaker"""
+        client, model = self.resolve(route)
+        breaker = self.breaker(get_provider_name(client))
+        started = time.monotonic()
+        try:
+            response = await create_chat_completion(client, **{**kwargs, 'model': model})
+        except asyncio.CancelledError:
+            breaker.abandon()
+            raise
+        except Exception:
+            breaker.record(False)
+            raise
+        breaker.record(True)
+        with self._lock:
+            self._latencies.setdefault((stage, route), deque(maxlen=200)).append(time.monotonic() - started)
+        return response
+
+    async def complete(self, stage: str, routes: List[str], hedge_percentile: Optional[float] = None, **kwargs):
+        """
+        Create a chat completion on `routes` (model settings, primary first)
+
+        Args:
+            stage: Name the route latencies are tracked under, e.g. "summary"
+            routes: Model settings as accepted by resolve_model; only the first two are used
+            hedge_percentile: Primary latency percentile after which to hedge; None only fails over
+        """
+        self._count('requests')
+        routes = [route for route in dict.fromkeys(routes) if route][:2]
+        if self._admit(routes[0]):
+            backup_route = routes[1] if len(routes) > 1 else None
+        elif len(routes) > 1 and self._admit(routes[1]):
+            routes, backup_route = routes[1:], None
+        else:
+            # With every breaker open there is nothing better to do than try the primary
+            backup_route = None
+
+        primary = asyncio.ensure_future(self._attempt(stage, routes[0], kwargs))
+        if backup_route is None:
+            return await primary
+
+        backup = None
+        try:
+            delay = self.hedge_delay(stage, routes[0], hedge_percentile) if hedge_percentile else None
+            await asyncio.wait({primary}, timeout=delay)
+            if primary.done():
+                if primary.exception() is None or not self._admit(backup_route):
+                    return primary.result()
+                self._count('failovers')
+                logger.warning(f"{stage} request to {routes[0]} failed, failing over to {backup_route}: {primary.exception()}")
+                return await self._attempt(stage, backup_route, kwargs)
+
+            if not self._admit(backup_route):
+                return await primary
+            self._count('hedged')
+            backup = asyncio.ensure_future(self._attempt(stage, backup_route, kwargs))
+            pending = {primary, backup}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self._count('hedge_wins')
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats_counters)
+            breakers = dict(self._breakers)
+            latencies = {key: list(samples) for key, samples in self._latencies.items()}
+        stats['breakers'] = {provider: breaker.metrics() for provider, breaker in breakers.items()}
+        stats['latency'] = {
+            f"{stage} {route}": {
+                'samples': len(samples),
+                'p50': round(percentile(samples, 50), 3),
+                'p95': round(percentile(samples, 95), 3),
+            }
+            for (stage, route), samples in latencies.items()
+        }
+        return stats
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_llm_router() -> LLMRouter:
+    """Process-wide router, configured from LLM_HEDGE_* and CIRCUIT_* env settings"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = LLMRouter(
+                min_samples=int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 20)),
+                default_delay=float(os.getenv('LLM_HEDGE_DELAY', 8.0)),
+                error_rate=float(os.getenv('CIRCUIT_ERROR_RATE', 0.5)),
+                min_requests=int(os.getenv('CIRCUIT_MIN_REQUESTS', 5)),
+                cooldown=float(os.getenv('CIRCUIT_COOLDOWN', 30.0)),
+            )
+        return _router
+
+
+class StageRoute:
+    """The routes for one analysis stage; pass it wherever an OpenAI client is taken for completions"""
+
+    def __init__(self, stage: str, routes: List[str], hedge_percentile: Optional[float] = None):
+        self.stage = stage
+        self.routes = routes
+        self.hedge_percentile = hedge_percentile
+
+    async def create(self, **kwargs):
+        return await get_llm_router().complete(self.stage, self.routes, self.hedge_percentile, **kwargs)
+
+
+def get_stage_route(settings, stage: str) -> StageRoute:
+    """
+    Route for a stage of ProcessingSettings ("summary", "events", ...): its `<stage>Model`,
+    then `<stage>FallbackModel` or LLM_FALLBACK_MODEL, hedged at `hedgePercentile`
+    """
+    primary = getattr(settings, f'{stage}Model')
+    fallback = getattr(settings, f'{stage}FallbackModel', None) or os.getenv('LLM_FALLBACK_MODEL')
+    return StageRoute(stage, [primary, fallback], settings.hedgePercentile)
+
+
+async def create_completion(client: Union[OpenAI, AsyncOpenAI, StageRoute], **kwargs):
+    """Chat completion through a StageRoute's router, or directly on an OpenAI client"""
+    if isinstance(client, StageRoute):
+        return await client.create(**kwargs)
+    return await create_chat_completion(client, **kwargs)
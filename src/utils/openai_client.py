@@ -1,27 +1,263 @@
-from openai import OpenAI
+import asyncio
+import logging
+import threading
+import weakref
+from typing import AsyncIterator, Callable, Optional, Tuple, Union
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
 from dotenv import load_dotenv
 import os
+from src.utils.provider_limiter import get_provider_limiter
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+_http_client = None
+_clients = {}
+_clients_lock = threading.Lock()
+# Async clients are bound to the event loop they run on: one pool per loop
+_async_pools = weakref.WeakKeyDictionary()
+
+def _pool_limits() -> httpx.Limits:
+    max_connections = int(os.getenv('HTTP_MAX_CONNECTIONS', 100))
+    return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections // 5 or 1)
+
+def _shared_http_client():
+    """One connection pool for every OpenAI-compatible client; size with HTTP_MAX_CONNECTIONS"""
+    global _http_client
+    if _http_client is None:
+        _http_client = DefaultHttpxClient(limits=_pool_limits())
+    return _http_client
+
+def _cached_client(base_url: Optional[str], api_key: Optional[str]) -> OpenAI:
+    key = (base_url, api_key)
+    with _clients_lock:
+        if key not in _clients:
+            # Retries are handled by the provider limiter so it can see 429s and adapt
+            _clients[key] = OpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                max_retries=0,
+                http_client=_shared_http_client(),
+            )
+        return _clients[key]
+
+def _cached_async_client(base_url: Optional[str], api_key: Optional[str]) -> AsyncOpenAI:
+    """Async counterpart of _cached_client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        pool = _async_pools.get(loop)
+        if pool is None:
+            pool = _async_pools[loop] = {'http_client': DefaultAsyncHttpxClient(limits=_pool_limits()), 'clients': {}}
+        key = (base_url, api_key)
+        if key not in pool['clients']:
+            pool['clients'][key] = AsyncOpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                max_retries=0,
+                http_client=pool['http_client'],
+            )
+        return pool['clients'][key]
+
 def get_openai_client(model: str = None):
     """
-    Get an OpenAI client configured based on the model requested.
+    Get the client for chat models, which are all served through OpenRouter.
+    
+    Clients are created once per provider and share a pooled HTTP client, so
+    requests reuse open connections instead of doing a new TLS handshake each time.
     
     Args:
-        model: Optional model identifier. If starts with 'deepseek/', uses OpenRouter.
-              Otherwise uses direct OpenAI API.
+        model: Optional model identifier (any OpenRouter model id). Use resolve_model
+              with an "openai:" prefix to call the OpenAI API directly.
     
     Returns:
         OpenAI: Configured OpenAI client
     """
-    if model and model.startswith('deepseek/'):
-        return OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv("OPENROUTER_API_KEY"),
-        )
+    base_url, key_env = PROVIDERS['openrouter']
+    return _cached_client(base_url, os.getenv(key_env))
+
+# Providers that model settings can name explicitly, as "<provider>:<model>"
+PROVIDERS = {
+    'openrouter': ("https://openrouter.ai/api/v1", 'OPENROUTER_API_KEY'),
+    'openai': (None, 'OPENAI_API_KEY'),
+}
+
+def resolve_model(setting: str) -> Tuple[OpenAI, str]:
+    """
+    Client and model name for a model setting.
+    
+    "openai:gpt-4o" or "openrouter:openai/gpt-4o" pick the provider explicitly; any
+    other value (including OpenRouter ids like "deepseek/deepseek-r1:free") is a model
+    name for get_openai_client.
+    """
+    provider, separator, model = setting.partition(':')
+    if separator and provider in PROVIDERS:
+        base_url, key_env = PROVIDERS[provider]
+        return _cached_client(base_url, os.getenv(key_env)), model
+    return get_openai_client(setting), setting
+
+def resolve_async_model(setting: str) -> Tuple[AsyncOpenAI, str]:
+    """
+    Same as resolve_model but with an AsyncOpenAI client for the running event loop,
+    so cancelling a request closes its connection instead of leaving it to finish
+    """
+    provider, separator, model = setting.partition(':')
+    if separator and provider in PROVIDERS:
+        base_url, key_env = PROVIDERS[provider]
+        return _cached_async_client(base_url, os.getenv(key_env)), model
+    base_url, key_env = PROVIDERS['openrouter']
+    return _cached_async_client(base_url, os.getenv(key_env)), setting
+
+def get_embeddings_client():
+    """Shared client for the direct OpenAI API, used for embeddings"""
+    return _cached_client(None, os.getenv('OPENAI_API_KEY'))
+
+def close_openai_clients():
+    """Close the shared connection pool; called on application shutdown"""
+    global _http_client
+    with _clients_lock:
+        _clients.clear()
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+
+async def aclose_openai_clients():
+    """Close the async connection pool of the running event loop"""
+    with _clients_lock:
+        pool = _async_pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool['http_client'].aclose()
+
+def get_provider_name(client: Union[OpenAI, AsyncOpenAI]) -> str:
+    """Name of the upstream provider a client talks to, used to pick its limiter"""
+    return 'openrouter' if 'openrouter' in str(client.base_url) else 'openai'
+
+def estimate_tokens(messages, max_tokens: int = None) -> int:
+    """Rough token estimate for rate limiting (about 4 characters per token)"""
+    prompt_chars = sum(len(message.get('content') or '') for message in messages)
+    return prompt_chars // 4 + (max_tokens or 1000)
+
+_usage_totals = {}
+_usage_lock = threading.Lock()
+
+def record_usage(model: str, usage):
+    """Add a response's token usage to the per-model totals reported by usage_metrics()"""
+    if usage is None:
+        return
+    details = getattr(usage, 'prompt_tokens_details', None)
+    with _usage_lock:
+        totals = _usage_totals.setdefault(model or 'unknown', {
+            'requests': 0, 'prompt_tokens': 0, 'cached_prompt_tokens': 0, 'completion_tokens': 0
+        })
+        totals['requests'] += 1
+        totals['prompt_tokens'] += usage.prompt_tokens or 0
+        # Prompt tokens served from the provider's prompt cache
+        totals['cached_prompt_tokens'] += getattr(details, 'cached_tokens', None) or 0
+        totals['completion_tokens'] += usage.completion_tokens or 0
+
+def usage_metrics():
+    """Chat completion token usage per model since startup"""
+    with _usage_lock:
+        return {model: dict(totals) for model, totals in _usage_totals.items()}
+
+async def create_chat_completion(client: Union[OpenAI, AsyncOpenAI], **kwargs):
+    """
+    Create a chat completion through the provider's adaptive limiter.
+    
+    Applies the provider's concurrency and rate limits and retries 429/5xx responses
+    with backoff, without blocking the event loop. With an AsyncOpenAI client the
+    request runs on the event loop, so cancelling the caller aborts it.
+    """
+    limiter = get_provider_limiter(get_provider_name(client))
+    if isinstance(client, AsyncOpenAI):
+        async def request():
+            return await client.chat.completions.create(**kwargs)
     else:
-        return OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv("OPENROUTER_API_KEY"),
-        )
\ No newline at end of file
+        def request():
+            return client.chat.completions.create(**kwargs)
+    response = await limiter.acall(
+        request,
+        tokens=estimate_tokens(kwargs.get('messages', []), kwargs.get('max_tokens')),
+        actual_tokens=lambda response: response.usage.total_tokens if response.usage else None
+    )
+    record_usage(kwargs.get('model'), response.usage)
+    return response
+
+async def stream_chat_completion(
+    client: OpenAI,
+    on_usage: Optional[Callable] = None,
+    close_timeout: float = 5.0,
+    **kwargs
+) -> AsyncIterator[str]:
+    """
+    Stream a chat completion's text deltas as they arrive.
+    
+    Opening the stream goes through the provider's limiter like create_chat_completion,
+    so a 429 before the first token is retried, and the stream keeps its concurrency
+    slot until it ends. The blocking stream is read in a worker thread; if the consumer
+    stops early (e.g. the HTTP client disconnected) the upstream stream is closed.
+    Closing doesn't always interrupt a read that is already blocked, so the reader gets
+    `close_timeout` seconds to finish before the slot is released without it; it then
+    stops at the next chunk. `on_usage` is called with the usage object when the
+    provider sends one.
+    """
+    limiter = get_provider_limiter(get_provider_name(client))
+    stream, release = await limiter.aopen(
+        lambda: client.chat.completions.create(
+            stream=True,
+            stream_options={"include_usage": True},
+            **kwargs
+        ),
+        tokens=estimate_tokens(kwargs.get('messages', []), kwargs.get('max_tokens'))
+    )
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    stopped = threading.Event()
+
+    def send(callback, *args):
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The event loop closed while this thread was still blocked on the stream
+            pass
+
+    def read():
+        try:
+            for chunk in stream:
+                if stopped.is_set():
+                    break
+                if getattr(chunk, 'usage', None):
+                    record_usage(kwargs.get('model'), chunk.usage)
+                    if on_usage:
+                        send(on_usage, chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    send(queue.put_nowait, chunk.choices[0].delta.content)
+        except Exception as e:
+            send(queue.put_nowait, e)
+        finally:
+            send(queue.put_nowait, done)
+
+    reader = None
+    try:
+        reader = asyncio.create_task(asyncio.to_thread(read))
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        try:
+            stream.close()
+            if reader is not None:
+                _, pending = await asyncio.wait({reader}, timeout=close_timeout)
+                if pending:
+                    logger.warning(f"Stream reader still blocked {close_timeout}s after close; releasing its slot")
+                    reader.cancel()
+        finally:
+            release()
@@ -0,0 +1,460 @@
+import asyncio
+import email.utils
+import inspect
+import os
+import random
+import threading
+import time
+from datetime import timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from postgrest.exceptions import APIError as PostgrestAPIError
+
+load_dotenv()
+
+# 409 is deliberately absent: a conflict (e.g. a unique violation) fails the same way on retry
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504, 529}
+
+# HTTP status PostgREST answers with for an error code (SQLSTATE or PGRST*), by code prefix;
+# the first match wins and anything else is a client error (400)
+POSTGREST_STATUS_BY_CODE = (
+    ('PGRST000', 503), ('PGRST001', 503), ('PGRST002', 503), ('PGRST003', 504),
+    ('23503', 409), ('23505', 409),
+    ('08', 503), ('53', 503), ('40', 500), ('57', 500), ('58', 500), ('XX', 500),
+)
+
+# Defaults per provider; each value can be overridden with <PROVIDER>_<SETTING> env vars,
+# e.g. ELEVENLABS_MAX_CONCURRENCY=12 or OPENROUTER_TPM=400000
+PROVIDER_DEFAULTS = {
+    'elevenlabs': {'initial_concurrency': 4, 'max_concurrency': 16, 'rpm': 0, 'tpm': 0, 'latency_target': 0},
+    'openrouter': {'initial_concurrency': 8, 'max_concurrency': 64, 'rpm': 0, 'tpm': 0, 'latency_target': 0},
+    'openai': {'initial_concurrency': 8, 'max_concurrency': 64, 'rpm': 0, 'tpm': 0, 'latency_target': 0},
+    'supabase': {'initial_concurrency': 4, 'max_concurrency': 16, 'rpm': 0, 'tpm': 0, 'latency_target': 0},
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_minute`"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` tokens and return how many seconds the caller must wait before using them"""
+        with self._lock:
+            self._refill()
+            # Requests bigger than the bucket can never be satisfied in full; cap them
+            self._level -= min(amount, self.capacity)
+            return 0.0 if self._level >= 0 else -self._level / self.rate
+
+    def adjust(self, amount: float):
+        """Correct an earlier reservation once the real usage is known"""
+        with self._lock:
+            self._refill()
+            self._level = min(self.capacity, self._level - amount)
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._level
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit that grows additively while a provider is healthy and shrinks
+    multiplicatively on 429/5xx responses or latency above the target.
+
+    Threads wait with acquire(); coroutines wait with acquire_async(), which parks a
+    future on the caller's event loop instead of a thread. Callers on any thread or
+    loop share the same limit.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 64,
+        backoff_ratio: float = 0.5,
+        latency_backoff_ratio: float = 0.9,
+        latency_target: Optional[float] = None,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_backoff_ratio = latency_backoff_ratio
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.latency_ewma = 0.0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def _has_room(self) -> bool:
+        return self.in_flight < max(1, int(self.limit))
+
+    def acquire(self):
+        with self._condition:
+            self._condition.wait_for(self._has_room)
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._has_room():
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                with self._condition:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+
+    def abandon(self):
+        """Free the slot of a cancelled request without drawing conclusions about the provider"""
+        with self._condition:
+            self.in_flight -= 1
+            self._notify()
+
+    def _notify(self):
+        """Wake every waiting thread and coroutine; call with the condition held"""
+        self._condition.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_wake, waiter)
+
+    def release(self, latency: float, overloaded: bool = False):
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            self.latency_ewma = latency if not self.latency_ewma else 0.8 * self.latency_ewma + 0.2 * latency
+            if overloaded:
+                # The requests in flight during one round trip all see the same overload,
+                # so decrease at most once per round trip
+                if now - self._last_decrease >= self.latency_ewma:
+                    self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                    self._last_decrease = now
+            elif self.latency_target and latency > self.latency_target:
+                self.limit = max(self.min_limit, self.limit * self.latency_backoff_ratio)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._notify()
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def _postgrest_status(code) -> Optional[int]:
+    """HTTP status for a PostgREST APIError code; responses that weren't JSON carry the status itself"""
+    if code is None:
+        return None
+    code = str(code)
+    if code.isdigit() and len(code) == 3:
+        return int(code)
+    for prefix, status in POSTGREST_STATUS_BY_CODE:
+        if code.startswith(prefix):
+            return status
+    return 400
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status is None and isinstance(error, PostgrestAPIError):
+        status = _postgrest_status(error.code)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds requested by a Retry-After header on the error's response, if any"""
+    headers = getattr(error, 'headers', None) or getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        # Malformed header: fall back to the normal backoff
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    if isinstance(error, httpx.TransportError):
+        # Connect/read/write errors, timeouts and dropped connections from httpx-based clients
+        return True
+    name = type(error).__name__
+    return isinstance(error, (ConnectionError, TimeoutError)) or 'Timeout' in name or 'Connection' in name
+
+
+class ProviderLimiter:
+    """
+    Adaptive concurrency, rate limiting and retries for one upstream provider.
+
+    Calls go through a token bucket for requests per minute and one for tokens per
+    minute (when configured), then an AIMD concurrency limit. Retryable failures
+    (429, 5xx, connection errors) are retried with full-jitter exponential backoff,
+    waiting at least as long as the provider's Retry-After header; a Retry-After also
+    pauses every other caller of the same provider.
+
+    call() waits in the calling thread; acall() waits on the event loop and only
+    offloads the request itself to a worker thread (or awaits it directly when it is
+    a coroutine function), so queued requests don't hold executor threads.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_concurrency: int = 4,
+        max_concurrency: int = 64,
+        rpm: float = 0,
+        tpm: float = 0,
+        latency_target: float = 0,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        self.name = name
+        self.concurrency = AIMDLimiter(
+            initial_limit=initial_concurrency,
+            max_limit=max_concurrency,
+            latency_target=latency_target or None
+        )
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'successes': 0, 'throttled': 0, 'server_errors': 0, 'retries': 0, 'failures': 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _capacity_delay(self, tokens: int) -> float:
+        """Reserve rate limit capacity and return how long to wait before sending"""
+        delay = self._blocked_until - time.monotonic()
+        if self.request_bucket:
+            delay = max(delay, self.request_bucket.reserve(1))
+        if self.token_bucket and tokens:
+            delay = max(delay, self.token_bucket.reserve(tokens))
+        return delay
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay * 4))
+            with self._lock:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        return delay
+
+    def _failed(self, error: Exception, started: float, attempt: int) -> Optional[float]:
+        """Record a failed attempt; returns the backoff before retrying, or None to give up"""
+        status = _status_code(error)
+        overloaded = status == 429 or (status is not None and status >= 500)
+        self.concurrency.release(time.monotonic() - started, overloaded=overloaded)
+        if status == 429:
+            self._count('throttled')
+        elif status is not None and status >= 500:
+            self._count('server_errors')
+
+        if attempt >= self.max_retries or not _is_retryable(error):
+            self._count('failures')
+            return None
+        self._count('retries')
+        return self._backoff(attempt, error)
+
+    def _succeeded(self, result: Any, started: float, tokens: int, actual_tokens: Optional[Callable], release=True):
+        if release:
+            self.concurrency.release(time.monotonic() - started)
+        self._count('successes')
+        if self.token_bucket and actual_tokens:
+            try:
+                used = actual_tokens(result)
+            except Exception:
+                used = None
+            if used is not None:
+                self.token_bucket.adjust(used - tokens)
+
+    def call(
+        self,
+        fn: Callable[[], Any],
+        tokens: int = 0,
+        actual_tokens: Optional[Callable[[Any], Optional[int]]] = None,
+    ) -> Any:
+        """
+        Run a blocking provider call under the limits, retrying retryable failures
+
+        Args:
+            fn: Zero-argument callable performing the request
+            tokens: Estimated tokens the request will consume (for the TPM bucket)
+            actual_tokens: Optional callable returning the real token usage from the result,
+                used to correct the TPM bucket after the call
+        """
+        attempt = 0
+        while True:
+            delay = self._capacity_delay(tokens)
+            if delay > 0:
+                time.sleep(delay)
+            self.concurrency.acquire()
+            self._count('requests')
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._failed(e, started, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self._succeeded(result, started, tokens, actual_tokens)
+            return result
+
+    async def acall(
+        self,
+        fn: Callable[[], Any],
+        tokens: int = 0,
+        actual_tokens: Optional[Callable[[Any], Optional[int]]] = None,
+    ) -> Any:
+        """
+        Same as call() for coroutines: waits for capacity without blocking a thread
+
+        A blocking `fn` runs in a worker thread; a coroutine function (e.g. an
+        AsyncOpenAI method) is awaited, so cancelling the caller aborts the request.
+        """
+        result, _ = await self._acall(fn, tokens, actual_tokens, keep_slot=False)
+        return result
+
+    async def aopen(self, fn: Callable[[], Any], tokens: int = 0) -> Tuple[Any, Callable[[], None]]:
+        """
+        Open a streaming response under the limits, keeping its concurrency slot
+
+        Opening is retried like acall(). Returns the result of `fn` and a release()
+        callable that must be called once the stream is finished; the time taken to
+        open the stream, not its full duration, is what the AIMD limit sees.
+        """
+        return await self._acall(fn, tokens, None, keep_slot=True)
+
+    async def _acall(self, fn, tokens, actual_tokens, keep_slot: bool):
+        is_async = inspect.iscoroutinefunction(fn)
+        attempt = 0
+        while True:
+            delay = self._capacity_delay(tokens)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.concurrency.acquire_async()
+            self._count('requests')
+            started = time.monotonic()
+            try:
+                result = await fn() if is_async else await asyncio.to_thread(fn)
+            except asyncio.CancelledError:
+                self.concurrency.abandon()
+                raise
+            except Exception as e:
+                delay = self._failed(e, started, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self._succeeded(result, started, tokens, actual_tokens, release=not keep_slot)
+            if not keep_slot:
+                return result, None
+            latency = time.monotonic() - started
+            released = False
+
+            def release():
+                nonlocal released
+                if not released:
+                    released = True
+                    self.concurrency.release(latency)
+
+            return result, release
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            'concurrency_limit': round(self.concurrency.limit, 2),
+            'in_flight': self.concurrency.in_flight,
+            'requests_available': round(self.request_bucket.available, 1) if self.request_bucket else None,
+            'tokens_available': round(self.token_bucket.available, 1) if self.token_bucket else None,
+            'paused_for': max(0.0, round(self._blocked_until - time.monotonic(), 2)),
+        }
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def _setting(provider: str, key: str, default: float) -> float:
+    value = os.getenv(f"{provider.upper()}_{key.upper()}")
+    return float(value) if value else default
+
+
+def get_provider_limiter(provider: str) -> ProviderLimiter:
+    """Get the process-wide limiter for a provider, creating it from env settings on first use"""
+    with _registry_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            defaults = PROVIDER_DEFAULTS.get(provider, PROVIDER_DEFAULTS['openai'])
+            limiter = ProviderLimiter(
+                provider,
+                initial_concurrency=int(_setting(provider, 'initial_concurrency', defaults['initial_concurrency'])),
+                max_concurrency=int(_setting(provider, 'max_concurrency', defaults['max_concurrency'])),
+                rpm=_setting(provider, 'rpm', defaults['rpm']),
+                tpm=_setting(provider, 'tpm', defaults['tpm']),
+                latency_target=_setting(provider, 'latency_target', defaults['latency_target']),
+            )
+            _limiters[provider] = limiter
+        return limiter
+
+
+def provider_metrics() -> Dict[str, Dict]:
+    """Current limits and counters for every provider that has been used"""
+    with _registry_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.metrics() for name, limiter in limiters.items()}
@@ -0,0 +1,32 @@
+import json
+from typing import AsyncIterator, Tuple
+
+from fastapi.responses import StreamingResponse
+
+
+def format_sse(event: str, data) -> str:
+    """Encode one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def sse_response(events: AsyncIterator[Tuple[str, object]]) -> StreamingResponse:
+    """
+    Stream (event, data) pairs as Server-Sent Events
+
+    An exception raised by the generator is sent as a final `error` event, since the
+    200 status line has already gone out by then.
+    """
+    async def body():
+        try:
+            async for event, data in events:
+                yield format_sse(event, data)
+        except Exception as e:
+            print(f"Error while streaming: {str(e)}")
+            yield format_sse('error', {'detail': str(e)})
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        # Disable proxy buffering so tokens reach the browser as they are produced
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
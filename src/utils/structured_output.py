@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Type, TypeVar, Union
+
+from openai import OpenAI
+from pydantic import BaseModel, ValidationError
+
+from src.utils.llm_router import StageRoute, create_completion
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar('M', bound=BaseModel)
+
+TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+
+class StructuredOutputError(Exception):
+    """A model response still failed parsing or validation after the retry budget was spent"""
+
+    def __init__(self, stage: str, error: str, raw: str):
+        super().__init__(f"{stage}: {error}")
+        self.stage = stage
+        self.error = error
+        self.raw = raw
+
+
+def extract_json(text: str):
+    """
+    Parse the JSON object in a model response
+
+    Returns (data, repaired). Code fences are always stripped; if the text still
+    doesn't parse, the outermost {...} is taken and trailing commas are removed, and
+    `repaired` is True. Raises ValueError when nothing parseable is found.
+    """
+    text = (text or '').strip()
+    text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text).strip()
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+    start, end = text.find('{'), text.rfind('}')
+    if start != -1 and end > start:
+        try:
+            return json.loads(TRAILING_COMMA.sub(r'\1', text[start:end + 1])), True
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+    raise ValueError("No JSON object in response")
+
+
+_stats: Dict[str, Dict[str, Dict[str, int]]] = {}
+_stats_lock = threading.Lock()
+
+
+def _count(model: str, stage: str, key: str):
+    with _stats_lock:
+        counters = _stats.setdefault(model or 'unknown', {}).setdefault(stage, {
+            'calls': 0, 'attempts': 0, 'parse_failures': 0, 'validation_failures': 0,
+            'repaired': 0, 'reasks': 0, 'exhausted': 0,
+        })
+        counters[key] += 1
+
+
+def structured_output_metrics() -> Dict:
+    """Per model and stage: calls, parse/validation failures, local repairs, re-asks and give-ups"""
+    with _stats_lock:
+        metrics = {model: {stage: dict(c) for stage, c in stages.items()} for model, stages in _stats.items()}
+    for stages in metrics.values():
+        for counters in stages.values():
+            failures = counters['parse_failures'] + counters['validation_failures']
+            counters['failure_rate'] = round(failures / counters['attempts'], 4) if counters['attempts'] else 0.0
+    return metrics
+
+
+def response_format_for(response_model: Type[BaseModel], stage: str) -> Optional[Dict]:
+    """
+    Provider-side output constraint; STRUCTURED_OUTPUT_MODE picks `json_object`
+    (default, widely supported), `json_schema` (the pydantic schema) or `off`
+    """
+    mode = os.getenv('STRUCTURED_OUTPUT_MODE', 'json_object')
+    if mode == 'json_schema':
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": stage, "schema": response_model.model_json_schema()},
+        }
+    if mode == 'json_object':
+        return {"type": "json_object"}
+    return None
+
+
+async def create_structured_completion(
+    client: Union[OpenAI, StageRoute],
+    response_model: Type[M],
+    stage: str,
+    messages: List[Dict],
+    check: Optional[Callable[[M], None]] = None,
+    max_attempts: Optional[int] = None,
+    on_response: Optional[Callable] = None,
+    **kwargs
+) -> M:
+    """
+    Create a chat completion and return it parsed into `response_model`
+
+    The provider is asked for JSON output; the response is parsed (with light local
+    repair: code fences, surrounding text, trailing commas) and validated against the
+    model and the optional `check`, which raises ValueError for semantic problems
+    such as an unknown label. If that fails, only this call is re-asked, with the
+    invalid response and the error appended to the conversation, up to `max_attempts`
+    attempts in total (STRUCTURED_OUTPUT_MAX_ATTEMPTS, default 2). Every outcome is
+    counted per model and stage for structured_output_metrics(); `on_response` is
+    called with every raw response, e.g. to add up token usage. Pass a StageRoute as
+    `client` to send the request through the failover/hedging router.
+
+    Raises:
+        StructuredOutputError: no valid response within the retry budget
+    """
+    model = kwargs.get('model')
+    max_attempts = max_attempts or int(os.getenv('STRUCTURED_OUTPUT_MAX_ATTEMPTS', 2))
+    response_format = response_format_for(response_model, stage)
+    if response_format:
+        kwargs['response_format'] = response_format
+
+    _count(model, stage, 'calls')
+    conversation = list(messages)
+    error, raw = "", ""
+    for attempt in range(max_attempts):
+        if attempt:
+            _count(model, stage, 'reasks')
+            conversation = conversation + [
+                {"role": "assistant", "content": raw},
+                {"role": "user", "content": (
+                    f"That response could not be used: {error[:1000]}\n"
+                    "Reply with only the corrected JSON object."
+                )},
+            ]
+        _count(model, stage, 'attempts')
+        response = await create_completion(client, messages=conversation, **kwargs)
+        if on_response:
+            on_response(response)
+        raw = response.choices[0].message.content or ""
+
+        try:
+            data, repaired = extract_json(raw)
+        except ValueError as e:
+            _count(model, stage, 'parse_failures')
+            error = str(e)
+            continue
+        try:
+            result = response_model.model_validate(data)
+            if check:
+                check(result)
+        except (ValidationError, ValueError) as e:
+            _count(model, stage, 'validation_failures')
+            error = str(e)
+            continue
+        if repaired:
+            _count(model, stage, 'repaired')
+        return result
+
+    _count(model, stage, 'exhausted')
+    logger.warning(f"No valid {stage} response from {model} after {max_attempts} attempts: {error}")
+    raise StructuredOutputError(stage, error, raw)
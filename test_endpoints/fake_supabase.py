@@ -0,0 +1,194 @@
+"""In-memory stand-in for the parts of the Supabase client the services use, for tests"""
+import copy
+import itertools
+from types import SimpleNamespace
+from typing import Dict, List
+
+
+def _coerce(current, text):
+    """Compare a filter value from a PostgREST expression with the column's type"""
+    if isinstance(current, bool):
+        return text == 'true'
+    if isinstance(current, int):
+        return int(text)
+    if isinstance(current, float):
+        return float(text)
+    return text
+
+
+def _split_terms(expression: str) -> List[str]:
+    terms, depth, quoted, current = [], 0, False, ''
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            terms.append(current)
+            current = ''
+            continue
+        current += char
+    terms.append(current)
+    return [term.strip() for term in terms if term.strip()]
+
+
+OPERATORS = {
+    'eq': lambda a, b: a == b,
+    'neq': lambda a, b: a != b,
+    'gt': lambda a, b: a is not None and a > b,
+    'gte': lambda a, b: a is not None and a >= b,
+    'lt': lambda a, b: a is not None and a < b,
+    'lte': lambda a, b: a is not None and a <= b,
+}
+
+
+def _parse(expression: str):
+    """Row predicate for a PostgREST logical filter such as `a.gt.1,and(a.eq.1,b.gt.2)`"""
+    predicates = []
+    for term in _split_terms(expression):
+        if term.startswith(('and(', 'or(')):
+            name, inner = term.split('(', 1)
+            inner_predicates = _parse(inner[:-1])
+            combine = all if name == 'and' else any
+            predicates.append(lambda row, p=inner_predicates, c=combine: c(f(row) for f in p.parts))
+        else:
+            column, operator, value = term.split('.', 2)
+            value = value.strip('"')
+            predicates.append(
+                lambda row, c=column, o=OPERATORS[operator], v=value: o(row.get(c), _coerce(row.get(c), v))
+                if row.get(c) is not None else False
+            )
+    any_of = lambda row: any(predicate(row) for predicate in predicates)
+    any_of.parts = predicates
+    return any_of
+
+
+class FakeQuery:
+    def __init__(self, db: 'FakeSupabase', table: str):
+        self.db = db
+        self.table = table
+        self.operation = 'select'
+        self.columns = '*'
+        self.payload = None
+        self.filters = []
+        self.orders = []
+        self._limit = None
+        self._range = None
+
+    def select(self, columns: str = '*'):
+        self.columns = columns
+        return self
+
+    def _filter(self, predicate):
+        self.filters.append(predicate)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(lambda row: row.get(column) == value)
+
+    def neq(self, column, value):
+        return self._filter(lambda row: row.get(column) != value)
+
+    def gt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) > value)
+
+    def in_(self, column, values):
+        values = list(values)
+        return self._filter(lambda row: row.get(column) in values)
+
+    def is_(self, column, value):
+        return self._filter(lambda row: row.get(column) is None if value in (None, 'null') else row.get(column) == value)
+
+    def or_(self, expression: str):
+        return self._filter(_parse(expression))
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def insert(self, rows):
+        self.operation, self.payload = 'insert', rows
+        return self
+
+    def upsert(self, rows, on_conflict='id', **options):
+        self.operation, self.payload = 'upsert', rows
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, fields):
+        self.operation, self.payload = 'update', fields
+        return self
+
+    def delete(self):
+        self.operation = 'delete'
+        return self
+
+    def _matches(self, row):
+        return all(predicate(row) for predicate in self.filters)
+
+    def execute(self):
+        self.db.requests.append((self.table, self.operation))
+        if self.db.fail_on and self.db.fail_on(self):
+            raise RuntimeError(f"{self.operation} on {self.table} failed")
+        rows = self.db.tables.setdefault(self.table, [])
+
+        if self.operation in ('insert', 'upsert'):
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            written = []
+            for new in payload:
+                new = copy.deepcopy(new)
+                new.setdefault('id', next(self.db.ids))
+                existing = next((row for row in rows if row.get('id') == new['id']), None)
+                if existing is not None and self.operation == 'upsert':
+                    existing.update(new)
+                    written.append(copy.deepcopy(existing))
+                else:
+                    rows.append(new)
+                    written.append(copy.deepcopy(new))
+            return SimpleNamespace(data=written)
+
+        matched = [row for row in rows if self._matches(row)]
+        if self.operation == 'update':
+            for row in matched:
+                row.update(copy.deepcopy(self.payload))
+            return SimpleNamespace(data=copy.deepcopy(matched))
+        if self.operation == 'delete':
+            self.db.tables[self.table] = [row for row in rows if not self._matches(row)]
+            return SimpleNamespace(data=copy.deepcopy(matched))
+
+        for column, desc in reversed(self.orders):
+            matched.sort(key=lambda row: row.get(column), reverse=desc)
+        if self._range:
+            matched = matched[self._range[0]:self._range[1] + 1]
+        if self._limit is not None:
+            matched = matched[:self._limit]
+        if self.columns.strip() != '*':
+            names = [name.strip() for name in self.columns.split(',')]
+            matched = [{name: row.get(name) for name in names} for row in matched]
+        return SimpleNamespace(data=copy.deepcopy(matched))
+
+
+class FakeSupabase:
+    """
+    Tables are lists of row dicts; every executed query is logged in `requests` as
+    (table, operation), and `fail_on(query)` can make chosen queries raise
+    """
+
+    def __init__(self, tables: Dict[str, List[Dict]] = None):
+        self.tables = {name: [dict(row) for row in rows] for name, rows in (tables or {}).items()}
+        self.requests = []
+        self.fail_on = None
+        self.ids = itertools.count(1000)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
@@ -0,0 +1,40 @@
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.answer_cache import SemanticAnswerCache
+
+
+def test_answer_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'answers.sqlite3')
+        cache = SemanticAnswerCache(path=path, threshold=0.95)
+        refund = [1.0, 0.0, 0.1]
+        version = cache.version
+        cache.store("How do I process a refund?", refund, 3, {'answer': "Use the refunds screen."}, 2.5, version)
+
+        # A rephrasing with a nearly identical embedding is a hit; an unrelated question is not
+        hit = cache.lookup([0.99, 0.02, 0.1], 3)
+        assert hit['answer'] == "Use the refunds screen." and hit['cache_similarity'] > 0.95
+        assert cache.lookup([0.0, 1.0, 0.0], 3) is None
+        # Answers built from a different number of chunks are not reused
+        assert cache.lookup(refund, 5) is None
+
+        # Entries persist across restarts until the knowledge base changes
+        reopened = SemanticAnswerCache(path=path, threshold=0.95)
+        assert reopened.lookup(refund, 3) is not None
+        reopened.bump_version()
+        assert cache.lookup(refund, 3) is None
+
+        # An answer generated against an older version is not stored
+        cache.store("How do I process a refund?", refund, 3, {'answer': "stale"}, 2.5, version)
+        assert cache.lookup(refund, 3) is None
+
+        stats = cache.stats()
+        assert stats['hits'] == 1 and stats['seconds_saved'] == 2.5
+        print("Answer cache:", stats)
+
+
+if __name__ == "__main__":
+    test_answer_cache()
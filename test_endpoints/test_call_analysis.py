@@ -0,0 +1,49 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.models.analysis_models import CallDetails
+from src.services.call_analysis import build_messages, normalize_details, parse_call_analysis
+
+
+def test_call_analysis():
+    response = {
+        "summary": "اتصل العميل لطلب استرجاع المبلغ",
+        "events": [{"actor": "agent", "action": "approved refund", "segment": 3, "timestamp": 9.4}],
+        "details": {"sentiment_score": 4.5, "topics": ["refund"], "flags": [], "call_type": "billing"},
+        "checklist_matches": [{"segment": 1, "checklist_item": "Greet Customer"}],
+    }
+    analysis = parse_call_analysis("```json\n" + json.dumps(response, ensure_ascii=False) + "\n```")
+    assert analysis.summary == response["summary"]
+    assert analysis.events[0].segment == 3
+    assert analysis.checklist_matches[0].checklist_item == "Greet Customer"
+
+    # Invalid items are dropped one by one and the valid sections are kept
+    broken = {
+        **response,
+        "events": [{"actor": "agent"}, {"actor": "customer", "action": "asked for refund", "timestamp": "12.5"}],
+        "details": {"sentiment_score": "very good"},
+    }
+    analysis = parse_call_analysis(json.dumps(broken))
+    assert [event.action for event in analysis.events] == ["asked for refund"]
+    assert analysis.events[0].timestamp == 12.5
+    assert analysis.details == CallDetails()
+    assert analysis.summary == response["summary"]
+
+    assert parse_call_analysis("not json").summary == ""
+
+    assert normalize_details(CallDetails(sentiment_score=7, topics=["a", "b", "c", "d"], call_type="sales")) == {
+        "sentiment_score": 5.0, "topics": ["a", "b", "c"], "flags": [], "call_type": "other"
+    }
+
+    # The system message is the same for every call so providers can cache the prefix
+    first = build_messages("1 [0.0] S0: hi", ["Greet Customer"])
+    second = build_messages("1 [0.0] S1: bye")
+    assert first[0] == second[0]
+    assert "- Greet Customer" in first[1]["content"] and "(no checklist)" in second[1]["content"]
+
+
+if __name__ == "__main__":
+    test_call_analysis()
+    print("call analysis tests passed")
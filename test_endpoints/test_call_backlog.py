@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.call_processor import CallProcessor
+from src.services.call_scheduler import FairCallScheduler
+from test_endpoints.fake_supabase import FakeSupabase
+
+
+def make_processor(calls, reprocess=False, organizations=('org',)):
+    # Skip __init__: it connects to Supabase and opens a log file
+    processor = CallProcessor.__new__(CallProcessor)
+    processor.supabase = FakeSupabase({'calls': calls, 'organizations': [{'id': org} for org in organizations]})
+    processor.reprocess = reprocess
+    processor.collect_stats = False
+    processor.file_logger = logging.getLogger("test_call_backlog")
+    return processor
+
+
+def call(call_id, created_at, processed=False, organization_id='org'):
+    return {'id': call_id, 'recording_url': f"https://storage/{call_id}.mp3", 'organization_id': organization_id,
+            'duration': 60, 'created_at': created_at, 'processed': processed}
+
+
+def record_dispatches(processor, delay=0.0):
+    """Replace process_call with a stub that records the organization of each call it is given"""
+    dispatched = []
+
+    async def process_call(call_id, recording_url, organization_id):
+        dispatched.append(organization_id)
+        await asyncio.sleep(delay)
+        for stored in processor.supabase.tables['calls']:
+            if stored['id'] == call_id:
+                stored['processed'] = True
+        return {'success': True, 'call_id': call_id}
+
+    processor.process_call = process_call
+    return dispatched
+
+
+def test_call_backlog_keyset():
+    calls = [
+        call('c-5', '2024-01-01T10:00:00+00:00'),
+        call('c-2', '2024-01-01T10:00:00+00:00'),
+        call('c-9', '2024-01-01T10:00:00+00:00'),
+        call('c-1', '2024-01-01T11:00:00+00:00', processed=True),
+        call('c-7', '2024-01-01T11:00:00+00:00'),
+        call('c-3', '2024-01-02T09:00:00+00:00'),
+        call('c-4', '2024-01-02T09:00:00+00:00'),
+    ]
+    expected = ['c-2', 'c-5', 'c-9', 'c-7', 'c-3', 'c-4']
+
+    async def collect(processor, **options):
+        seen = []
+        async for row in processor.iter_unprocessed_calls(**options):
+            seen.append(row['id'])
+            # Marking calls processed underneath the cursor doesn't shift later pages
+            for stored in processor.supabase.tables['calls']:
+                if stored['id'] == row['id']:
+                    stored['processed'] = True
+        return seen
+
+    # Ties on created_at are broken by id, also across page boundaries
+    processor = make_processor(calls)
+    assert asyncio.run(collect(processor, page_size=2)) == expected
+    # 6 unprocessed calls in pages of 2: three full pages, then an empty one ends the stream
+    assert processor.supabase.requests.count(('calls', 'select')) == 4
+
+    # A page size that divides nothing evenly and a page holding a whole tie group
+    for page_size in (1, 3, 4, 10):
+        processor = make_processor([dict(row) for row in calls])
+        assert asyncio.run(collect(processor, page_size=page_size)) == expected
+
+    # The limit stops the stream and shrinks the last page request
+    processor = make_processor([dict(row) for row in calls])
+    assert asyncio.run(collect(processor, page_size=2, limit=3)) == expected[:3]
+    assert processor.supabase.requests.count(('calls', 'select')) == 2
+
+    # Reprocessing includes processed calls
+    processor = make_processor([dict(row) for row in calls], reprocess=True)
+    assert len(asyncio.run(collect(processor, page_size=2))) == 7
+
+
+def bulk_import_backlog():
+    # org-bulk imported 200 calls, all older than the other organizations' calls
+    calls = [call(f"bulk-{i:03d}", f"2024-01-01T{i // 60:02d}:{i % 60:02d}:00+00:00", organization_id='org-bulk')
+             for i in range(200)]
+    calls += [call(f"small-{i}", f"2024-01-02T10:0{i}:00+00:00", organization_id='org-small') for i in range(3)]
+    calls += [call(f"none-{i}", f"2024-01-02T11:0{i}:00+00:00", organization_id=None) for i in range(2)]
+    return calls
+
+
+def test_backlog_fair_between_organizations():
+    processor = make_processor(bulk_import_backlog(), organizations=('org-bulk', 'org-small'))
+    dispatched = record_dispatches(processor, delay=0.01)
+    results = asyncio.run(processor.process_all_calls(
+        concurrency=2, page_size=50, scheduler=FairCallScheduler(max_queued=20), stats_interval=0
+    ))
+    assert len(results) == 205
+    # Every organization is served within the first dispatches despite the older bulk import
+    assert dispatched[:10].count('org-small') >= 2 and dispatched[:10].count(None) >= 2
+    assert dispatched.count('org-small') == 3 and dispatched.count(None) == 2
+
+    # The limit applies to the total over all organizations
+    processor = make_processor(bulk_import_backlog(), organizations=('org-bulk', 'org-small'))
+    dispatched = record_dispatches(processor)
+    results = asyncio.run(processor.process_all_calls(
+        limit=6, concurrency=2, page_size=50, scheduler=FairCallScheduler(max_queued=20), stats_interval=0
+    ))
+    assert len(results) == 6 and len(dispatched) == 6
+    assert sum(1 for stored in processor.supabase.tables['calls'] if stored['processed']) == 6
+
+
+def test_follow_polls_each_organization():
+    processor = make_processor(bulk_import_backlog(), organizations=('org-bulk', 'org-small'))
+    dispatched = record_dispatches(processor, delay=0.01)
+
+    async def run():
+        task = asyncio.create_task(processor.follow(
+            concurrency=2, poll_interval=0.05, use_realtime=False,
+            scheduler=FairCallScheduler(max_queued=20), stats_interval=0
+        ))
+        await asyncio.sleep(0.2)
+        # An organization created while following gets polled too
+        processor.supabase.tables['organizations'].append({'id': 'org-new'})
+        processor.supabase.tables['calls'].append(
+            call('new-0', '2024-01-03T10:00:00+00:00', organization_id='org-new')
+        )
+        await asyncio.sleep(0.3)
+        processor.stop_following()
+        await task
+
+    asyncio.run(run())
+    assert dispatched[:10].count('org-small') >= 2 and dispatched[:10].count(None) >= 2
+    assert 'org-new' in dispatched
+    # The bulk import is still being worked through
+    assert dispatched.index('org-new') < 60
+
+
+if __name__ == "__main__":
+    test_call_backlog_keyset()
+    test_backlog_fair_between_organizations()
+    test_follow_polls_each_organization()
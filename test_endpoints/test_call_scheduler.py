@@ -0,0 +1,83 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.call_scheduler import DEFAULT_ORGANIZATION, FairCallScheduler
+
+
+def test_call_scheduler():
+    async def run():
+        scheduler = FairCallScheduler(
+            org_weights={'org-a': 2},
+            shortest_first=True,
+            priority_overrides={'b-3': -1}
+        )
+        # org-a has a bulk import; org-b only a few calls
+        for i in range(6):
+            await scheduler.put({'id': f"a-{i}", 'organization_id': 'org-a', 'duration': 100 - i})
+        for i in range(4):
+            await scheduler.put({'id': f"b-{i}", 'organization_id': 'org-b', 'duration': 50})
+        await scheduler.put(None)
+
+        order = []
+        while True:
+            call = await scheduler.get()
+            if call is None:
+                break
+            order.append(call['id'])
+        return order, scheduler.wait_stats()
+
+    order, stats = asyncio.run(run())
+
+    # Priority override first, then 2:1 round-robin with shortest calls first within org-a
+    assert order == ['b-3', 'a-5', 'a-4', 'b-0', 'a-3', 'a-2', 'b-1', 'a-1', 'a-0', 'b-2']
+    assert stats['count'] == 10
+    assert set(stats['organizations']) == {'org-a', 'org-b'}
+    print("Scheduler order:", order)
+
+
+def test_call_scheduler_bounds():
+    async def run():
+        scheduler = FairCallScheduler(max_queued=3)
+        for i in range(3):
+            await scheduler.put({'id': f"a-{i}", 'organization_id': 'org-a'})
+        # The buffer is full: the next put waits until a worker takes a call
+        blocked = asyncio.ensure_future(scheduler.put({'id': 'n-0', 'organization_id': None}))
+        await asyncio.sleep(0.01)
+        assert not blocked.done() and len(scheduler) == 3
+        assert (await scheduler.get())['id'] == 'a-0'
+        await asyncio.wait_for(blocked, 1)
+
+        # Calls without an organization get their own turn in the round-robin
+        assert [(await scheduler.get())['id'] for _ in range(3)] == ['a-1', 'n-0', 'a-2']
+        return scheduler.wait_stats()
+
+    stats = asyncio.run(run())
+    assert set(stats['organizations']) == {'org-a', DEFAULT_ORGANIZATION}
+
+
+def test_call_scheduler_fair_admission():
+    async def run():
+        scheduler = FairCallScheduler(max_queued=3)
+        for i in range(3):
+            await scheduler.put({'id': f"a-{i}", 'organization_id': 'org-a'})
+        # Both organizations wait for room; org-a blocked first but already fills the buffer
+        blocked_a = asyncio.ensure_future(scheduler.put({'id': 'a-3', 'organization_id': 'org-a'}))
+        await asyncio.sleep(0.01)
+        blocked_b = asyncio.ensure_future(scheduler.put({'id': 'b-0', 'organization_id': 'org-b'}))
+        await asyncio.sleep(0.01)
+
+        await scheduler.get()
+        await asyncio.sleep(0.01)
+        assert blocked_b.done() and not blocked_a.done()
+        assert [(await scheduler.get())['id'] for _ in range(2)] == ['a-1', 'b-0']
+        await asyncio.wait_for(blocked_a, 1)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_call_scheduler()
+    test_call_scheduler_bounds()
+    test_call_scheduler_fair_admission()
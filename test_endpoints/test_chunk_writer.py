@@ -0,0 +1,111 @@
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.models.document_models import DocumentChunk
+from src.services.chunk_writer import BulkChunkWriter, BulkWriteError, encode_embedding
+from src.services.lexical_index import LexicalIndex
+from src.services.local_vector_index import LocalVectorIndex
+from src.services.vector_store import VectorStore
+from test_endpoints.fake_supabase import FakeSupabase
+
+
+def row(i, content="x" * 100, dimensions=10):
+    # 100 bytes of content + 10 bytes per dimension + 200 bytes of overhead = 400 bytes
+    return {'id': f"c{i}", 'document_id': 'doc-1', 'content': content, 'page_number': 1,
+            'chunk_number': i, 'embedding': [0.25] * dimensions}
+
+
+def fail_on_ids(*ids):
+    return lambda query: query.operation == 'upsert' and any(r['id'] in ids for r in query.payload)
+
+
+def test_encode_embedding():
+    assert encode_embedding([0.1, -2.5, 1e-9]) == '[0.1,-2.5,1e-09]'
+    # float32 precision: 7 significant digits
+    assert encode_embedding([0.123456789]) == '[0.1234568]'
+
+
+def test_byte_size_batching():
+    writer = BulkChunkWriter(FakeSupabase(), max_batch_bytes=1000, max_batch_rows=100)
+    batches = writer._make_batches([row(i) for i in range(5)])
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+    # Multi-byte content counts by its UTF-8 size
+    batches = writer._make_batches([row(i, content="م" * 150) for i in range(3)])
+    assert [len(batch) for batch in batches] == [1, 1, 1]
+
+    # Rows without embeddings are much smaller; the row cap still applies
+    small = [{key: value for key, value in row(i).items() if key != 'embedding'} for i in range(7)]
+    assert [len(batch) for batch in writer._make_batches(small)] == [3, 3, 1]
+    writer.max_batch_rows = 2
+    assert [len(batch) for batch in writer._make_batches(small)] == [2, 2, 2, 1]
+
+    # A row bigger than a whole batch still gets written, on its own
+    batches = writer._make_batches([row(0), row(1, dimensions=1536), row(2)])
+    assert [[r['id'] for r in batch] for batch in batches] == [['c0'], ['c1'], ['c2']]
+
+
+def test_bulk_write():
+    supabase = FakeSupabase()
+    writer = BulkChunkWriter(supabase, max_batch_bytes=1000)
+    assert asyncio.run(writer.write([row(i) for i in range(5)])) == 5
+    assert supabase.requests == [('document_chunks', 'upsert')] * 3
+    stored = {r['id']: r for r in supabase.tables['document_chunks']}
+    assert len(stored) == 5 and stored['c0']['embedding'] == '[' + ','.join(['0.25'] * 10) + ']'
+
+    # Writing the same rows again is an idempotent upsert
+    asyncio.run(writer.write([row(i) for i in range(5)]))
+    assert len(supabase.tables['document_chunks']) == 5
+
+    # A failed batch reports the rows that did land and stops further batches
+    supabase = FakeSupabase()
+    supabase.fail_on = fail_on_ids('c2')
+    writer = BulkChunkWriter(supabase, max_batch_bytes=1000, max_concurrent_batches=1)
+    try:
+        asyncio.run(writer.write([row(i) for i in range(6)]))
+        raise AssertionError("expected BulkWriteError")
+    except BulkWriteError as e:
+        assert e.written_ids == ['c0', 'c1']
+    assert supabase.requests == [('document_chunks', 'upsert')] * 2
+    assert [r['id'] for r in supabase.tables['document_chunks']] == ['c0', 'c1']
+
+
+def test_store_chunks_rollback(monkeypatch):
+    monkeypatch.setenv('ANSWER_CACHE_THRESHOLD', '0')
+    supabase = FakeSupabase({'document_chunks': [row('-existing')]})
+    supabase.fail_on = lambda query: query.operation == 'upsert' and any(
+        r['chunk_number'] == 3 for r in query.payload
+    )
+    chunks = [DocumentChunk(content="x" * 100, source="refunds.pdf", page_number=1, chunk_number=i)
+              for i in range(1, 6)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStore(
+            embedding_service=object(),
+            local_index=LocalVectorIndex(index_dir=tmp),
+            lexical_index=LexicalIndex(str(Path(tmp) / 'lexical.sqlite3')),
+            supabase=supabase,
+        )
+        store.chunk_writer = BulkChunkWriter(supabase, max_batch_bytes=1000, max_concurrent_batches=1)
+        try:
+            asyncio.run(store.store_chunks('doc-1', "Refunds", chunks, [[0.25] * 10] * 5))
+            raise AssertionError("expected BulkWriteError")
+        except BulkWriteError as e:
+            assert len(e.written_ids) == 2
+
+    # The batch that landed before the failure is deleted again; other chunks are untouched
+    assert supabase.requests == [('document_chunks', 'upsert')] * 2 + [('document_chunks', 'delete')]
+    assert [r['id'] for r in supabase.tables['document_chunks']] == ['c-existing']
+
+
+if __name__ == "__main__":
+    test_encode_embedding()
+    test_byte_size_batching()
+    test_bulk_write()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_store_chunks_rollback(monkeypatch)
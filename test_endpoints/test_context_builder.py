@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.context_builder import ContextBuilder
+
+
+class WordTokenizer:
+    def encode(self, text):
+        return text.split()
+
+
+def chunk(chunk_id, content, page, number):
+    return {'id': chunk_id, 'document_id': 'doc-1', 'source': 'Policy', 'content': content,
+            'page_number': page, 'chunk_number': number, 'similarity': 0.5}
+
+
+def test_context_builder():
+    chunks = [
+        chunk('c1', "refunds are issued within five business days of the request", 1, 1),
+        # Overlapping neighbour of c1 on the same page
+        chunk('c2', "of the request and are paid back to the original card", 1, 2),
+        # Near-duplicate of c1 from another page
+        chunk('c3', "refunds are issued within five business days of the request", 4, 9),
+        chunk('c4', "premium plans include priority support around the clock", 2, 5),
+    ]
+
+    result = ContextBuilder(WordTokenizer(), max_tokens=1000).build(chunks, max_chunks=3)
+    assert [c['id'] for c in result['chunks']] == ['c1', 'c2', 'c4']
+    # c1 and c2 are merged into one block with the repeated words dropped
+    assert len(result['blocks']) == 2
+    assert "of the request of the request" not in result['context']
+    assert "days of the request and are paid back" in result['context']
+    assert result['context_tokens'] == len(result['context'].split())
+
+    # A tight budget keeps only what fits
+    small = ContextBuilder(WordTokenizer(), max_tokens=16).build(chunks)
+    assert [c['id'] for c in small['chunks']] == ['c1']
+    assert small['context_tokens'] <= 16
+    print("Context tokens:", result['context_tokens'])
+
+
+if __name__ == "__main__":
+    test_context_builder()
@@ -0,0 +1,135 @@
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.models.document_models import DocumentMetadata
+from src.services.document_processor import DocumentProcessor
+from src.services.document_sync import DocumentSync, diff_chunks
+from src.services.ingestion_pipeline import IngestionPipeline
+from src.services.lexical_index import LexicalIndex
+from src.services.local_vector_index import LocalVectorIndex
+from src.services.text_chunker import TextChunker, content_hash
+from src.services.vector_store import VectorStore
+from test_endpoints.fake_supabase import FakeSupabase
+
+
+def test_document_sync_diff():
+    existing = [
+        {'id': 'c1', 'content': "Refunds take 5 days.", 'content_hash': content_hash("Refunds take 5 days."),
+         'page_number': 1, 'chunk_number': 1},
+        # Stored before content hashes existed
+        {'id': 'c2', 'content': "Call  us on weekdays.", 'content_hash': None, 'page_number': 1, 'chunk_number': 2},
+        {'id': 'c3', 'content': "Old fee table.", 'content_hash': content_hash("Old fee table."),
+         'page_number': 2, 'chunk_number': 3},
+    ]
+    new = [
+        {'content': "Refunds take 5 days.", 'page_number': 1, 'chunk_number': 1},
+        {'content': "A new paragraph.", 'page_number': 1, 'chunk_number': 2},
+        {'content': "Call us on weekdays.", 'page_number': 1, 'chunk_number': 3},
+    ]
+    diff = diff_chunks(existing, new)
+
+    assert diff['unchanged'] == ['c1']
+    assert [chunk['content'] for chunk in diff['added']] == ["A new paragraph."]
+    # Whitespace-only differences still match; the chunk moved and gets its hash backfilled
+    assert diff['moved'] == [{'id': 'c2', 'content': "Call  us on weekdays.", 'page_number': 1, 'chunk_number': 3,
+                              'content_hash': content_hash("Call us on weekdays.")}]
+    assert diff['removed'] == ['c3']
+    print("Diff:", {key: len(value) for key, value in diff.items()})
+
+
+def test_update_chunk_positions(monkeypatch):
+    monkeypatch.setenv('ANSWER_CACHE_THRESHOLD', '0')
+    rows = [
+        {'id': f"c{i}", 'document_id': 'doc-1', 'content': f"chunk {i}", 'content_hash': None,
+         'page_number': 1, 'chunk_number': i, 'embedding': [0.1, 0.2]}
+        for i in range(5)
+    ]
+    supabase = FakeSupabase({'document_chunks': rows})
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStore(
+            embedding_service=object(),
+            local_index=LocalVectorIndex(index_dir=tmp),
+            lexical_index=LexicalIndex(str(Path(tmp) / 'lexical.sqlite3')),
+            supabase=supabase,
+        )
+        moved = [
+            {'id': row['id'], 'content': row['content'], 'page_number': 2,
+             'chunk_number': row['chunk_number'] + 10, 'content_hash': content_hash(row['content'])}
+            for row in rows
+        ]
+        # c4 is deleted by someone else before the positions are written
+        supabase.tables['document_chunks'] = [row for row in supabase.tables['document_chunks'] if row['id'] != 'c4']
+        asyncio.run(store.update_chunk_positions('doc-1', moved))
+
+    # Updates in place, leaving the embeddings alone and not re-creating the deleted chunk
+    assert supabase.requests == [('document_chunks', 'update')] * 5
+    stored = {row['id']: row for row in supabase.tables['document_chunks']}
+    assert set(stored) == {'c0', 'c1', 'c2', 'c3'}
+    assert stored['c3']['chunk_number'] == 13 and stored['c3']['page_number'] == 2
+    assert stored['c3']['content_hash'] == content_hash("chunk 3")
+    assert stored['c3']['embedding'] == [0.1, 0.2]
+
+
+class WordTokenizer:
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+class FakeEmbeddingService:
+    def __init__(self):
+        self.texts = 0
+
+    async def embed_texts(self, texts):
+        self.texts += len(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_update_matches_ingestion_chunks(monkeypatch):
+    import docx
+
+    monkeypatch.setenv('ANSWER_CACHE_THRESHOLD', '0')
+    supabase = FakeSupabase()
+    processor = DocumentProcessor.__new__(DocumentProcessor)
+    # Three paragraphs per chunk, so a 50-paragraph group ends in the middle of a chunk
+    processor.chunker = TextChunker(chunk_size=30, chunk_overlap=0, tokenizer=WordTokenizer())
+    processor.embedding_service = FakeEmbeddingService()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = Path(tmp) / "refunds.docx"
+        document = docx.Document()
+        for i in range(120):
+            document.add_paragraph(f"Paragraph {i} explains step {i} of the refund process.")
+        document.save(file_path)
+
+        store = VectorStore(
+            embedding_service=processor.embedding_service,
+            local_index=LocalVectorIndex(index_dir=tmp),
+            lexical_index=LexicalIndex(str(Path(tmp) / 'lexical.sqlite3')),
+            supabase=supabase,
+        )
+        metadata = DocumentMetadata(title="Refunds", file_type="docx", file_size=file_path.stat().st_size,
+                                    category="guides")
+        ingested = asyncio.run(IngestionPipeline(processor, store).run(str(file_path), metadata))
+        embedded = processor.embedding_service.texts
+
+        # Updating with the same file finds every chunk where ingestion stored it
+        result = asyncio.run(DocumentSync(processor, store).update(ingested['document_id'], str(file_path), {}))
+
+    assert result['added'] == result['removed'] == result['moved'] == 0
+    assert result['unchanged'] == ingested['chunks_stored'] == 41
+    assert processor.embedding_service.texts == embedded
+    assert supabase.tables['documents'][0]['total_pages'] == 0
+
+if __name__ == "__main__":
+    test_document_sync_diff()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_update_chunk_positions(monkeypatch)
+        test_update_matches_ingestion_chunks(monkeypatch)
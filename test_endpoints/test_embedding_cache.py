@@ -0,0 +1,68 @@
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.embedding_cache import EmbeddingCache, normalize_text
+
+
+def test_cache_key_normalization():
+    key = EmbeddingCache.make_key("text-embedding-3-small", None, "Refund  policy\n for\tcalls ")
+    # Whitespace differences and unicode forms share a key
+    assert key == EmbeddingCache.make_key("text-embedding-3-small", None, " Refund policy for calls")
+    assert normalize_text("cafe\u0301") == "caf\u00e9"
+    assert EmbeddingCache.make_key("m", None, "cafe\u0301") == EmbeddingCache.make_key("m", None, "caf\u00e9")
+    # The model, the dimensions and the words themselves do not
+    assert key != EmbeddingCache.make_key("text-embedding-3-large", None, "Refund policy for calls")
+    assert key != EmbeddingCache.make_key("text-embedding-3-small", 256, "Refund policy for calls")
+    assert key != EmbeddingCache.make_key("text-embedding-3-small", None, "refund policy for calls")
+
+
+def test_embedding_cache_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "cache" / "embeddings.sqlite3")
+        cache = EmbeddingCache(path=path, memory_size=2)
+        vectors = {'a': [0.5, -1.0, 2.25], 'b': [1.0, 0.0, 0.0], 'c': [0.0, 0.0, 1.0]}
+        cache.put_many(vectors)
+
+        # Only the two most recent entries stay in memory; the oldest is read back from disk
+        assert list(cache._memory) == ['b', 'c']
+        assert cache.get_many(['a', 'b', 'missing']) == {'a': vectors['a'], 'b': vectors['b']}
+        assert cache.stats_counters == {'memory_hits': 1, 'disk_hits': 1, 'misses': 1}
+        # 'a' is now the most recent, so 'c' was evicted
+        assert list(cache._memory) == ['b', 'a']
+
+        # Another process sees the same vectors as float32 after a restart
+        restarted = EmbeddingCache(path=path, memory_size=2)
+        found = restarted.get_many(vectors)
+        assert found == vectors
+        stats = restarted.stats()
+        assert stats['disk_hits'] == 3 and stats['hit_rate'] == 1.0 and stats['memory_entries'] == 2
+
+        # Vectors are stored as float32, so doubles come back rounded
+        restarted.put_many({'d': [0.1]})
+        stored = EmbeddingCache(path=path).get_many(['d'])['d'][0]
+        assert stored != 0.1 and abs(stored - 0.1) < 1e-7
+
+
+def test_memory_only_cache():
+    cache = EmbeddingCache(path=None, memory_size=100)
+    threads = [
+        threading.Thread(target=cache.put_many, args=({f"{i}-{j}": [float(j)] for j in range(50)},))
+        for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Without a SQLite tier evicted vectors are simply gone
+    assert len(cache._memory) == 100
+    assert len(cache.get_many(f"{i}-{j}" for i in range(4) for j in range(50))) == 100
+    assert cache.stats()['misses'] == 100
+
+
+if __name__ == "__main__":
+    test_cache_key_normalization()
+    test_embedding_cache_round_trip()
+    test_memory_only_cache()
@@ -0,0 +1,143 @@
+import asyncio
+import sys
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.embedding_cache import EmbeddingCache
+from src.services.embedding_service import EmbeddingService
+
+
+class WordTokenizer:
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+class FakeEmbeddingsClient:
+    """Embeds a text as [number of words, number of characters]; `on_request` can block or fail a request"""
+
+    def __init__(self, on_request=None):
+        self.requests = []
+        self.on_request = on_request
+        self.embeddings = SimpleNamespace(create=self.create)
+
+    def create(self, input, model, **kwargs):
+        self.requests.append(list(input))
+        if self.on_request:
+            self.on_request(list(input))
+        # Results don't have to come back in input order
+        data = [
+            SimpleNamespace(index=index, embedding=[float(len(text.split())), float(len(text))])
+            for index, text in reversed(list(enumerate(input)))
+        ]
+        return SimpleNamespace(data=data, usage=SimpleNamespace(total_tokens=sum(len(t.split()) for t in input)))
+
+
+class ThreadRecordingCache(EmbeddingCache):
+    """In-memory cache remembering which threads it was used from"""
+
+    def __init__(self):
+        super().__init__(path=None)
+        self.threads = set()
+
+    def get_many(self, keys):
+        self.threads.add(threading.current_thread().name)
+        return super().get_many(keys)
+
+    def put_many(self, items):
+        self.threads.add(threading.current_thread().name)
+        super().put_many(items)
+
+
+def make_service(client, **options):
+    return EmbeddingService(client=client, cache=ThreadRecordingCache(), tokenizer=WordTokenizer(), **options)
+
+
+def test_embedding_batches_and_order():
+    client = FakeEmbeddingsClient()
+    service = make_service(client, max_batch_tokens=8, max_batch_inputs=3)
+    texts = [f"text number {i} here" for i in range(7)]
+
+    async def run():
+        embeddings = await service.embed_texts(texts)
+        return embeddings, threading.current_thread().name
+
+    embeddings, loop_thread = asyncio.run(run())
+    # Four words per text: the token budget allows two texts per request
+    assert [len(inputs) for inputs in client.requests] == [2, 2, 2, 1]
+    assert embeddings == [[4.0, float(len(text))] for text in texts]
+    # Cache lookups and writes stay off the event loop
+    assert service.cache.threads and loop_thread not in service.cache.threads
+
+    # The input count limit applies too
+    client = FakeEmbeddingsClient()
+    asyncio.run(make_service(client, max_batch_inputs=3).embed_texts(texts))
+    assert [len(inputs) for inputs in client.requests] == [3, 3, 1]
+
+
+def test_embedding_dedup_and_cache():
+    client = FakeEmbeddingsClient()
+    service = make_service(client)
+    texts = ["refund policy", "refund  policy ", "opening hours", "refund policy"]
+
+    embeddings = asyncio.run(service.embed_texts(texts))
+    # Texts that normalize to the same cache key are sent once
+    assert client.requests == [["refund policy", "opening hours"]]
+    assert embeddings[0] == embeddings[1] == embeddings[3] == [2.0, 13.0]
+
+    # Cached texts are never sent again; only the new one is
+    embeddings = asyncio.run(service.embed_texts(["opening hours", "holiday schedule", "refund policy"]))
+    assert client.requests[1:] == [["holiday schedule"]]
+    assert embeddings == [[2.0, 13.0], [2.0, 16.0], [2.0, 13.0]]
+    stats = service.cache.stats()
+    assert stats['memory_hits'] == 2 and stats['misses'] == 3
+
+    assert asyncio.run(service.embed_texts([])) == []
+
+
+def test_embedding_partial_failure():
+    slow_started = threading.Event()
+    release = threading.Event()
+
+    def on_request(inputs):
+        # "a" completes, freeing its slot for "c"; "b" fails while "c" is in flight
+        if inputs[0].startswith("b"):
+            slow_started.wait(5)
+            raise ValueError("input rejected")
+        if inputs[0].startswith("c"):
+            slow_started.set()
+            release.wait(5)
+
+    client = FakeEmbeddingsClient(on_request)
+    service = make_service(client, max_batch_inputs=1, max_concurrent_batches=2)
+    texts = ["a ok", "b bad", "c slow", "d never", "e never"]
+
+    async def run():
+        try:
+            await service.embed_texts(texts)
+        finally:
+            # Let the cancelled request's worker thread finish
+            release.set()
+
+    try:
+        asyncio.run(run())
+        raise AssertionError("expected the batch failure to be raised")
+    except ValueError:
+        pass
+
+    # Batches queued behind the failure were cancelled instead of being sent
+    assert [inputs[0] for inputs in client.requests] == ["a ok", "b bad", "c slow"]
+    # The batch that completed before the failure is cached and not sent again
+    client.on_request = None
+    asyncio.run(service.embed_texts(["a ok"]))
+    assert len(client.requests) == 3
+
+
+if __name__ == "__main__":
+    test_embedding_batches_and_order()
+    test_embedding_dedup_and_cache()
+    test_embedding_partial_failure()
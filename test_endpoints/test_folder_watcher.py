@@ -0,0 +1,143 @@
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.folder_watcher import FolderWatcher
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the test advances it"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def test_debounce_and_settle():
+    with tempfile.TemporaryDirectory() as tmp:
+        recording = Path(tmp) / "call.wav"
+        recording.write_bytes(b"RIFF")
+        clock = FakeClock()
+        watcher = FolderWatcher([tmp], handler=lambda path: None, settle_seconds=5, clock=clock)
+
+        watcher._mark_pending(recording)
+        assert watcher._collect_settled() == []
+
+        # Still being written: every change restarts the settle timer
+        clock.advance(4)
+        with recording.open('ab') as f:
+            f.write(b"more audio")
+        assert watcher._collect_settled() == []
+        clock.advance(4)
+        assert watcher._collect_settled() == []
+
+        clock.advance(1)
+        assert watcher._collect_settled() == [recording]
+        assert watcher._pending == {}
+
+        # Files that disappear before settling are dropped
+        watcher._mark_pending(recording)
+        recording.unlink()
+        assert watcher._collect_settled() == []
+        assert watcher._pending == {}
+
+
+def test_folder_watcher_polling():
+    with tempfile.TemporaryDirectory() as tmp:
+        inbox = Path(tmp) / "inbox"
+        archive = Path(tmp) / "archive"
+        inbox.mkdir()
+        archive.mkdir()
+        (inbox / "old.wav").write_bytes(b"already here")
+        handled = []
+
+        def handler(path):
+            handled.append(path.name)
+            if path.name == "broken.wav":
+                return SimpleNamespace(success=False, message="unreadable")
+            path.rename(archive / path.name)
+            return SimpleNamespace(success=True)
+
+        clock = FakeClock()
+        watcher = FolderWatcher([inbox], handler, settle_seconds=5, clock=clock)
+
+        async def tick(seconds=0):
+            # One pass of the polling loop, waiting for the files it dispatched
+            clock.advance(seconds)
+            watcher._tick(scan=True)
+            await asyncio.gather(*watcher._tasks)
+
+        async def scenario():
+            watcher._semaphore = asyncio.Semaphore(watcher.max_concurrency)
+            watcher._remember_existing()
+
+            # A recording written in several parts is handed over once, after it settles
+            recording = inbox / "new.wav"
+            for part in range(4):
+                with recording.open('ab') as f:
+                    f.write(b"x" * (part + 1))
+                await tick(2)
+            assert handled == []
+            (inbox / "broken.wav").write_bytes(b"???")
+            await tick(4)
+            assert handled == []
+            await tick(1)
+            assert handled == ["new.wav"]
+            await tick(5)
+            assert handled == ["new.wav", "broken.wav"]
+
+            # A failed file isn't retried until it changes
+            await tick(60)
+            assert handled.count("broken.wav") == 1
+            (inbox / "broken.wav").write_bytes(b"fixed audio")
+            await tick()
+            await tick(5)
+            assert handled.count("broken.wav") == 2
+
+        asyncio.run(scenario())
+        assert "old.wav" not in handled
+        assert (archive / "new.wav").read_bytes() == b"x" * 10
+        assert watcher.processed_count == 1 and watcher.failed_count == 2
+
+        # Archived files aren't remembered; files that are still there are until they go away
+        assert set(watcher._seen) == {inbox / "old.wav", inbox / "broken.wav"}
+        (inbox / "old.wav").unlink()
+        watcher._prune_seen()
+        assert set(watcher._seen) == {inbox / "broken.wav"}
+
+
+def test_folder_watcher_run():
+    with tempfile.TemporaryDirectory() as tmp:
+        (Path(tmp) / "call.wav").write_bytes(b"RIFF")
+
+        async def scenario():
+            handled = asyncio.Event()
+            loop = asyncio.get_running_loop()
+
+            def handler(path):
+                loop.call_soon_threadsafe(handled.set)
+                return SimpleNamespace(success=True)
+
+            watcher = FolderWatcher([tmp], handler, settle_seconds=0, poll_interval=0.01, use_inotify=False)
+            task = asyncio.create_task(watcher.run())
+            await asyncio.wait_for(handled.wait(), timeout=5)
+            watcher.stop()
+            await asyncio.wait_for(task, timeout=5)
+            return watcher
+
+        watcher = asyncio.run(scenario())
+        assert watcher.processed_count == 1 and watcher._tasks == set()
+
+
+if __name__ == "__main__":
+    test_debounce_and_settle()
+    test_folder_watcher_polling()
+    test_folder_watcher_run()
@@ -0,0 +1,168 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.call_feed import CallWorkerPool, IteratorCallSource, LocalCallSource, PollingCallSource
+
+
+def test_follow_mode():
+    async def run():
+        source = LocalCallSource()
+        started = []
+        finished = []
+        max_in_flight = 0
+
+        async def handler(call):
+            nonlocal max_in_flight
+            started.append(call['id'])
+            max_in_flight = max(max_in_flight, pool.in_flight)
+            await asyncio.sleep(0.05)
+            finished.append(call['id'])
+            return {'success': True, 'call_id': call['id']}
+
+        pool = CallWorkerPool(handler, concurrency=2)
+        task = asyncio.create_task(pool.run(source))
+
+        for i in range(4):
+            source.publish({'id': f"call-{i}", 'recording_url': '', 'organization_id': 'org'})
+        # Duplicate notification for a call that is already queued
+        source.publish({'id': 'call-0', 'recording_url': '', 'organization_id': 'org'})
+
+        await asyncio.sleep(0.3)
+        source.publish({'id': 'call-late', 'recording_url': '', 'organization_id': 'org'})
+        await asyncio.sleep(0.01)
+
+        # Stopping while call-late is in flight must wait for it to finish
+        pool.stop()
+        results = await task
+
+        assert sorted(started) == sorted(finished)
+        assert started.count('call-0') == 1
+        assert 'call-late' in finished
+        assert max_in_flight <= 2
+        assert all(r['success'] for r in results)
+
+    asyncio.run(run())
+    print("Follow mode worker pool test passed")
+
+
+def test_backlog_stream():
+    async def run():
+        async def pages():
+            # Simulates the paginated backlog fetch yielding across several pages
+            for page in range(3):
+                await asyncio.sleep(0.01)
+                for i in range(5):
+                    yield {'id': f"call-{page}-{i}", 'recording_url': '', 'organization_id': 'org'}
+
+        processed = []
+
+        async def handler(call):
+            processed.append(call['id'])
+            return {'success': True, 'call_id': call['id']}
+
+        pool = CallWorkerPool(handler, concurrency=3)
+        results = await pool.run(IteratorCallSource(pages()), stop_when_exhausted=True)
+
+        assert len(results) == 15
+        assert len(set(processed)) == 15
+
+    asyncio.run(run())
+    print("Backlog stream test passed")
+
+
+def keyset_fetch(unprocessed, page_size):
+    """Blocking fetch over a dict of unprocessed calls, paged like CallProcessor._fetch_calls_page"""
+    def fetch(after):
+        rows = sorted(unprocessed.values(), key=lambda call: (call['created_at'], call['id']))
+        if after is not None:
+            rows = [call for call in rows if (call['created_at'], call['id']) > after]
+        return rows[:page_size]
+    return fetch
+
+
+def test_polling_retries_failed_calls():
+    async def run():
+        unprocessed = {
+            'call-ok': {'id': 'call-ok', 'created_at': '2024-01-01T10:00:00'},
+            'call-flaky': {'id': 'call-flaky', 'created_at': '2024-01-01T10:00:00'},
+        }
+        attempts = []
+
+        async def handler(call):
+            attempts.append(call['id'])
+            if call['id'] == 'call-flaky' and attempts.count('call-flaky') < 3:
+                return {'success': False, 'call_id': call['id'], 'error': "transcription failed"}
+            unprocessed.pop(call['id'])
+            return {'success': True, 'call_id': call['id']}
+
+        source = PollingCallSource(keyset_fetch(unprocessed, 500), interval=0.01, retry_delay=0.05)
+        pool = CallWorkerPool(handler, concurrency=2)
+        task = asyncio.create_task(pool.run(source))
+        await asyncio.sleep(0.5)
+        pool.stop()
+        results = await task
+
+        # The failed call is offered again, with a growing delay, until it succeeds
+        assert attempts.count('call-ok') == 1
+        assert attempts.count('call-flaky') == 3
+        assert not unprocessed
+        assert [r['success'] for r in results if r['call_id'] == 'call-flaky'] == [False, False, True]
+
+    asyncio.run(run())
+    print("Polling retry test passed")
+
+
+def test_polling_pages_past_failing_calls():
+    async def run():
+        # More stuck calls than fit in a page, all older than the new call
+        unprocessed = {
+            f"stuck-{i}": {'id': f"stuck-{i}", 'created_at': f"2024-01-01T10:00:0{i}"} for i in range(6)
+        }
+        attempts = []
+
+        async def handler(call):
+            attempts.append(call['id'])
+            if call['id'].startswith('stuck'):
+                return {'success': False, 'call_id': call['id'], 'error': "recording missing"}
+            unprocessed.pop(call['id'])
+            return {'success': True, 'call_id': call['id']}
+
+        source = PollingCallSource(keyset_fetch(unprocessed, 3), interval=0.02, retry_delay=10, page_size=3)
+        pool = CallWorkerPool(handler, concurrency=2)
+        task = asyncio.create_task(pool.run(source))
+        await asyncio.sleep(0.1)
+        unprocessed['new'] = {'id': 'new', 'created_at': '2024-01-02T09:00:00'}
+        await asyncio.sleep(0.1)
+
+        # The stuck calls drop off the first page as others are inserted before them,
+        # and keep their backoff when they come back
+        unprocessed['older'] = {'id': 'older', 'created_at': '2023-12-31T09:00:00'}
+        await asyncio.sleep(0.1)
+        pool.stop()
+        await task
+
+        assert 'new' in attempts and 'older' in attempts
+        assert all(attempts.count(f"stuck-{i}") == 1 for i in range(6))
+        assert len(source._emitted) == 8
+
+        # Retry state is bounded, least recently seen first, and expires for calls no poll sees
+        source = PollingCallSource(keyset_fetch({}, 3), max_tracked=3, state_ttl=60)
+        for call_id in ('a', 'b', 'c', 'a', 'd'):
+            source._due(call_id)
+            source._prune()
+        assert list(source._emitted) == ['c', 'a', 'd']
+        source.state_ttl = 0
+        source._prune()
+        assert not source._emitted
+
+    asyncio.run(run())
+    print("Polling cursor test passed")
+
+
+if __name__ == "__main__":
+    test_follow_mode()
+    test_backlog_stream()
+    test_polling_retries_failed_calls()
+    test_polling_pages_past_failing_calls()
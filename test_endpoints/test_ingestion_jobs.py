@@ -0,0 +1,114 @@
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.ingestion_jobs import IngestionJobManager, COMPLETED, FAILED, RUNNING
+
+
+async def wait_for(manager, job_id, status):
+    for _ in range(200):
+        job = manager.get(job_id)
+        if job['status'] == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job never reached {status}: {job}")
+
+
+def test_ingestion_jobs():
+    uploads = []
+    ingest_attempts = []
+
+    async def upload(file_path, filename):
+        uploads.append(filename)
+        return {'success': True, 'file_url': f"https://storage/{filename}"}
+
+    async def ingest(file_path, metadata, progress):
+        ingest_attempts.append(metadata)
+        progress({'pages_total': 2, 'pages_done': 1})
+        if len(ingest_attempts) == 1:
+            raise RuntimeError("embedding provider unavailable")
+        return {'document_id': 'doc-1', 'pages_total': 2, 'pages_done': 2, 'chunks_stored': 7}
+
+    async def run():
+        with tempfile.TemporaryDirectory() as spool_dir:
+            manager = IngestionJobManager(spool_dir=spool_dir, upload=upload, ingest=ingest)
+            await manager.start()
+            job = await manager.submit(b"hello", "manual.txt", {'title': 'Manual'})
+
+            failed = await wait_for(manager, job['id'], FAILED)
+            assert failed['stage'] == 'ingest' and 'unavailable' in failed['error']
+
+            await manager.retry(job['id'])
+            completed = await wait_for(manager, job['id'], COMPLETED)
+            await manager.stop()
+
+            # The upload stage is not repeated on retry and the spooled file is cleaned up
+            assert uploads == ['manual.txt']
+            assert ingest_attempts[-1]['source_url'] == "https://storage/manual.txt"
+            assert completed['document_id'] == 'doc-1' and completed['attempts'] == 2
+            assert not (Path(spool_dir) / job['id'] / 'manual.txt').exists()
+
+            # Job records survive a restart
+            reloaded = IngestionJobManager(spool_dir=spool_dir, upload=upload, ingest=ingest)
+            await reloaded.start()
+            assert reloaded.get(job['id'])['status'] == COMPLETED
+            await reloaded.stop()
+            return completed
+
+    completed = asyncio.run(run())
+    print("Job:", completed)
+
+
+def test_ingestion_jobs_shared_spool():
+    ingested = []
+
+    async def upload(file_path, filename):
+        return {'success': True, 'file_url': f"https://storage/{filename}"}
+
+    async def run():
+        release = asyncio.Event()
+
+        async def ingest(file_path, metadata, progress):
+            ingested.append(metadata['title'])
+            await release.wait()
+            return {'document_id': 'doc-1'}
+
+        def manager(**options):
+            return IngestionJobManager(spool_dir=spool_dir, upload=upload, ingest=ingest, scan_interval=0.05, **options)
+
+        with tempfile.TemporaryDirectory() as spool_dir:
+            first = manager()
+            await first.start()
+            job = await first.submit(b"...", "manual.txt", {'title': 'Manual'})
+            await wait_for(first, job['id'], RUNNING)
+
+            # Other worker processes see the job but don't run it while it is held
+            second, third = manager(), manager(job_ttl=0.2)
+            await second.start()
+            await third.start()
+            assert second.get(job['id'])['status'] == RUNNING
+            await asyncio.sleep(0.15)
+            assert ingested == ['Manual']
+
+            # When its process goes away, exactly one of the others resumes it
+            await first.stop()
+            release.set()
+            await wait_for(second, job['id'], COMPLETED)
+            await asyncio.sleep(0.15)
+            assert ingested == ['Manual', 'Manual']
+
+            # Finished jobs are deleted after their TTL
+            await asyncio.sleep(0.3)
+            assert second.get(job['id']) is None
+            assert not (Path(spool_dir) / job['id']).exists()
+            await second.stop()
+            await third.stop()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_ingestion_jobs()
+    test_ingestion_jobs_shared_spool()
@@ -0,0 +1,103 @@
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.models.document_models import DocumentMetadata
+from src.services.ingestion_pipeline import IngestionPipeline
+from src.services.text_chunker import TextChunker
+
+
+class WordTokenizer:
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+class FakeEmbeddingService:
+    def __init__(self, fail_on_batch=None):
+        self.batches = 0
+        self.fail_on_batch = fail_on_batch
+
+    async def embed_texts(self, texts):
+        self.batches += 1
+        if self.batches == self.fail_on_batch:
+            raise RuntimeError("embedding provider unavailable")
+        await asyncio.sleep(0.01)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.documents = {}
+        self.chunks = []
+        self.deleted = []
+
+    async def create_document(self, metadata):
+        document_id = f"doc-{len(self.documents) + 1}"
+        self.documents[document_id] = metadata
+        return document_id
+
+    async def store_chunks(self, document_id, title, chunks, embeddings):
+        assert len(chunks) == len(embeddings)
+        self.chunks.extend((document_id, chunk) for chunk in chunks)
+
+    async def delete_document(self, document_id):
+        self.deleted.append(document_id)
+        self.chunks = [(doc, chunk) for doc, chunk in self.chunks if doc != document_id]
+
+
+def test_ingestion_pipeline():
+    sentences = " ".join(f"Sentence number {i} of the manual." for i in range(40))
+    metadata = DocumentMetadata(title="Manual", file_type="txt", file_size=0, category="guides")
+
+    async def run(embedding_service, vector_store, file_path, progress):
+        processor = SimpleNamespace(
+            chunker=TextChunker(chunk_size=12, chunk_overlap=0, tokenizer=WordTokenizer()),
+            embedding_service=embedding_service,
+        )
+        pipeline = IngestionPipeline(processor, vector_store, embed_batch_size=4, store_batch_size=6, progress=progress)
+        return await pipeline.run(file_path, metadata)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = str(Path(tmp) / "manual.txt")
+        Path(file_path).write_text(sentences, encoding="utf-8")
+
+        progress = []
+        vector_store = FakeVectorStore()
+        result = asyncio.run(run(FakeEmbeddingService(), vector_store, file_path, progress.append))
+
+        # Every chunk is embedded and stored once, numbered from 1 in document order
+        assert result['document_id'] == 'doc-1'
+        assert result['chunks_created'] == result['chunks_embedded'] == result['chunks_stored'] == 20
+        numbers = [chunk.chunk_number for _, chunk in vector_store.chunks]
+        assert sorted(numbers) == list(range(1, 21))
+        assert progress[-1]['chunks_stored'] == 20 and progress[-1]['pages_done'] == 1
+
+        # A failing stage cancels the others and removes the partly stored document
+        vector_store = FakeVectorStore()
+        try:
+            asyncio.run(run(FakeEmbeddingService(fail_on_batch=3), vector_store, file_path, None))
+            raise AssertionError("expected the ingestion to fail")
+        except RuntimeError as e:
+            assert "unavailable" in str(e)
+        assert vector_store.deleted == ['doc-1'] and vector_store.chunks == []
+
+        # Unsupported files fail in the extract stage and are cleaned up the same way
+        other = Path(tmp) / "manual.xls"
+        other.write_bytes(b"...")
+        vector_store = FakeVectorStore()
+        try:
+            asyncio.run(run(FakeEmbeddingService(), vector_store, str(other), None))
+            raise AssertionError("expected the ingestion to fail")
+        except ValueError:
+            pass
+        assert vector_store.deleted == ['doc-1']
+
+
+if __name__ == "__main__":
+    test_ingestion_pipeline()
@@ -0,0 +1,83 @@
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+from test_endpoints.fake_supabase import FakeSupabase
+
+
+def test_lexical_index():
+    # Diacritics, alef/ta-marbuta variants, the definite article and Arabic-Indic digits are folded
+    assert tokenize("الْفَاتُورَة") == tokenize("فاتوره")
+    assert tokenize("إلغاء") == tokenize("الغاء")
+    assert tokenize("باقة ٢٥٠") == tokenize("باقه 250")
+    assert "plan250" in tokenize("PLAN-250")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LexicalIndex(str(Path(tmp) / 'lexical.sqlite3'))
+        index.ready = True
+        index.add_chunks('doc-1', 'Plans', [
+            {'id': 'c1', 'content': "باقة الذهبية PLAN-250 تشمل ٥٠ جيجا", 'page_number': 1, 'chunk_number': 1},
+            {'id': 'c2', 'content': "يمكن إلغاء الاشتراك في أي وقت", 'page_number': 1, 'chunk_number': 2},
+            {'id': 'c3', 'content': "Refunds are processed within five days", 'page_number': 2, 'chunk_number': 3},
+        ])
+
+        assert [hit['id'] for hit in index.search("plan-250", 3)] == ['c1']
+        assert index.search("كيف ألغي الإشتراك", 3)[0]['id'] == 'c2'
+        assert index.search("refunds", 3)[0]['source'] == 'Plans'
+
+        index.remove_chunks(['c1'])
+        assert index.search("PLAN-250", 3) == []
+        assert index.stats()['chunks'] == 2
+
+    vector = [{'id': 'a', 'similarity': 0.9}, {'id': 'b', 'similarity': 0.8}]
+    lexical = [{'id': 'b', 'bm25': 7.0}, {'id': 'c', 'bm25': 5.0}]
+    fused = reciprocal_rank_fusion([vector, lexical], limit=3)
+    assert [hit['id'] for hit in fused] == ['b', 'a', 'c']
+    assert fused[0]['similarity'] == 0.8 and fused[0]['bm25'] == 7.0
+    print("Fused:", [(hit['id'], round(hit['rrf_score'], 4)) for hit in fused])
+
+
+def test_lexical_index_reconcile():
+    def chunk(chunk_id, content, chunk_number):
+        return {'id': chunk_id, 'document_id': 'doc-1', 'content': content,
+                'page_number': 1, 'chunk_number': chunk_number}
+
+    supabase = FakeSupabase({
+        'documents': [{'id': 'doc-1', 'title': 'Billing'}],
+        'document_chunks': [
+            chunk('c1', "refunds take five days", 0),
+            chunk('c2', "invoices are sent monthly", 1),
+            chunk('c3', "late fees apply after thirty days", 2),
+        ],
+    })
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'lexical.sqlite3')
+        LexicalIndex(path).load_or_build(supabase)
+
+        # The database changes while this process isn't running
+        chunks = supabase.tables['document_chunks']
+        supabase.tables['document_chunks'] = [row for row in chunks if row['id'] != 'c2']
+        supabase.tables['document_chunks'].append(chunk('c4', "cancel the contract online", 3))
+        supabase.tables['document_chunks'][0]['chunk_number'] = 5
+
+        restarted = LexicalIndex(path)
+        restarted.load_or_build(supabase)
+        assert restarted.search("invoices", 3) == []
+        assert restarted.search("cancel contract", 3)[0]['id'] == 'c4'
+        assert restarted.search("refunds", 3)[0]['chunk_number'] == 5
+
+        # Writes made during a sync are replayed afterwards instead of being dropped
+        restarted._begin_sync()
+        restarted.add_chunks('doc-1', 'Billing', [chunk('c5', "roaming charges abroad", 4)])
+        restarted.remove_chunks(['c3'])
+        assert restarted.search("roaming", 3) == []
+        restarted._end_sync()
+        assert restarted.search("roaming", 3)[0]['id'] == 'c5'
+        assert restarted.search("late fees", 3) == []
+
+
+if __name__ == "__main__":
+    test_lexical_index()
+    test_lexical_index_reconcile()
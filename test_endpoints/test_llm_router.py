@@ -0,0 +1,109 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from openai import AsyncOpenAI
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.utils.llm_router import CircuitBreaker, LLMRouter
+from src.utils.provider_limiter import get_provider_limiter
+
+
+class FakeProvider(AsyncOpenAI):
+    """Async chat completions that take `latency` seconds and answer with the model name"""
+
+    def __init__(self, base_url, latency=0.0, fail=False):
+        super().__init__(base_url=base_url, api_key="test", max_retries=0)
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise ValueError("provider down")
+        message = SimpleNamespace(content=kwargs["model"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def answer(response):
+    return response.choices[0].message.content
+
+
+def test_llm_router():
+    openrouter = FakeProvider("https://openrouter.ai/api/v1")
+    openai = FakeProvider("https://api.openai.com/v1")
+    providers = {"openrouter": openrouter, "openai": openai}
+
+    def resolve(route):
+        provider, _, model = route.partition(":")
+        return providers[provider], model
+
+    router = LLMRouter(min_samples=3, default_delay=0.1, resolve=resolve, min_requests=2, cooldown=0.2)
+    routes = ["openrouter:gpt-4o", "openai:gpt-4o-mini"]
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def scenario():
+        # Fast primary: no hedge
+        assert answer(await router.complete("summary", routes, 95, messages=messages)) == "gpt-4o"
+        assert openai.calls == 0
+
+        # Slow primary: the hedge to the second provider wins once the delay passes
+        openrouter.latency = 0.5
+        started = time.monotonic()
+        assert answer(await router.complete("summary", routes, 95, messages=messages)) == "gpt-4o-mini"
+        assert time.monotonic() - started < 0.4
+        assert router.stats()["hedge_wins"] == 1
+        # The losing request is aborted rather than left running, and its limiter slot is freed
+        await asyncio.sleep(0)
+        assert openrouter.cancelled == 1
+        assert get_provider_limiter("openrouter").concurrency.in_flight == 0
+
+        # Without a hedge percentile a slow primary is waited for
+        openrouter.latency = 0.0
+        assert answer(await router.complete("summary", routes, None, messages=messages)) == "gpt-4o"
+
+        # A failing primary fails over, and repeated failures open its breaker
+        openrouter.fail = True
+        for _ in range(2):
+            assert answer(await router.complete("summary", routes, 95, messages=messages)) == "gpt-4o-mini"
+        assert router.breaker("openrouter").state == "open"
+        calls = openrouter.calls
+        assert answer(await router.complete("summary", routes, 95, messages=messages)) == "gpt-4o-mini"
+        assert openrouter.calls == calls
+
+        # After the cooldown one trial request closes it again
+        openrouter.fail = False
+        await asyncio.sleep(0.25)
+        assert answer(await router.complete("summary", routes, 95, messages=messages)) == "gpt-4o"
+        assert router.breaker("openrouter").state == "closed"
+
+    asyncio.run(scenario())
+
+    stats = router.stats()
+    assert stats["failovers"] == 2 and stats["breaker_skips"] == 1
+    assert stats["breakers"]["openrouter"]["opened"] == 1
+    print("LLM routing:", stats)
+
+    # Only one caller gets the half-open trial, and cancelling it frees the slot
+    breaker = CircuitBreaker(min_requests=1, cooldown=0)
+    breaker.record(False)
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.abandon()
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed" and breaker.allow()
+
+
+if __name__ == "__main__":
+    test_llm_router()
@@ -0,0 +1,54 @@
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.local_vector_index import LocalVectorIndex
+from test_endpoints.fake_supabase import FakeSupabase
+
+
+def chunk(chunk_id, vector, chunk_number):
+    return {'id': chunk_id, 'document_id': 'doc-1', 'content': f"chunk {chunk_id}",
+            'page_number': 1, 'chunk_number': chunk_number, 'embedding': vector}
+
+
+def test_local_vector_index():
+    supabase = FakeSupabase({
+        'documents': [{'id': 'doc-1', 'title': 'Refunds'}],
+        'document_chunks': [
+            chunk('c1', [1, 0, 0, 0], 0),
+            chunk('c2', [0, 1, 0, 0], 1),
+            chunk('c3', [0, 0, 1, 0], 2),
+        ],
+    })
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LocalVectorIndex(index_dir=tmp, index_type='hnsw')
+        index.load_or_build(supabase)
+        assert index.search([1, 0, 0, 0], 1)[0]['id'] == 'c1'
+
+        # Another instance changes the chunks directly in the database
+        chunks = supabase.tables['document_chunks']
+        supabase.tables['document_chunks'] = [row for row in chunks if row['id'] != 'c2']
+        supabase.tables['document_chunks'].append(chunk('c4', [0, 0, 0, 1], 3))
+        supabase.tables['document_chunks'][0]['chunk_number'] = 5
+
+        # A restart loads the persisted index and reconciles it with the database
+        restarted = LocalVectorIndex(index_dir=tmp, index_type='hnsw')
+        restarted.load_or_build(supabase)
+        assert restarted.search([0, 0, 0, 1], 1)[0]['id'] == 'c4'
+        assert all(hit['id'] != 'c2' for hit in restarted.search([0, 1, 0, 0], 4))
+        assert restarted.search([1, 0, 0, 0], 1)[0]['chunk_number'] == 5
+        assert restarted.stats()['live_chunks'] == 3
+
+        # Changes made while a sync runs are replayed once it finishes
+        restarted._begin_sync()
+        restarted.add_chunks('doc-1', 'Refunds', [chunk('c5', [1, 1, 0, 0], 4)])
+        restarted.remove_chunks(['c3'])
+        assert restarted.stats()['live_chunks'] == 3
+        restarted._end_sync()
+        assert restarted.search([1, 1, 0, 0], 1)[0]['id'] == 'c5'
+        assert all(hit['id'] != 'c3' for hit in restarted.search([0, 0, 1, 0], 4))
+
+
+if __name__ == "__main__":
+    test_local_vector_index()
@@ -0,0 +1,150 @@
+import asyncio
+import functools
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+import httpx
+from postgrest.exceptions import APIError
+
+from src.utils.provider_limiter import AIMDLimiter, ProviderLimiter, TokenBucket, _is_retryable, _retry_after, _status_code
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_token_bucket_refill():
+    bucket = TokenBucket(rate_per_minute=600, capacity=10)
+    assert bucket.reserve(10) == 0.0
+    # Empty: the next token arrives after 1/10 s
+    assert abs(bucket.reserve(1) - 0.1) < 0.02
+    time.sleep(0.3)
+    assert 1.5 < bucket.available < 2.5
+    # Corrections for real usage can't overfill the bucket
+    bucket.adjust(-100)
+    assert bucket.available == 10
+
+
+def test_aimd_limiter():
+    limiter = AIMDLimiter(initial_limit=8, max_limit=16)
+    limiter.acquire()
+    limiter.release(0.1)
+    assert limiter.limit == 8 + 1 / 8
+
+    # 429s from one round trip halve the limit once
+    for _ in range(3):
+        limiter.acquire()
+    for _ in range(3):
+        limiter.release(0.1, overloaded=True)
+    assert abs(limiter.limit - (8 + 1 / 8) / 2) < 1e-9
+    assert limiter.in_flight == 0
+
+
+def test_retry_after_parsing():
+    assert _retry_after(StatusError(429, {'retry-after': '2'})) == 2.0
+    assert _retry_after(StatusError(429, {'retry-after-ms': '1500'})) == 1.5
+    assert _retry_after(StatusError(429, {'retry-after': 'Wed, 21 Oct 2015 07:28:00 GMT'})) == 0.0
+    # Malformed dates fall back to the normal backoff instead of raising
+    assert _retry_after(StatusError(429, {'retry-after': 'soon'})) is None
+    assert _retry_after(StatusError(429)) is None
+
+
+def test_error_classification():
+    # PostgREST errors carry a SQLSTATE or PGRST code instead of a status
+    assert _status_code(APIError({'code': '23505', 'message': "duplicate key"})) == 409
+    assert _status_code(APIError({'code': 'PGRST003', 'message': "timed out acquiring connection"})) == 504
+    assert _status_code(APIError({'code': '42P01', 'message': "relation does not exist"})) == 400
+    # Responses that weren't JSON (e.g. from a gateway) carry the HTTP status as the code
+    assert _status_code(APIError({'code': 502, 'message': "JSON could not be generated"})) == 502
+
+    assert not _is_retryable(APIError({'code': '23505'}))
+    assert not _is_retryable(StatusError(409))
+    assert _is_retryable(APIError({'code': '57014', 'message': "canceling statement due to statement timeout"}))
+    assert _is_retryable(APIError({'code': '08006'}))
+    assert _is_retryable(httpx.ConnectError("connection refused"))
+    assert _is_retryable(httpx.RemoteProtocolError("server disconnected"))
+    assert not _is_retryable(ValueError("bad input"))
+
+    limiter = ProviderLimiter('test-postgrest', base_delay=0.01)
+    attempts = []
+
+    def write():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise APIError({'code': '53300', 'message': "too many connections"})
+        return 'ok'
+
+    assert limiter.call(write) == 'ok' and len(attempts) == 2
+
+    def conflict():
+        attempts.append(1)
+        raise APIError({'code': '23505', 'message': "duplicate key"})
+
+    try:
+        limiter.call(conflict)
+        raise AssertionError("expected the conflict to be raised")
+    except APIError:
+        pass
+    assert len(attempts) == 3
+
+
+def test_provider_limiter_async():
+    limiter = ProviderLimiter('test', initial_concurrency=2, max_concurrency=2, base_delay=0.01)
+    active = []
+    peak = []
+
+    async def request(i):
+        active.append(i)
+        peak.append(len(active))
+        await asyncio.sleep(0.05)
+        active.remove(i)
+        return i
+
+    async def scenario():
+        threads_before = threading.active_count()
+        results = await asyncio.gather(*(limiter.acall(functools.partial(request, i)) for i in range(6)))
+        assert sorted(results) == list(range(6))
+        assert threads_before == threading.active_count()
+
+        # A throttled call is retried after backing off
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise StatusError(429, {'retry-after': '0'})
+            return 'ok'
+
+        assert await limiter.acall(flaky) == 'ok'
+        assert len(attempts) == 2
+
+        # A cancelled request frees its slot without changing the limit
+        limit = limiter.concurrency.limit
+        task = asyncio.ensure_future(limiter.acall(functools.partial(asyncio.sleep, 1)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert limiter.concurrency.in_flight == 0 and limiter.concurrency.limit == limit
+
+        # Blocking calls still run in a worker thread
+        assert await limiter.acall(lambda: threading.current_thread().name) != threading.current_thread().name
+
+    asyncio.run(scenario())
+    assert max(peak) <= 2
+    stats = limiter.metrics()
+    assert stats['throttled'] == 1 and stats['retries'] == 1
+    print("Limiter:", stats)
+
+
+if __name__ == "__main__":
+    test_token_bucket_refill()
+    test_aimd_limiter()
+    test_retry_after_parsing()
+    test_error_classification()
+    test_provider_limiter_async()
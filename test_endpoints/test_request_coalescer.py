@@ -0,0 +1,63 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.models.models import ProcessingSettings
+from src.services.request_coalescer import RequestCoalescer, request_fingerprint
+
+
+def test_request_coalescer():
+    settings = ProcessingSettings()
+    assert request_fingerprint("summarize", {"request": settings}) == request_fingerprint("summarize", {"request": ProcessingSettings()})
+    assert request_fingerprint("summarize", {"request": settings}) != request_fingerprint("details", {"request": settings})
+
+    async def scenario():
+        coalescer = RequestCoalescer()
+        calls = []
+
+        async def summarize(call_id):
+            calls.append(call_id)
+            await asyncio.sleep(0.05)
+            return {"summary": f"summary {call_id}"}
+
+        # Five tabs asking for the same summary at once share one upstream call
+        results = await asyncio.gather(*[
+            coalescer.run("summarize", "call-1", lambda i=i: summarize(i)) for i in range(5)
+        ])
+        assert calls == [0] and all(result == {"summary": "summary 0"} for result in results)
+
+        # Once finished, the next identical request runs again; different keys never share
+        await asyncio.gather(
+            coalescer.run("summarize", "call-1", lambda: summarize(5)),
+            coalescer.run("summarize", "call-2", lambda: summarize(6)),
+        )
+        assert calls == [0, 5, 6]
+
+        # Errors reach every waiter, and a cancelled waiter doesn't cancel the shared run
+        async def failing():
+            await asyncio.sleep(0.05)
+            raise ValueError("upstream failed")
+
+        waiters = [asyncio.ensure_future(coalescer.run("details", "call-1", failing)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        waiters[0].cancel()
+        outcomes = await asyncio.gather(*waiters, return_exceptions=True)
+        assert isinstance(outcomes[0], asyncio.CancelledError)
+        assert all(isinstance(outcome, ValueError) for outcome in outcomes[1:])
+
+        stats = coalescer.stats()
+        assert stats["summarize"]["requests"] == 7 and stats["summarize"]["upstream"] == 3
+        assert stats["summarize"]["coalesced"] == 4
+        assert stats["details"]["upstream"] == 1 and stats["details"]["errors"] == 1
+        assert stats["in_flight"] == 0
+        print("Request coalescing:", stats)
+
+        assert RequestCoalescer({"summarize"}).enabled("summarize")
+        assert not RequestCoalescer(set()).enabled("summarize")
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    test_request_coalescer()
@@ -0,0 +1,146 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.utils.openai_client import stream_chat_completion
+from src.utils.provider_limiter import get_provider_limiter
+from src.utils.sse import sse_response
+
+
+def chunk(text=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=text))] if text is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class FakeStream:
+    """
+    Blocking chat completion stream; `endless` keeps producing tokens until closed and
+    `hang` blocks the read after the texts until the event is set, whether closed or not
+    """
+
+    def __init__(self, texts, endless=False, fail=False, hang=None):
+        self.texts = texts
+        self.endless = endless
+        self.fail = fail
+        self.hang = hang
+        self.late_read = False
+        self.closed = False
+        self.reader_threads = set()
+
+    def __iter__(self):
+        self.reader_threads.add(threading.current_thread().name)
+        for text in self.texts:
+            time.sleep(0.01)
+            yield chunk(text)
+        if self.hang:
+            self.hang.wait(5)
+            self.late_read = True
+            yield chunk("late")
+        while self.endless and not self.closed:
+            time.sleep(0.01)
+            yield chunk("...")
+        if self.fail:
+            raise ConnectionError("upstream connection reset")
+        yield chunk(usage=SimpleNamespace(prompt_tokens=10, completion_tokens=3, total_tokens=13))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    base_url = "https://api.openai.com/v1"
+
+    def __init__(self, stream):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: stream))
+
+
+async def collect(response):
+    return ''.join([part async for part in response.body_iterator])
+
+
+def test_sse_response_framing():
+    async def events():
+        yield 'token', "مرحبا"
+        yield 'result', {'summary': "done"}
+
+    async def failing():
+        yield 'token', "partial"
+        raise RuntimeError("model unavailable")
+
+    response = sse_response(events())
+    assert response.media_type == "text/event-stream"
+    assert response.headers["x-accel-buffering"] == "no"
+    body = asyncio.run(collect(response))
+    assert body == 'event: token\ndata: "مرحبا"\n\nevent: result\ndata: {"summary": "done"}\n\n'
+
+    # Errors after the headers went out end the stream with an error event
+    body = asyncio.run(collect(sse_response(failing())))
+    assert body.endswith('event: error\ndata: {"detail": "model unavailable"}\n\n')
+
+
+def test_stream_chat_completion():
+    limiter = get_provider_limiter('openai')
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def run():
+        # The limiter slot is held while the stream is open and released when it ends
+        stream = FakeStream(["Hel", "lo"])
+        usage = []
+        texts = []
+        async for text in stream_chat_completion(FakeClient(stream), on_usage=usage.append, model="m", messages=messages):
+            texts.append(text)
+            assert limiter.concurrency.in_flight == 1
+        assert texts == ["Hel", "lo"] and usage[0].total_tokens == 13
+        assert limiter.concurrency.in_flight == 0
+        assert threading.current_thread().name not in stream.reader_threads
+
+        # A consumer that stops early closes the upstream stream and stops the reader thread
+        endless = FakeStream(["a"], endless=True)
+        threads = threading.active_count()
+        tokens = stream_chat_completion(FakeClient(endless), model="m", messages=messages)
+        async for _ in tokens:
+            break
+        await tokens.aclose()
+        assert endless.closed
+        assert limiter.concurrency.in_flight == 0
+        await asyncio.sleep(0.05)
+        assert threading.active_count() <= threads
+
+        # A read that close() doesn't interrupt keeps the slot only until close_timeout
+        hang = threading.Event()
+        stuck = FakeStream(["a"], hang=hang)
+        late_usage = []
+        tokens = stream_chat_completion(FakeClient(stuck), on_usage=late_usage.append, close_timeout=0.1,
+                                        model="m", messages=messages)
+        async for _ in tokens:
+            break
+        started = time.perf_counter()
+        await tokens.aclose()
+        assert time.perf_counter() - started < 1
+        assert stuck.closed and limiter.concurrency.in_flight == 0
+        # The reader thread is still blocked; once the read returns it stops at that chunk
+        assert not stuck.late_read
+        hang.set()
+        await asyncio.sleep(0.05)
+        assert stuck.late_read and late_usage == []
+
+        # Errors from the reader thread reach the consumer
+        broken = FakeStream(["a"], fail=True)
+        try:
+            async for _ in stream_chat_completion(FakeClient(broken), model="m", messages=messages):
+                pass
+            raise AssertionError("expected the stream to fail")
+        except ConnectionError:
+            pass
+        assert limiter.concurrency.in_flight == 0
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_sse_response_framing()
+    test_stream_chat_completion()
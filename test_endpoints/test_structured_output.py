@@ -0,0 +1,75 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.models.analysis_models import EventsResult, SegmentLabel
+from src.utils.structured_output import (
+    StructuredOutputError, create_structured_completion, extract_json, structured_output_metrics
+)
+
+
+class FakeClient:
+    """Answers chat completions with canned responses and keeps the requests it got"""
+    base_url = "https://api.openai.com/v1"
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        message = SimpleNamespace(content=self.responses.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def test_structured_output():
+    assert extract_json('```json\n{"label": null}\n```') == ({"label": None}, False)
+    assert extract_json('Sure! {"events": [],}') == ({"events": []}, True)
+
+    # A valid response is returned after one call, in JSON mode
+    client = FakeClient(['{"events": [{"actor": "agent", "action": "approved refund", "segment": 2}]}'])
+    result = asyncio.run(create_structured_completion(
+        client, EventsResult, stage="events", messages=[{"role": "user", "content": "events"}], model="test-ok"
+    ))
+    assert result.events[0].segment == 2
+    assert client.requests[0]["response_format"] == {"type": "json_object"}
+
+    # An invalid response is re-asked once, with the error, and only that call is repeated
+    client = FakeClient(['{"events": [{"actor": "agent"}]}', '{"events": []}'])
+    result = asyncio.run(create_structured_completion(
+        client, EventsResult, stage="events", messages=[{"role": "user", "content": "events"}], model="test-retry"
+    ))
+    assert result.events == [] and len(client.requests) == 2
+    reask = client.requests[1]["messages"]
+    assert reask[1] == {"role": "assistant", "content": '{"events": [{"actor": "agent"}]}'}
+    assert "action" in reask[2]["content"]
+
+    # Semantic checks count as validation failures; the budget bounds the re-asks
+    def check(result):
+        if result.label not in (None, "refund"):
+            raise ValueError(f"Unknown label {result.label!r}")
+
+    client = FakeClient(['{"label": "other"}', 'not json'])
+    try:
+        asyncio.run(create_structured_completion(
+            client, SegmentLabel, stage="label", messages=[{"role": "user", "content": "label"}],
+            check=check, max_attempts=2, model="test-fail"
+        ))
+        assert False, "expected StructuredOutputError"
+    except StructuredOutputError as e:
+        assert e.stage == "label" and e.raw == "not json"
+
+    metrics = structured_output_metrics()
+    assert metrics["test-ok"]["events"]["failure_rate"] == 0.0
+    assert metrics["test-retry"]["events"]["reasks"] == 1
+    assert metrics["test-retry"]["events"]["failure_rate"] == 0.5
+    failed = metrics["test-fail"]["label"]
+    assert failed["validation_failures"] == 1 and failed["parse_failures"] == 1 and failed["exhausted"] == 1
+    print("Structured output:", metrics)
+
+
+if __name__ == "__main__":
+    test_structured_output()
@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.text_chunker import TextChunker
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word, so the expected sizes are easy to read"""
+
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+def test_text_chunker():
+    chunker = TextChunker(chunk_size=12, chunk_overlap=4, tokenizer=WordTokenizer())
+    sentences = [f"هذه الجملة رقم {i} في النص؟" for i in range(20)]
+    chunks = list(chunker.iter_chunks([(" ".join(sentences), 1), ("Short page.", 2)]))
+
+    # 6-token sentences are larger than the overlap budget, so each chunk holds two
+    # whole sentences, ends on Arabic punctuation, and nothing is repeated
+    assert all(chunk['token_count'] <= 12 for chunk in chunks)
+    assert all(chunk['content'].endswith('؟') for chunk in chunks[:-1])
+    assert [chunk['chunk_number'] for chunk in chunks] == list(range(1, len(chunks) + 1))
+    assert chunks[-1]['page_number'] == 2 and chunks[-1]['content'] == "Short page."
+    assert len(chunks) == 11
+
+    # Overlap is made of whole sentences that fit in the overlap budget
+    overlapping = TextChunker(chunk_size=10, chunk_overlap=4, tokenizer=WordTokenizer())
+    chunks = list(overlapping.split_text("One two three. Four five six. Seven eight nine. Ten eleven twelve."))
+    assert chunks[0]['content'] == "One two three. Four five six. Seven eight nine."
+    assert chunks[1]['content'] == "Seven eight nine. Ten eleven twelve."
+
+    # A sentence longer than a chunk is split on words
+    long = list(overlapping.split_text(" ".join(["word"] * 25)))
+    assert [chunk['token_count'] for chunk in long] == [10, 10, 5]
+
+    try:
+        TextChunker(chunk_size=100, chunk_overlap=100, tokenizer=WordTokenizer())
+        assert False, "overlap equal to chunk size should be rejected"
+    except ValueError:
+        pass
+    print("Chunk sizes:", [chunk['token_count'] for chunk in chunks])
+
+
+if __name__ == "__main__":
+    test_text_chunker()
@@ -0,0 +1,60 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.transcript_encoder import TranscriptEncoder
+from src.services.transcript_windows import TranscriptWindower
+
+
+class WordTokenizer:
+    def encode(self, text):
+        return text.split()
+
+
+def test_transcript_encoder():
+    segments = [
+        {'startTime': 0.0, 'endTime': 3.3999999999999995, 'speaker': 'Speaker 1', 'text': 'مرحبا، كيف أقدر أساعدك؟'},
+        {'startTime': 3.4000000000000004, 'endTime': 9.120000000000001, 'speaker': 'Speaker 0', 'text': 'أبغى\nأسترجع المبلغ'},
+        {'startTime': 9.45, 'endTime': 12.0, 'speaker': 'Speaker 1', 'text': 'تم استرجاع المبلغ'},
+    ]
+    encoder = TranscriptEncoder(tokenizer=WordTokenizer())
+    encoded = encoder.encode(segments)
+
+    assert encoded.render().split("\n") == [
+        "Speakers: S1 = Speaker 1, S0 = Speaker 0",
+        "1 [0.0] S1: مرحبا، كيف أقدر أساعدك؟",
+        "2 [3.4] S0: أبغى أسترجع المبلغ",
+        "3 [9.4] S1: تم استرجاع المبلغ",
+    ]
+    assert encoded.render([2], indexed=False).split("\n")[1] == "S1: تم استرجاع المبلغ"
+
+    # Segment numbers and rounded times map back to the exact original start times
+    assert encoded.resolve_event({'actor': 'agent', 'action': 'refund', 'segment': 3, 'timestamp': 1.0}) == \
+        {'actor': 'agent', 'action': 'refund', 'timestamp': 9.45}
+    assert encoded.resolve_event({'actor': 'agent', 'action': 'refund', 'timestamp': 3.4})['timestamp'] == 3.4000000000000004
+    assert encoded.resolve_event({'actor': 'agent', 'action': 'refund', 'segment': 'x', 'timestamp': 9.4})['timestamp'] == 9.45
+    assert encoded.segment_position("2") == 1
+    assert encoded.segment_position(0) is None
+
+    # Savings are measured against the pretty-printed JSON the endpoints used to send
+    json_tokens = len(json.dumps(segments, ensure_ascii=False, indent=2).split())
+    assert encoded.token_stats['json_tokens'] == json_tokens
+    assert encoded.token_stats['compact_tokens'] < json_tokens
+
+    # Same transcript from another endpoint (extra fields, copies) reuses the encoding and windows
+    windower = TranscriptWindower(WordTokenizer(), max_tokens=12, overlap_tokens=2)
+    windows = encoded.windows(windower)
+    again = encoder.encode([{**segment, 'sentiment': 'neutral'} for segment in segments])
+    assert again is encoded
+    assert again.windows(windower) is windows
+    assert encoder.stats()['hits'] == 1 and encoder.stats()['encoded'] == 1
+
+    # Names that aren't "Speaker N" get positional tags
+    assert encoder.encode([{'startTime': 0, 'endTime': 1, 'speaker': 'agent', 'text': 'hi'}]).render() == \
+        "Speakers: S0 = agent\n1 [0.0] S0: hi"
+
+
+if __name__ == "__main__":
+    test_transcript_encoder()
+    print("transcript encoder tests passed")
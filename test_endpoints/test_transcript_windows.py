@@ -0,0 +1,66 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.services.transcript_windows import TranscriptWindower, aggregate_details, merge_events
+
+
+class WordTokenizer:
+    def encode(self, text):
+        return text.split()
+
+
+def render(segment):
+    return f"[{segment['speaker']}]: {segment['text']}"
+
+
+def test_transcript_windows():
+    # Each rendered segment is 5 words, 6 tokens with the line break
+    segments = [{'speaker': 'S0', 'text': f"segment {i} four words"} for i in range(10)]
+    windower = TranscriptWindower(WordTokenizer(), max_tokens=20, overlap_tokens=6)
+
+    assert windower.split(segments[:3], render) == [segments[:3]]
+
+    windows = windower.split(segments, render)
+    assert [[s['text'].split()[1] for s in w] for w in windows] == [
+        ['0', '1', '2'], ['2', '3', '4'], ['4', '5', '6'], ['6', '7', '8'], ['8', '9']
+    ]
+    assert all(sum(len(render(s).split()) + 1 for s in w) <= 20 for w in windows)
+
+    # Partial summaries are merged level by level until they fit in one prompt
+    calls = []
+
+    async def combine(group):
+        calls.append(len(group))
+        return "merged summary"
+
+    remaining = asyncio.run(windower.reduce_until_fits(["four word partial summary"] * 9, combine))
+    assert remaining == ["merged summary"] * 3
+    assert calls == [3, 3, 3]
+
+    # Overlapping windows report the same event twice; events in one window are kept
+    events = merge_events([
+        [{'actor': 'agent', 'action': 'approved refund', 'timestamp': 40.0},
+         {'actor': 'agent', 'action': 'sent link', 'timestamp': 42.0}],
+        [{'actor': 'Agent', 'action': 'approved the refund', 'timestamp': 41.5},
+         {'actor': 'customer', 'action': 'asked to close account', 'timestamp': 41.0},
+         {'actor': 'agent', 'action': 'closed account', 'timestamp': 90.0}],
+    ])
+    assert [e['action'] for e in events] == ['approved refund', 'asked to close account', 'sent link', 'closed account']
+
+    details = aggregate_details([
+        {'sentiment_score': 2.0, 'topics': ['billing', 'refund'], 'flags': ['refund_requested'], 'call_type': 'billing'},
+        {'sentiment_score': 5.0, 'topics': ['refund'], 'flags': ['refund_requested', 'customer_angry'], 'call_type': 'account'},
+    ], weights=[3, 1])
+    assert details == {
+        'sentiment_score': 2.75,
+        'topics': ['refund', 'billing'],
+        'flags': ['refund_requested', 'customer_angry'],
+        'call_type': 'billing',
+    }
+
+
+if __name__ == "__main__":
+    test_transcript_windows()
+    print("transcript window tests passed")